@@ -0,0 +1,205 @@
+import argparse
+import logging
+import os
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from itertools import accumulate
+from os import makedirs
+from os.path import expanduser, join
+
+from dateutil.relativedelta import relativedelta
+
+from hdx.analysis_scripts.common.downloads import Downloads
+from hdx.analysis_scripts.datasets.__main__ import main as datasets_main
+from hdx.analysis_scripts.orgs.__main__ import main as orgs_main
+from hdx.analysis_scripts.serve.__main__ import CachedDownloads, mixpanel_months
+from hdx.facades.keyword_arguments import facade
+from hdx.utilities.dateparse import now_utc, parse_date
+from hdx.utilities.path import script_dir_plus_file
+
+logger = logging.getLogger(__name__)
+
+lookup = "hdx-analysis-scripts"
+
+scripts = ("orgs", "datasets")
+
+
+class DailyDownloads:
+    """Downloads per dataset per day held as cumulative sums so that the
+    downloads of a dataset in any window are two binary searches.
+
+    Args:
+        dataset_id_to_days (Dict[str, Dict[str, int]]): Dataset id to day
+            (YYYY-MM-DD) to downloads
+    """
+
+    def __init__(self, dataset_id_to_days):
+        self.series = {}
+        for dataset_id, day_to_count in dataset_id_to_days.items():
+            days = sorted(day_to_count)
+            ordinals = array("l", (date.fromisoformat(x).toordinal() for x in days))
+            cumulative = array("q", accumulate(day_to_count[x] for x in days))
+            self.series[dataset_id] = ordinals, cumulative
+
+    def get_downloads(self, start_date, end_date):
+        """Get downloads per dataset from start_date to end_date (both inclusive)
+        leaving out datasets without downloads in the window.
+
+        Args:
+            start_date (date): Start date
+            end_date (date): End date
+
+        Returns:
+            Dict[str, int]: Dataset id to downloads
+        """
+        start = start_date.toordinal()
+        end = end_date.toordinal()
+        downloads = {}
+        for dataset_id, (ordinals, cumulative) in self.series.items():
+            i = bisect_left(ordinals, start)
+            j = bisect_right(ordinals, end)
+            if j > i:
+                downloads[dataset_id] = cumulative[j - 1] - (
+                    cumulative[i - 1] if i else 0
+                )
+        return downloads
+
+
+class BackfillDownloads(CachedDownloads):
+    """Stands in for Downloads in the main functions of the scripts as of each
+    of a list of dates. The catalogue, lookups and a daily series of downloads
+    covering the windows of all the dates are loaded once. For each date, the
+    downloads of each window are summed from the daily series and only datasets
+    created by then are returned.
+
+    Args:
+        downloads (Downloads): Downloads object used to load data
+        dates (Sequence[datetime]): Dates to evaluate
+    """
+
+    def __init__(self, downloads, dates):
+        super().__init__(downloads)
+        self.dates = sorted(dates)
+        self.daily_downloads = None
+
+    def load_mixpanel_downloads(self):
+        start_date = self.dates[0] - relativedelta(months=max(mixpanel_months))
+        self.daily_downloads = DailyDownloads(
+            self.downloads.get_mixpanel_daily_downloads(start_date, self.dates[-1])
+        )
+
+    def get_mixpanel_downloads(self, months_ago):
+        start_date = self.today - relativedelta(months=months_ago)
+        return self.daily_downloads.get_downloads(start_date.date(), self.today.date())
+
+    def get_all_datasets(self):
+        # CKAN's metadata_created is UTC without a timezone
+        created_by = self.today.strftime("%Y-%m-%dT%H:%M:%S.%f")
+        return iter(
+            [
+                dataset
+                for dataset in self.datasets.values()
+                if dataset["metadata_created"] <= created_by
+            ]
+        )
+
+
+def main(
+    downloads,
+    dates,
+    output_dir,
+    run_scripts=scripts,
+    history_db=None,
+    **ignore,
+):
+    """Run the scripts as of each of the given dates from data loaded once,
+    writing the outputs of each date to a subfolder of output_dir named by the
+    date and appending them to history_db if given.
+
+    Args:
+        downloads (Downloads): Downloads object used to load data
+        dates (Sequence[datetime]): Dates to evaluate
+        output_dir (str): Output folder
+        run_scripts (Sequence[str]): Scripts to run. Defaults to both.
+        history_db (Optional[str]): SQLite file to append results to. Defaults to None.
+
+    Returns:
+        None
+    """
+    backfill_downloads = BackfillDownloads(downloads, dates)
+    backfill_downloads.load(backfill_downloads.dates[-1], True)
+    for today in backfill_downloads.dates:
+        logger.info(f"Evaluating stats as of {today.isoformat()}")
+        backfill_downloads.today = today
+        date_dir = join(output_dir, today.date().isoformat())
+        makedirs(date_dir, exist_ok=True)
+        if "orgs" in run_scripts:
+            orgs_main(
+                backfill_downloads,
+                join(date_dir, "orgs"),
+                history_db=history_db,
+                all_users=True,
+            )
+        if "datasets" in run_scripts:
+            datasets_main(
+                backfill_downloads,
+                join(date_dir, "datasets"),
+                history_db=history_db,
+                all_users=True,
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill stats for past dates")
+    parser.add_argument(
+        "dates", nargs="+", help="Dates (YYYY-MM-DD) as of the end of which to run"
+    )
+    parser.add_argument("-od", "--output_dir", default="output", help="Output folder")
+    parser.add_argument(
+        "-sc",
+        "--script",
+        action="append",
+        choices=scripts,
+        default=None,
+        help="Script to run (can be repeated). Defaults to both",
+    )
+    parser.add_argument(
+        "-hd",
+        "--history_db",
+        default=None,
+        help="SQLite file to which to append each date's results",
+    )
+    parser.add_argument(
+        "-pc",
+        "--projected_crawl",
+        action="store_true",
+        help="Keep only the dataset fields used by the scripts",
+    )
+    args = parser.parse_args()
+    dates = [parse_date(x, max_time=True) for x in args.dates]
+    home_folder = expanduser("~")
+    mixpanel_config_yaml = join(home_folder, ".mixpanel.yaml")
+    downloads = Downloads(
+        now_utc(),
+        mixpanel_config_yaml,
+        project_datasets=args.projected_crawl,
+    )
+
+    user_agent_config_path = join(home_folder, ".useragents.yaml")
+    if not os.path.exists(user_agent_config_path):
+        user_agent_config_path = join(home_folder, ".useragents.yml")
+    facade(
+        main,
+        hdx_site="prod",
+        user_agent_config_yaml=user_agent_config_path,
+        user_agent_lookup=lookup,
+        project_config_yaml=script_dir_plus_file(
+            join("config", "project_configuration.yaml"), Downloads
+        ),
+        downloads=downloads,
+        dates=dates,
+        output_dir=args.output_dir,
+        run_scripts=args.script or scripts,
+        history_db=args.history_db,
+    )
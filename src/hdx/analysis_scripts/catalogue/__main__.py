@@ -0,0 +1,34 @@
+import argparse
+import csv
+import sys
+
+from hdx.analysis_scripts.common.catalogue import query_catalogue
+
+
+def main(catalogue_db, filters=None, tags=None, sql=None, **ignore):
+    headers, rows = query_catalogue(catalogue_db, filters, tags, sql)
+    writer = csv.writer(sys.stdout)
+    writer.writerow(headers)
+    writer.writerows(rows)
+    return headers, rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Catalogue query")
+    parser.add_argument(
+        "-cd", "--catalogue_db", required=True, help="SQLite catalogue file"
+    )
+    parser.add_argument(
+        "-f",
+        "--filter",
+        action="append",
+        default=[],
+        help="Filter of form column=value eg. last_modified_fresh=Delinquent",
+    )
+    parser.add_argument(
+        "-t", "--tag", action="append", default=[], help="Tag datasets must have"
+    )
+    parser.add_argument("-s", "--sql", default=None, help="SQL query to run")
+    args = parser.parse_args()
+    filters = dict(x.split("=", 1) for x in args.filter)
+    main(args.catalogue_db, filters, args.tag, args.sql)
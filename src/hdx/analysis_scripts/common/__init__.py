@@ -13,12 +13,39 @@ def get_dataset_name_to_explorers(downloads):
     return dataset_name_to_explorers
 
 
+NO_REQUESTS = (0, 0, 0, 0, 0)
+
+
+def add_request_to_counts(counts, key, request):
+    # Counts are a tuple of new, open, archived, shared and denied requests
+    new_requests, open_requests, archived_requests, shared_requests, denied_requests = (
+        counts.get(key, NO_REQUESTS)
+    )
+    if request["state"] == "new":
+        new_requests += 1
+    elif request["state"] == "open":
+        open_requests += 1
+    else:
+        archived_requests += 1
+        if request["data_shared"]:
+            shared_requests += 1
+        elif request["rejected"]:
+            denied_requests += 1
+    counts[key] = (
+        new_requests,
+        open_requests,
+        archived_requests,
+        shared_requests,
+        denied_requests,
+    )
+
+
 def get_requests_mappings(downloads):
     dataset_id_to_requests = {}
     organisation_name_to_requests = {}
     for request in downloads.get_requests():
-        dict_of_lists_add(dataset_id_to_requests, request["package_id"], request)
-        dict_of_lists_add(
+        add_request_to_counts(dataset_id_to_requests, request["package_id"], request)
+        add_request_to_counts(
             organisation_name_to_requests, request["pkg_organization_name"], request
         )
     return dataset_id_to_requests, organisation_name_to_requests
@@ -0,0 +1,190 @@
+import logging
+from array import array
+from bisect import bisect_right
+from collections import Counter
+
+from hdx.analysis_scripts.common import get_aging
+from hdx.analysis_scripts.common.run_context import get_cutoffs
+from hdx.utilities.text import get_fraction_str
+
+logger = logging.getLogger(__name__)
+
+aging_keys = ("last_modified_aging", "end_date_aging")
+
+
+def get_status_counts(timestamps, cutoffs, default_status):
+    """Count the statuses of sorted timestamps given cutoffs from get_cutoffs.
+    A timestamp gets the status of the first cutoff at or after it, as in
+    RunContext, so the count of each status is the difference between the
+    numbers of timestamps at or before consecutive cutoffs.
+
+    Args:
+        timestamps (Sequence[int]): Sorted timestamps
+        cutoffs (Tuple[Tuple[int, ...], Tuple[str, ...]]): Cutoffs and statuses
+        default_status (str): Status of timestamps after the last cutoff
+
+    Returns:
+        Counter: Status to number of timestamps
+    """
+    counts = Counter()
+    previous = 0
+    for cutoff, status in zip(*cutoffs):
+        at_or_before = bisect_right(timestamps, cutoff)
+        counts[status] += at_or_before - previous
+        previous = at_or_before
+    counts[default_status] += len(timestamps) - previous
+    return counts
+
+
+class AgingSweep:
+    """Evaluates alternative last_modified_aging and end_date_aging
+    configurations against the datasets of one run. While crawling, the
+    timestamps compared with the aging thresholds are collected sorted by
+    update frequency. Each configuration is then evaluated by counting the
+    timestamps between its cutoffs, so the cost per configuration does not
+    grow with the number of datasets. Statuses that do not depend on aging
+    (eg. Fresh for datasets that are never updated) are counted once. Every
+    configuration must have thresholds for all the update frequencies of the
+    current one, which is checked on creation so that a run fails before
+    downloading rather than after.
+
+    Args:
+        today (datetime): Date of run
+        configuration (Dict): Project configuration giving the current aging
+        sweep_configs (Dict[str, Dict]): Name to aging configuration. Keys not
+            given are taken from the project configuration.
+    """
+
+    def __init__(self, today, configuration, sweep_configs):
+        configs = {"current": {key: configuration[key] for key in aging_keys}}
+        for name, sweep_config in sweep_configs.items():
+            configs[name] = {
+                key: sweep_config.get(key, configuration[key]) for key in aging_keys
+            }
+        self.cutoffs = {}
+        for name, config in configs.items():
+            self.cutoffs[name] = tuple(
+                get_cutoffs(today, get_aging(config[key])) for key in aging_keys
+            )
+        for name, cutoffs in self.cutoffs.items():
+            for key, current, config_cutoffs in zip(
+                aging_keys, self.cutoffs["current"], cutoffs
+            ):
+                missing = sorted(set(current) - set(config_cutoffs))
+                if missing:
+                    raise ValueError(
+                        f"{key} of aging {name} has no thresholds for update "
+                        f"frequencies {missing}!"
+                    )
+        self.last_modified_timestamps = {}
+        self.end_date_timestamps = {}
+        self.last_modified_counts = Counter()
+        self.end_date_counts = Counter()
+
+    @staticmethod
+    def add_status(status, timestamp, update_frequency, timestamps, counts):
+        if not status:
+            return
+        if timestamp is None:
+            counts[status] += 1
+            return
+        frequency_timestamps = timestamps.get(update_frequency)
+        if frequency_timestamps is None:
+            frequency_timestamps = timestamps[update_frequency] = array("q")
+        frequency_timestamps.append(timestamp)
+
+    def add(self, datasetstats):
+        """Add a dataset counted in the last modified and end date totals.
+
+        Args:
+            datasetstats (DatasetStatistics): Statistics of dataset
+
+        Returns:
+            None
+        """
+        update_frequency = (
+            int(datasetstats.update_frequency) if datasetstats.update_frequency else 0
+        )
+        self.add_status(
+            datasetstats.last_modified_fresh,
+            datasetstats.last_modified_fresh_timestamp,
+            update_frequency,
+            self.last_modified_timestamps,
+            self.last_modified_counts,
+        )
+        self.add_status(
+            datasetstats.end_date_uptodate,
+            datasetstats.end_date_uptodate_timestamp,
+            update_frequency,
+            self.end_date_timestamps,
+            self.end_date_counts,
+        )
+
+    @staticmethod
+    def evaluate(timestamps, cutoffs, counts, default_status):
+        counts = Counter(counts)
+        for update_frequency, frequency_timestamps in timestamps.items():
+            counts.update(
+                get_status_counts(
+                    frequency_timestamps, cutoffs[update_frequency], default_status
+                )
+            )
+        return counts
+
+    def get_rows(self):
+        """Get the distribution of statuses and the quarterly OKR percentages
+        for each aging configuration, starting with the current one.
+
+        Returns:
+            Tuple[List[str], List[List]]: Headers and rows
+        """
+        for timestamps in (self.last_modified_timestamps, self.end_date_timestamps):
+            for frequency_timestamps in timestamps.values():
+                frequency_timestamps[:] = array("q", sorted(frequency_timestamps))
+        results = []
+        last_modified_statuses = {"Fresh": None}
+        end_date_statuses = {"UpToDate": None}
+        for name, (last_modified_cutoffs, end_date_cutoffs) in self.cutoffs.items():
+            last_modified_counts = self.evaluate(
+                self.last_modified_timestamps,
+                last_modified_cutoffs,
+                self.last_modified_counts,
+                "Fresh",
+            )
+            end_date_counts = self.evaluate(
+                self.end_date_timestamps,
+                end_date_cutoffs,
+                self.end_date_counts,
+                "UpToDate",
+            )
+            for cutoffs in last_modified_cutoffs.values():
+                last_modified_statuses.update(dict.fromkeys(cutoffs[1]))
+            for cutoffs in end_date_cutoffs.values():
+                end_date_statuses.update(dict.fromkeys(cutoffs[1]))
+            results.append((name, last_modified_counts, end_date_counts))
+        headers = ["Aging"]
+        headers.extend(last_modified_statuses)
+        headers.append("Quarterly % Last Modified Fresh OKR")
+        headers.extend(end_date_statuses)
+        headers.append("Quarterly % End Date Up To Date OKR")
+        rows = []
+        for name, last_modified_counts, end_date_counts in results:
+            row = [name]
+            row.extend(last_modified_counts[x] for x in last_modified_statuses)
+            row.append(
+                get_fraction_str(
+                    last_modified_counts["Fresh"] * 100,
+                    last_modified_counts.total(),
+                    format="%.0f",
+                )
+            )
+            row.extend(end_date_counts[x] for x in end_date_statuses)
+            row.append(
+                get_fraction_str(
+                    end_date_counts["UpToDate"] * 100,
+                    end_date_counts.total(),
+                    format="%.0f",
+                )
+            )
+            rows.append(row)
+        return headers, rows
@@ -0,0 +1,173 @@
+import logging
+import sqlite3
+from os import remove, replace
+from os.path import exists
+
+from hdx.analysis_scripts.common.history import convert_value
+
+logger = logging.getLogger(__name__)
+
+columns = (
+    "id",
+    "name",
+    "title",
+    "organisation",
+    "organisation_title",
+    "public",
+    "requestable",
+    "archived",
+    "is_cod",
+    "live",
+    "ongoing",
+    "update_frequency",
+    "last_modified_fresh",
+    "end_date_uptodate",
+    "updated_last_3_months",
+    "updated_previous_quarter",
+    "updated_by_cod_script",
+    "formerly_updated_by_cod_script",
+    "updated_by_noncod_script",
+    "in_explorer_or_grid",
+    "valid_maintainer",
+    "date_created",
+    "date_metadata_updated",
+    "date_data_updated",
+    "date_updated_by_script",
+    "reference_period_start",
+    "reference_period_end",
+    "downloads_last_5_years",
+)
+
+indexed_columns = (
+    "organisation",
+    "last_modified_fresh",
+    "end_date_uptodate",
+    "update_frequency",
+    "date_created",
+    "date_data_updated",
+    "date_updated_by_script",
+)
+
+
+class CatalogueDatabase:
+    """Indexed SQLite copy of the last crawled catalogue with the statistics
+    computed for each dataset. It is built in a temporary file which replaces
+    the previous database on close, so that queries never see a partial load.
+    """
+
+    def __init__(self, path, batch_size=1000):
+        self.path = path
+        self.temp_path = f"{path}.tmp"
+        if exists(self.temp_path):
+            remove(self.temp_path)
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(self.temp_path)
+        column_definitions = ", ".join(columns[1:])
+        self.connection.execute(
+            f"CREATE TABLE datasets (id TEXT PRIMARY KEY, {column_definitions})"
+        )
+        self.connection.execute("CREATE TABLE dataset_tags (dataset_id TEXT, tag TEXT)")
+        self.datasets = []
+        self.tags = []
+
+    def add(self, datasetstats, downloads_5years):
+        dataset_id = datasetstats["id"]
+        organisation = datasetstats.get("organization") or {}
+        row = (
+            dataset_id,
+            datasetstats["name"],
+            datasetstats["title"],
+            organisation.get("name"),
+            organisation.get("title"),
+            datasetstats.public,
+            datasetstats.requestable,
+            datasetstats.archived,
+            datasetstats.is_cod,
+            datasetstats.live,
+            datasetstats.ongoing,
+            datasetstats.update_frequency,
+            datasetstats.last_modified_fresh,
+            datasetstats.end_date_uptodate,
+            datasetstats.updated_last_3_months,
+            datasetstats.updated_previous_qtr,
+            datasetstats.updated_by_cod_script,
+            datasetstats.old_updated_by_cod_script,
+            datasetstats.updated_by_noncod_script,
+            datasetstats.in_explorer_or_grid,
+            datasetstats.valid_maintainer,
+            datasetstats.created,
+            datasetstats["metadata_modified"],
+            datasetstats.last_modified,
+            datasetstats.updated_by_script,
+            datasetstats.startdate,
+            datasetstats.enddate,
+            downloads_5years,
+        )
+        self.datasets.append(tuple(convert_value(value) for value in row))
+        for tag in datasetstats.tag_names:
+            self.tags.append((dataset_id, tag))
+        if len(self.datasets) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        placeholders = ", ".join("?" * len(columns))
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO datasets VALUES ({placeholders})",
+                self.datasets,
+            )
+            self.connection.executemany(
+                "INSERT INTO dataset_tags VALUES (?, ?)", self.tags
+            )
+        self.datasets.clear()
+        self.tags.clear()
+
+    def close(self):
+        self.flush()
+        # Indexes are built after the bulk load as that is much faster
+        with self.connection:
+            for column in indexed_columns:
+                self.connection.execute(
+                    f"CREATE INDEX datasets_{column} ON datasets ({column})"
+                )
+            self.connection.execute(
+                "CREATE INDEX dataset_tags_tag ON dataset_tags (tag, dataset_id)"
+            )
+            self.connection.execute(
+                "CREATE INDEX dataset_tags_dataset_id ON dataset_tags (dataset_id)"
+            )
+        self.connection.close()
+        replace(self.temp_path, self.path)
+        logger.info(f"Catalogue database written to {self.path}")
+
+
+def query_catalogue(path, filters=None, tags=None, sql=None):
+    """Query the catalogue database which is opened read only. Either filters
+    (column to value) and tags (all of which a dataset must have) or a SQL
+    statement can be given. Returns column names and rows.
+    """
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        if sql:
+            cursor = connection.execute(sql)
+        else:
+            conditions = []
+            parameters = []
+            for column, value in (filters or {}).items():
+                if column not in columns:
+                    raise ValueError(f"Unknown column {column}!")
+                conditions.append(f"{column} = ?")
+                parameters.append(value)
+            for tag in tags or ():
+                conditions.append(
+                    "id IN (SELECT dataset_id FROM dataset_tags WHERE tag = ?)"
+                )
+                parameters.append(tag)
+            query = "SELECT * FROM datasets"
+            if conditions:
+                query = f"{query} WHERE {' AND '.join(conditions)}"
+            cursor = connection.execute(f"{query} ORDER BY name", parameters)
+        headers = [description[0] for description in cursor.description]
+        return headers, cursor.fetchall()
+    finally:
+        connection.close()
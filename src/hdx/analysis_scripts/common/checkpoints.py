@@ -0,0 +1,86 @@
+import gzip
+import json
+import logging
+from datetime import datetime
+from os import makedirs, replace
+from os.path import exists, join
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+
+class Checkpoint:
+    """Keeps the results of completed downloads and crawled pages in a folder so
+    that a failed run can be resumed. Each result is written to a temporary file
+    that is moved into place before the state file listing the completed results
+    is replaced, so the state file always describes a consistent checkpoint. The
+    run date is kept too so that a resumed run computes the same statistics.
+    """
+
+    state_file = "checkpoint.json"
+
+    def __init__(self, folder, today, resume=False):
+        self.folder = folder
+        self.lock = Lock()
+        makedirs(folder, exist_ok=True)
+        state_path = join(folder, self.state_file)
+        if resume and exists(state_path):
+            with open(state_path, encoding="utf-8") as f:
+                self.state = json.load(f)
+            self.today = datetime.fromisoformat(self.state["today"])
+            logger.info(
+                f"Resuming run of {self.today.date().isoformat()} with "
+                f"{len(self.state['completed'])} completed checkpoints"
+            )
+        else:
+            if resume:
+                logger.warning(f"No checkpoint to resume in {folder}!")
+            self.today = today
+            self.state = {"today": today.isoformat(), "completed": []}
+            self.write_state()
+
+    def write_state(self):
+        path = join(self.folder, self.state_file)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        replace(temp_path, path)
+
+    def has(self, name):
+        return name in self.state["completed"]
+
+    def load(self, name):
+        with gzip.open(
+            join(self.folder, f"{name}.json.gz"), "rt", encoding="utf-8"
+        ) as f:
+            return json.load(f)
+
+    def save(self, name, data):
+        path = join(self.folder, f"{name}.json.gz")
+        temp_path = f"{path}.tmp"
+        with gzip.open(temp_path, "wt", encoding="utf-8", compresslevel=1) as f:
+            json.dump(data, f, separators=(",", ":"))
+        with self.lock:
+            replace(temp_path, path)
+            if name not in self.state["completed"]:
+                self.state["completed"].append(name)
+            self.write_state()
+
+    def get(self, name, function, *args):
+        """Get the result of calling function with args from the checkpoint if
+        it is there, otherwise call it and save the result in the checkpoint.
+
+        Args:
+            name (str): Checkpoint name
+            function (Callable): Function to call
+            *args: Arguments to pass to function
+
+        Returns:
+            Any: Result of function
+        """
+        if self.has(name):
+            logger.info(f"Loading {name} from checkpoint")
+            return self.load(name)
+        result = function(*args)
+        self.save(name, result)
+        return result
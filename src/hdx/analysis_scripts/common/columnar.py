@@ -0,0 +1,289 @@
+import logging
+from datetime import date, datetime, timezone
+from os.path import join
+
+from hdx.utilities.dateparse import parse_date
+
+try:
+    import pyarrow
+    from pyarrow import feather, parquet
+except ImportError:
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+# CSV is always written. The other formats are written alongside it.
+output_formats = ("csv", "parquet", "feather")
+
+flags = {"Y": True, "N": False, "Yes": True, "No": False}
+
+# Table name to the type of each column that is not a string. Columns not
+# listed (including any added later) are strings, so the schema of a table
+# only changes when its columns do.
+column_types = {
+    "datasets": {
+        "downloads last 5 years": "int",
+        "date created": "timestamp",
+        "date metadata updated": "timestamp",
+        "date data updated": "timestamp",
+        "updated last 3 months": "flag",
+        "updated previous quarter": "flag",
+        "reference period start": "timestamp",
+        "reference period end": "timestamp",
+        "update frequency": "int",
+        "is cod": "flag",
+        "public": "flag",
+        "requestable": "flag",
+        "archived": "flag",
+        "updated by cod script": "flag",
+        "formerly updated by cod script": "flag",
+        "updated by non-cod script": "flag",
+        "date updated by script": "timestamp",
+        "updated_by_script<<last_modified": "flag",
+        "last_modified<<updated_by_script": "flag",
+        "valid maintainer": "flag",
+    },
+    "non_script_updates": dict.fromkeys(
+        ("Created", "Metadata Updated", "Data Updated"), "int"
+    ),
+    "org_stats": {
+        **dict.fromkeys(("Latitude", "Longitude"), "float"),
+        **dict.fromkeys(
+            (
+                "Number of admins",
+                "Number of editors",
+                "Number of members",
+                "Downloads last 90 days",
+                "Downloads last 12 months",
+                "Public datasets",
+                "Requestable datasets",
+                "Private datasets",
+                "Archived datasets",
+                "Public Internal Resources",
+                "Public External Resources",
+                "Public API (non-cod scripted)",
+                "Public cod scripted",
+                "Public formerly cod scripted",
+                "Public previous scripted",
+                "Public live",
+                "Public ongoing",
+                "Followers",
+                "Last modified fresh datasets",
+                "Last modified due datasets",
+                "Last modified overdue datasets",
+                "Last modified delinquent datasets",
+                "End date up to date datasets",
+                "End date out of date datasets",
+                "New requests",
+                "Open requests",
+                "Total archived requests",
+                "Shared requests",
+                "Denied requests",
+            ),
+            "int",
+        ),
+        **dict.fromkeys(
+            (
+                "% of public API (non-cod scripted)",
+                "% of public cod scripted",
+                "% of public formerly cod scripted",
+                "% of public previous scripted",
+                "% of public live",
+                "% of public ongoing",
+            ),
+            "float",
+        ),
+        **dict.fromkeys(
+            (
+                "Any updated last 3 months",
+                "Any public updated last 3 months",
+                "Any updated previous quarter",
+                "Any public updated previous quarter",
+                "In explorer or grid",
+                "Closed",
+                "Has crisis",
+                "Maintainers valid",
+            ),
+            "flag",
+        ),
+        "Latest created dataset date": "date",
+        "Latest scripted update date": "date",
+    },
+    "total_stats": {
+        **dict.fromkeys(
+            (
+                "Public - Request & Archive",
+                "Public Internal Resources",
+                "Public External Resources",
+                "Updated by COD",
+                "Updated by Script",
+                "Last Modified Fresh",
+                "Last Modified Not Fresh",
+                "End Date Up to Date",
+                "End Date Out Of Date",
+            ),
+            "int",
+        ),
+        **dict.fromkeys(
+            (
+                "Quarterly % API OKR",
+                "Quarterly % Last Modified Fresh OKR",
+                "Quarterly % End Date Up To Date OKR",
+            ),
+            "float",
+        ),
+    },
+}
+
+
+def is_missing(value):
+    return value is None or value == ""
+
+
+def to_string(value):
+    if value is None:
+        return None
+    return str(value)
+
+
+def to_int(value):
+    if is_missing(value):
+        return None
+    return int(value)
+
+
+def to_float(value):
+    if is_missing(value):
+        return None
+    return float(value)
+
+
+def to_flag(value):
+    if is_missing(value):
+        return None
+    return flags[value]
+
+
+def to_timestamp(value):
+    # An ongoing reference period has a start but no end (while a dataset
+    # without a reference period has neither)
+    if is_missing(value) or value == "ongoing":
+        return None
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            value = parse_date(value, include_microseconds=True)
+    # CKAN dates without a timezone are UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def to_date(value):
+    if is_missing(value):
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    return date.fromisoformat(value)
+
+
+converters = {
+    "string": to_string,
+    "int": to_int,
+    "float": to_float,
+    "flag": to_flag,
+    "timestamp": to_timestamp,
+    "date": to_date,
+}
+
+
+def get_arrow_type(type_name):
+    if type_name == "int":
+        return pyarrow.int64()
+    if type_name == "float":
+        return pyarrow.float64()
+    if type_name == "flag":
+        return pyarrow.bool_()
+    if type_name == "timestamp":
+        return pyarrow.timestamp("us", tz="UTC")
+    if type_name == "date":
+        return pyarrow.date32()
+    return pyarrow.string()
+
+
+def check_output_formats(formats):
+    """Check that the given output formats are known and can be written so that
+    a run fails before downloading rather than after.
+
+    Args:
+        formats (Optional[Sequence[str]]): Output formats eg. ("csv", "parquet")
+
+    Returns:
+        None
+    """
+    for output_format in formats or ():
+        if output_format not in output_formats:
+            raise ValueError(f"Unknown output format {output_format}!")
+        if output_format != "csv" and pyarrow is None:
+            raise ImportError(
+                f"pyarrow is needed to write {output_format}! Install "
+                "hdx-analysis-scripts[columnar]."
+            )
+
+
+def get_table(name, headers, rows, run_date):
+    """Get an Arrow table of the rows that are written to a CSV file with the
+    types of the columns given in column_types. Y/N and Yes/No columns become
+    booleans and empty values become nulls.
+
+    Args:
+        name (str): Name of table eg. org_stats
+        headers (Sequence[str]): Column headers
+        rows (Sequence[Sequence]): Rows without headers
+        run_date (str): Run date stored in the table metadata
+
+    Returns:
+        pyarrow.Table: Typed table
+    """
+    types = column_types.get(name, {})
+    fields = []
+    arrays = []
+    columns = zip(*rows) if rows else [()] * len(headers)
+    for header, column in zip(headers, columns):
+        type_name = types.get(header, "string")
+        converter = converters[type_name]
+        arrow_type = get_arrow_type(type_name)
+        fields.append(pyarrow.field(header, arrow_type))
+        arrays.append(pyarrow.array([converter(x) for x in column], type=arrow_type))
+    schema = pyarrow.schema(fields, metadata={"run_date": run_date})
+    return pyarrow.Table.from_arrays(arrays, schema=schema)
+
+
+def write_columnar(output_dir, name, headers, rows, run_date, formats):
+    """Write the rows that are written to name.csv to name.parquet and/or
+    name.feather depending upon the output formats given.
+
+    Args:
+        output_dir (str): Output folder
+        name (str): Name of table eg. org_stats
+        headers (Sequence[str]): Column headers
+        rows (Sequence[Sequence]): Rows without headers
+        run_date (str): Run date stored in the table metadata
+        formats (Optional[Sequence[str]]): Output formats eg. ("csv", "parquet")
+
+    Returns:
+        None
+    """
+    formats = [x for x in formats or () if x != "csv"]
+    if not formats:
+        return
+    check_output_formats(formats)
+    table = get_table(name, headers, rows, run_date)
+    for output_format in formats:
+        filepath = join(output_dir, f"{name}.{output_format}")
+        logger.info(f"Writing rows to {filepath}")
+        if output_format == "parquet":
+            parquet.write_table(table, filepath)
+        else:
+            feather.write_feather(table, filepath)
@@ -1,52 +1,45 @@
 import logging
-import re
 from collections import UserDict
-from datetime import datetime, timedelta
+from datetime import timedelta
 
 from dateutil.parser import ParserError
-from dateutil.relativedelta import relativedelta
 
-from hdx.analysis_scripts.common import get_previous_quarter
-from hdx.api.configuration import Configuration
+from hdx.analysis_scripts.common.run_context import get_timestamp
+from hdx.analysis_scripts.common.updated_by_script import COD, SCRIPT
 from hdx.utilities.dateparse import parse_date
 
 logger = logging.getLogger(__name__)
 
 
 class DatasetStatistics(UserDict):
-    bracketed_date = re.compile(r"\((.*)\)")
-
     def __init__(
         self,
         organisations,
         users,
-        today,
+        run_context,
         dataset_name_to_explorers,
-        dataset_id_to_requests,
-        last_modified_aging,
-        end_date_aging,
+        dataset_index,
+        tag_vocabulary,
+        updated_by_script_classifier,
         dataset,
     ):
         super().__init__(dataset.data)
         self.organisations = organisations
         self.users = users
-        self.today = today
-        self.last_3_months = today - relativedelta(months=3)
-        self.previous_quarter = get_previous_quarter(today)
+        self.run_context = run_context
         self.dataset_name_to_explorers = dataset_name_to_explorers
-        self.dataset_id_to_requests = dataset_id_to_requests
-        self.last_modified_aging = last_modified_aging
-        self.end_date_aging = end_date_aging
+        self.dataset_index = dataset_index
+        self.tag_vocabulary = tag_vocabulary
+        self.updated_by_script_classifier = updated_by_script_classifier
         self.dataset = dataset
+        self.index = dataset_index.get_index(dataset["id"])
         self.last_modified = None
-        self.configuration = Configuration.read()
         self.get_status()
         self.get_cod()
         self.get_date_info()
         self.get_update_frequency_info()
         self.get_in_explorer_or_grid()
         self.get_requests()
-        self.crisis_tag = False
         self.get_tags()
         self.get_updated_by_script()
         self.get_last_modified_freshness()
@@ -110,11 +103,12 @@ class DatasetStatistics(UserDict):
             self.updated_last_3_months = ""
             return
         self.last_modified = parse_date(last_modified, include_microseconds=True)
-        if self.last_3_months < self.last_modified <= self.today:
+        last_modified_timestamp = get_timestamp(self.last_modified)
+        if self.run_context.is_last_3_months(last_modified_timestamp):
             self.updated_last_3_months = "Y"
         else:
             self.updated_last_3_months = "N"
-        if self.previous_quarter[0] <= self.last_modified <= self.previous_quarter[1]:
+        if self.run_context.is_previous_quarter(last_modified_timestamp):
             self.updated_previous_qtr = "Y"
         else:
             self.updated_previous_qtr = "N"
@@ -145,35 +139,25 @@ class DatasetStatistics(UserDict):
             self.in_explorer_or_grid = "N"
 
     def get_requests(self):
-        self.new_requests = 0
-        self.open_requests = 0
-        self.archived_requests = 0
-        self.shared_requests = 0
-        self.denied_requests = 0
-        for request in self.dataset_id_to_requests.get(self["id"], []):
-            if request["state"] == "new":
-                self.new_requests += 1
-            elif request["state"] == "open":
-                self.open_requests += 1
-            else:
-                self.archived_requests += 1
-                if request["data_shared"]:
-                    self.shared_requests += 1
-                elif request["rejected"]:
-                    self.denied_requests += 1
+        (
+            self.new_requests,
+            self.open_requests,
+            self.archived_requests,
+            self.shared_requests,
+            self.denied_requests,
+        ) = self.dataset_index.get_requests(self.index)
 
     def get_tags(self):
-        tags = self.dataset.get_tags()
-        self.tags = ", ".join(tags)
-        for tag in tags:
-            if tag[:7] == "crisis-":
-                self.crisis_tag = "Y"
-                return
-        self.crisis_tag = "N"
+        self.tag_names = self.dataset.get_tags()
+        self.tag_bitset = self.tag_vocabulary.get_bitset(self.tag_names)
+        if self.tag_vocabulary.has_crisis(self.tag_bitset):
+            self.crisis_tag = "Y"
+        else:
+            self.crisis_tag = "N"
 
-    def add_tags_to_set(self, tagset):
-        tags = self.dataset.get_tags()
-        tagset.update(tags)
+    @property
+    def tags(self):
+        return ", ".join(self.tag_names)
 
     def get_updated_by_script(self):
         updated_by_script = self.get("updated_by_script")
@@ -187,35 +171,18 @@ class DatasetStatistics(UserDict):
             return
         if self.exclude_from_stats == "Y":
             return
-        if "HDXINTERNAL" in updated_by_script:
-            if any(x in updated_by_script for x in ("tagbot",)):
-                return
-        if any(
-            x in updated_by_script
-            for x in (
-                "HDXPythonLibrary/5.5.6-test (2022-03-15",
-                "HDXPythonLibrary/5.4.8-test (2022-01-04",
-                "HDXPythonLibrary/5.4.1-test (2021-11-17",
-            )
-        ):  # Mike maintainer bulk change
-            return
-        match = self.bracketed_date.search(updated_by_script)
-        if match is None:
-            return
-        else:
-            try:
-                self.updated_by_script = parse_date(
-                    match.group(1), include_microseconds=True
-                )
-            except ParserError:
-                return
-        if "HDXINTERNAL" in updated_by_script and "CODs" in updated_by_script:
+        category, self.updated_by_script = self.updated_by_script_classifier.classify(
+            updated_by_script
+        )
+        if category == COD:
             if "cod_level" in self.data:
                 self.updated_by_cod_script = "Y"
             else:
                 # no longer updated by COD script
                 self.old_updated_by_cod_script = "Y"
             return
+        if category != SCRIPT:
+            return
 
         if self.last_modified:
             if self.updated_by_script > self.last_modified:
@@ -232,30 +199,10 @@ class DatasetStatistics(UserDict):
             else:
                 self.old_updated_by_noncod_script = "Y"
 
-    def calculate_lm_freshness(
-        self, last_modified: datetime, update_frequency: int
-    ) -> str:
-        """Calculate freshness based on a last modified date and the expected update
-        frequency. Returns "Fresh", "Due", "Overdue" or "Delinquent".
-
-        Args:
-            last_modified (datetime): Last modified date
-            update_frequency (int): Expected update frequency
-
-        Returns:
-            str: "Fresh", "Due", "Overdue" or "Delinquent"
-        """
-        delta = self.today - last_modified
-        if delta >= self.last_modified_aging[update_frequency]["Delinquent"]:
-            return "Delinquent"
-        elif delta >= self.last_modified_aging[update_frequency]["Overdue"]:
-            return "Overdue"
-        elif delta >= self.last_modified_aging[update_frequency]["Due"]:
-            return "Due"
-        return "Fresh"
-
     def get_last_modified_freshness(self):
         self.last_modified_fresh = ""
+        # Timestamp compared with the aging thresholds if any
+        self.last_modified_fresh_timestamp = None
         if self.exclude_from_stats == "Y":
             return
         if not self.last_modified:
@@ -280,28 +227,15 @@ class DatasetStatistics(UserDict):
             elif update_frequency == -2:
                 self.last_modified_fresh = "Fresh"
             else:
-                self.last_modified_fresh = self.calculate_lm_freshness(
-                    latest_of_modifieds, update_frequency
+                self.last_modified_fresh_timestamp = get_timestamp(latest_of_modifieds)
+                self.last_modified_fresh = self.run_context.get_last_modified_freshness(
+                    self.last_modified_fresh_timestamp, update_frequency
                 )
 
-    def calculate_ed_uptodate(self, end_date: datetime, update_frequency: int) -> str:
-        """Calculate up to date based on time period end date and the expected
-        update frequency. Returns "UpToDate" or "OutOfDate".
-
-        Args:
-            last_modified (datetime): Last modified date
-            update_frequency (int): Expected update frequency
-
-        Returns:
-            str: "UpToDate" or "OutOfDate"
-        """
-        delta = self.today - end_date
-        if delta >= self.end_date_aging[update_frequency]["OutOfDate"]:
-            return "OutOfDate"
-        return "UpToDate"
-
     def get_end_date_freshness(self):
         self.end_date_uptodate = ""
+        # Timestamp compared with the aging thresholds if any
+        self.end_date_uptodate_timestamp = None
         if self.exclude_from_stats == "Y":
             return
         if self.update_frequency:
@@ -315,17 +249,18 @@ class DatasetStatistics(UserDict):
                     self.end_date_uptodate = "UpToDate"
                     return
                 enddate = parse_date(self.enddate)
-                self.end_date_uptodate = self.calculate_ed_uptodate(
-                    enddate, update_frequency
+                self.end_date_uptodate_timestamp = get_timestamp(enddate)
+                self.end_date_uptodate = self.run_context.get_end_date_uptodate(
+                    self.end_date_uptodate_timestamp, update_frequency
                 )
 
     def get_maintainer(self):
         self.valid_maintainer = "N"
         maintainer_id = self["maintainer"]
-        maintainer = self.users.get(maintainer_id)
-        if not maintainer:
+        sysadmin = self.users.get(maintainer_id)
+        if sysadmin is None:
             return
-        if maintainer["sysadmin"]:
+        if sysadmin:
             self.valid_maintainer = "Y"
             return
         organisation_id = self["organization"]["id"]
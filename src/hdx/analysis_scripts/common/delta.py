@@ -0,0 +1,92 @@
+import gzip
+import json
+import logging
+from os.path import exists, join
+from zlib import crc32
+
+from hdx.analysis_scripts.common.snapshots import load_saved_json
+from hdx.utilities.saver import save_iterable
+
+logger = logging.getLogger(__name__)
+
+hash_length = 8
+
+
+def get_column_hashes(row):
+    """Get a string made up of a fixed length hash of each value in a row.
+    Rows are unchanged if these strings are equal and the columns that changed
+    are found by comparing the hashes at each column's offset.
+    """
+    hashes = []
+    for value in row:
+        if value is None:
+            value = ""
+        hashes.append(f"{crc32(str(value).encode('utf-8')):08x}")
+    return "".join(hashes)
+
+
+def get_changed_columns(headers, column_hashes, previous_headers, previous_hashes):
+    changed_columns = []
+    previous_offsets = {
+        header: i * hash_length for i, header in enumerate(previous_headers)
+    }
+    for i, header in enumerate(headers):
+        offset = i * hash_length
+        previous_offset = previous_offsets.get(header)
+        if previous_offset is None:
+            changed_columns.append(header)
+            continue
+        if (
+            column_hashes[offset : offset + hash_length]
+            != previous_hashes[previous_offset : previous_offset + hash_length]
+        ):
+            changed_columns.append(header)
+    return changed_columns
+
+
+def write_delta(output_dir, delta_dir, name, headers, rows, key_column):
+    """Write name_delta.csv to output_dir containing the rows added, removed or
+    changed since the last run. The comparison uses an index of per column hashes
+    keyed by key_column that is kept in delta_dir between runs.
+    """
+    index_path = join(delta_dir, f"{name}_index.json.gz")
+    if exists(index_path):
+        previous_index = load_saved_json(delta_dir, f"{name}_index.json")
+    else:
+        logger.info(f"No previous {name} index so all rows are added")
+        previous_index = {"headers": [], "rows": {}}
+    headers = list(headers)
+    previous_headers = previous_index["headers"]
+    previous_rows = previous_index["rows"]
+    key_index = headers.index(key_column)
+    index_rows = {}
+    delta_rows = []
+    for row in rows:
+        key = row[key_index]
+        column_hashes = get_column_hashes(row)
+        index_rows[key] = column_hashes
+        previous_hashes = previous_rows.pop(key, None)
+        if previous_hashes is None:
+            delta_rows.append(["added", "", *row])
+        elif previous_headers != headers or previous_hashes != column_hashes:
+            changed_columns = get_changed_columns(
+                headers, column_hashes, previous_headers, previous_hashes
+            )
+            if changed_columns:
+                delta_rows.append(["changed", ";".join(changed_columns), *row])
+    for key in previous_rows:
+        removed_row = [""] * len(headers)
+        removed_row[key_index] = key
+        delta_rows.append(["removed", "", *removed_row])
+    filepath = join(output_dir, f"{name}_delta.csv")
+    logger.info(f"Writing {len(delta_rows)} delta rows to {filepath}")
+    save_iterable(
+        filepath,
+        delta_rows,
+        ["change", "changed columns", *headers],
+        encoding="utf-8",
+        no_empty=False,
+    )
+    with gzip.open(index_path, "wt", encoding="utf-8") as f:
+        json.dump({"headers": headers, "rows": index_rows}, f)
+    return delta_rows
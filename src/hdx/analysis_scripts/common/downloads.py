@@ -1,16 +1,37 @@
+import json
 import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from os import getenv
-from os.path import join
+from random import uniform
+from time import sleep
 
+import ijson
+from ckanapi.errors import CKANAPIError, ServerIncompatibleError
 from dateutil.relativedelta import relativedelta
 from mixpanel_utils import MixpanelUtils
+from ratelimit import limits, sleep_and_retry
+from requests import RequestException
 
+from hdx.analysis_scripts.common.checkpoints import Checkpoint
+from hdx.analysis_scripts.common.progress import ProgressReporter
+from hdx.analysis_scripts.common.session import (
+    create_session,
+    get_source,
+    log_retry_counts,
+)
+from hdx.analysis_scripts.common.snapshots import (
+    SnapshotWriter,
+    get_dataset_from_dict,
+)
+from hdx.api.configuration import Configuration
 from hdx.data.dataset import Dataset
+from hdx.data.hdxobject import HDXError
 from hdx.data.organization import Organization
 from hdx.data.user import User
-from hdx.utilities.downloader import Download
+from hdx.utilities.downloader import Download, DownloadError
 from hdx.utilities.loader import load_yaml
-from hdx.utilities.saver import save_json
 
 logger = logging.getLogger(__name__)
 
@@ -29,9 +50,9 @@ COMMON_FILTER = """
   .filter(event => event.properties['user agent'] != '' && !containsAny(event.properties['user agent']) && !containsAny(event.properties['$browser']))
 """
 
-query_template = (
+QUERY_START = (
     COMMON_HEADER
-    + """
+    + """{dataset_ids}
 function main() {{
   return Events({{
     from_date: '{}',
@@ -39,8 +60,13 @@ function main() {{
     event_selectors: [{{event: "resource download"}}]
   }})"""
     + COMMON_FILTER
+    + """{dataset_filter}
+  .groupByUser(["properties.resource id","properties.dataset id",mixpanel.numeric_bucket('time',mixpanel.daily_time_buckets)],mixpanel.reducer.null())"""
+)
+
+query_template = (
+    QUERY_START
     + """
-  .groupByUser(["properties.resource id","properties.dataset id",mixpanel.numeric_bucket('time',mixpanel.daily_time_buckets)],mixpanel.reducer.null())
   .groupBy(["key.2"], mixpanel.reducer.count())
   .map(function(r){{
     return [
@@ -52,6 +78,198 @@ function main() {{
 """
 )
 
+# Downloads per dataset per day (the start of the day in ms since the epoch)
+daily_query_template = (
+    QUERY_START
+    + """
+  .groupBy(["key.2", "key.3"], mixpanel.reducer.count())
+  .map(function(r){{
+    return [
+      r.key[0],
+      r.key[1],
+      r.value
+    ];
+  }});
+}}
+"""
+)
+
+
+def get_jql_dataset_filter(dataset_ids):
+    """Get the constant and filter to add to the JQL query to only count
+    downloads of the given datasets or empty strings if dataset_ids is None.
+
+    Args:
+        dataset_ids (Optional[Sequence[str]]): Dataset ids
+
+    Returns:
+        Tuple[str, str]: JQL constant and filter
+    """
+    if dataset_ids is None:
+        return "", ""
+    return (
+        f"\nconst DATASET_IDS = {json.dumps(dict.fromkeys(dataset_ids, True))}",
+        "\n  .filter(event => DATASET_IDS[event.properties['dataset id']])",
+    )
+
+
+def get_date_shards(start_date, end_date, months):
+    """Split the window from start_date to end_date (both inclusive) into
+    consecutive non-overlapping windows of the given number of months.
+
+    Args:
+        start_date (datetime): Start date
+        end_date (datetime): End date
+        months (int): Months in each shard. If 0 or None, a single shard is returned.
+
+    Returns:
+        List[Tuple[str, str]]: List of (from date, to date) as YYYY-MM-DD
+    """
+    if not months:
+        return [(start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"))]
+    shards = []
+    i = 0
+    shard_start = start_date
+    while shard_start <= end_date:
+        i += 1
+        next_start = start_date + relativedelta(months=i * months)
+        shard_end = min(next_start - timedelta(days=1), end_date)
+        shards.append(
+            (shard_start.strftime("%Y-%m-%d"), shard_end.strftime("%Y-%m-%d"))
+        )
+        shard_start = next_start
+    return shards
+
+
+# The only organisation fields used by the scripts
+organisation_fields = (
+    "id",
+    "name",
+    "title",
+    "org_acronym",
+    "hdx_org_type",
+    "closed_organization",
+    "num_followers",
+)
+
+
+def project_organisation(organisation):
+    projected = {
+        key: organisation[key] for key in organisation_fields if key in organisation
+    }
+    projected["users"] = [
+        {"id": user["id"], "capacity": user["capacity"]}
+        for user in organisation.get("users", [])
+    ]
+    return projected
+
+
+# The only dataset and resource fields used by the scripts
+dataset_fields = (
+    "id",
+    "name",
+    "title",
+    "private",
+    "archived",
+    "is_requestdata_type",
+    "cod_level",
+    "metadata_created",
+    "metadata_modified",
+    "last_modified",
+    "review_date",
+    "dataset_date",
+    "data_update_frequency",
+    "updated_by_script",
+    "maintainer",
+    "organization",
+    "tags",
+    "resources",
+)
+resource_fields = ("id", "name", "url", "url_type")
+
+
+def tap_json_values(events, values):
+    # Pass ijson events through, recording the scalars at the prefixes in values
+    for prefix, event, value in events:
+        if prefix in values:
+            values[prefix] = value
+        yield prefix, event, value
+
+
+def get_bytes_read(response):
+    # Bytes read from the network (before any decompression)
+    tell = getattr(response.raw, "tell", None)
+    if tell is None:
+        return 0
+    return tell()
+
+
+def check_dataset_counts(number_of_datasets, counts):
+    """Warn if the datasets crawled do not match the counts given by
+    package_search, which means the catalogue changed during the crawl and
+    datasets may have been skipped.
+
+    Args:
+        number_of_datasets (int): Number of distinct datasets crawled
+        counts (Sequence[int]): Counts given by each page fetched in order
+
+    Returns:
+        bool: Whether the number of datasets and the counts match
+    """
+    if not counts:
+        return True
+    matches = True
+    if len(set(counts)) != 1:
+        logger.warning(
+            f"Dataset count changed during crawl from {counts[0]} to {counts[-1]}!"
+        )
+        matches = False
+    if number_of_datasets != counts[0]:
+        logger.warning(
+            f"Crawled {number_of_datasets} datasets but package_search counted "
+            f"{counts[0]}! Datasets may have been skipped."
+        )
+        matches = False
+    return matches
+
+
+def is_transient_error(error):
+    """Whether an error reading from CKAN is transient (eg. a dropped connection
+    or a server error that persisted through the session's retries) rather than
+    a response about the object read (eg. not authorised).
+
+    Args:
+        error (Optional[BaseException]): Error raised by the CKAN call
+
+    Returns:
+        bool: Whether the error is transient
+    """
+    if isinstance(error, (RequestException, ServerIncompatibleError)):
+        return True
+    # Errors CKAN reports (NotAuthorized etc.) are subclasses
+    return type(error) is CKANAPIError
+
+
+def project_dataset(dataset_dict):
+    projected = {
+        key: dataset_dict[key] for key in dataset_fields if key in dataset_dict
+    }
+    organisation = projected.get("organization")
+    if organisation:
+        projected["organization"] = {
+            key: organisation[key]
+            for key in ("id", "name", "title")
+            if key in organisation
+        }
+    if "tags" in projected:
+        projected["tags"] = [{"name": tag["name"]} for tag in projected["tags"]]
+    if "resources" in projected:
+        projected["resources"] = [
+            {key: resource.get(key) for key in resource_fields}
+            for resource in projected["resources"]
+        ]
+    return projected
+
 
 class Downloads:
     mixpanel_file = "mixpanel.json"
@@ -64,19 +282,148 @@ class Downloads:
     users_file = "users.json"
     aging_file = "aging.yaml"
 
-    def __init__(self, today, mixpanel_config_yaml, saved_dir=None):
+    def __init__(
+        self,
+        today,
+        mixpanel_config_yaml,
+        saved_dir=None,
+        page_size=1000,
+        user_lookup_workers=8,
+        organisations_page_size=400,
+        project_datasets=False,
+        pool_size=16,
+        retries=5,
+        backoff_factor=1,
+        backoff_jitter=1,
+        timeout=(10, 300),
+        mixpanel_shard_months=3,
+        mixpanel_workers=5,
+        mixpanel_rate_limit=(60, 3600),
+        mixpanel_retries=3,
+        checkpoint_dir=None,
+        resume=False,
+        progress_interval=60,
+        organisation=None,
+        mixpanel_api_url=None,
+    ):
+        # A resumed run continues with the run date of the checkpoint
+        if checkpoint_dir:
+            self.checkpoint = Checkpoint(checkpoint_dir, today, resume)
+            today = self.checkpoint.today
+        else:
+            self.checkpoint = None
         self.today = today
         self.mixpanel_config_yaml = mixpanel_config_yaml
         self.headers = {}
         self.saved_dir = saved_dir
+        self.page_size = page_size
+        self.user_lookup_workers = user_lookup_workers
+        self.organisations_page_size = organisations_page_size
+        # Keep only the fields used. This is done on the client as package_search
+        # with fl returns flat search index fields rather than dataset dicts.
+        self.project_datasets = project_datasets
+        self.maintainers = None
+        self.session_options = {
+            "pool_size": pool_size,
+            "retries": retries,
+            "backoff_factor": backoff_factor,
+            "backoff_jitter": backoff_jitter,
+            "timeout": timeout,
+        }
+        self.session = None
+        self.retry_counts = Counter()
+        self.bytes_downloaded = Counter()
+        self.progress = None
+        # JQL allows 5 concurrent queries and 60 queries an hour per project
+        self.mixpanel_shard_months = mixpanel_shard_months
+        self.mixpanel_workers = mixpanel_workers
+        calls, period = mixpanel_rate_limit
+        self.rate_limited_query_jql = sleep_and_retry(
+            limits(calls=calls, period=period)(self.query_jql)
+        )
+        self.mixpanel_retries = mixpanel_retries
+        self.mixpanel_api_url = mixpanel_api_url
+        self.progress_interval = progress_interval
+        # Name of the only organisation to download data for if given
+        self.organisation = organisation
+        self.organisation_dataset_ids = None
+        # Names of the organisations of a shard to download data for if set
+        self.shard_organisations = None
+        if saved_dir:
+            self.snapshot_writer = SnapshotWriter(saved_dir)
+        else:
+            self.snapshot_writer = None
 
     def set_api_key(self, api_key):
         self.headers = {"Authorization": api_key}
 
-    def get_mixpanel_downloads(self, months_ago):
-        end_date = self.today
-        start_date = end_date - relativedelta(months=months_ago)
-        logger.info("Getting downloads from MixPanel")
+    def close(self):
+        """Finish writing any snapshots still queued. Called at the end of each
+        run of the scripts whether or not it succeeded.
+
+        Returns:
+            None
+        """
+        if self.snapshot_writer:
+            self.snapshot_writer.close()
+
+    def set_shard_organisations(self, names):
+        """Only crawl the datasets of the given organisations (so only their
+        maintainers are looked up) and only keep their requests. Used when
+        running a shard so that each shard crawls its part of the catalogue.
+
+        Args:
+            names (Iterable[str]): Names of organisations
+
+        Returns:
+            None
+        """
+        self.shard_organisations = set(names)
+        logger.info(f"Crawling {len(self.shard_organisations)} organisations")
+
+    def get_checkpointed(self, name, function, *args):
+        if self.checkpoint is None:
+            return function(*args)
+        return self.checkpoint.get(name, function, *args)
+
+    @staticmethod
+    def query_jql(mputils, jql_query):
+        return mputils.query_jql(jql_query)
+
+    def get_mixpanel_shard(
+        self, mputils, from_date, to_date, dataset_ids=None, daily=False
+    ):
+        constant, dataset_filter = get_jql_dataset_filter(dataset_ids)
+        if daily:
+            template = daily_query_template
+            parse = list
+        else:
+            template = query_template
+            parse = dict
+        jql_query = template.format(
+            from_date, to_date, dataset_ids=constant, dataset_filter=dataset_filter
+        )
+        retries = 0
+        while True:
+            try:
+                return parse(self.rate_limited_query_jql(mputils, jql_query))
+            except BaseException as ex:
+                # mixpanel_utils raises a bare BaseException when its own
+                # retries run out and returns None (which fails to parse) on 429
+                if not isinstance(ex, Exception) and type(ex) is not BaseException:
+                    raise
+                if retries == self.mixpanel_retries:
+                    logger.error(f"MixPanel query {from_date} to {to_date} failed!")
+                    raise
+                retries += 1
+                wait = 2**retries + uniform(0, 1)
+                logger.warning(
+                    f"Retrying MixPanel query {from_date} to {to_date} in "
+                    f"{wait:.1f} seconds (retry {retries})"
+                )
+                sleep(wait)
+
+    def get_mputils(self):
         try:
             mixpanel_config = load_yaml(self.mixpanel_config_yaml)
             api_secret = mixpanel_config["api_secret"]
@@ -91,93 +438,507 @@ class Downloads:
             project_id=project_id,
             token=token,
         )
-        start_date_str = start_date.strftime("%Y-%m-%d")
-        end_date_str = end_date.strftime("%Y-%m-%d")
-        jql_query = query_template.format(
-            start_date_str,
-            end_date_str,
-        )
-        datasets_dict = dict(mputils.query_jql(jql_query))
+        if self.mixpanel_api_url:
+            mputils.formatted_api = self.mixpanel_api_url
+        return mputils
+
+    def get_mixpanel_shards(self, shards, daily=False):
+        """Query MixPanel for each of the given windows concurrently.
+
+        Args:
+            shards (List[Tuple[str, str]]): List of (from date, to date)
+            daily (bool): Whether to get downloads per day. Defaults to False.
+
+        Returns:
+            List: Result of each query
+        """
+        mputils = self.get_mputils()
+        checkpoint_prefix = "mixpanel_daily" if daily else "mixpanel"
+        if self.organisation:
+            dataset_ids = self.get_organisation_dataset_ids()
+            checkpoint_prefix = f"{checkpoint_prefix}_{self.organisation}"
+        else:
+            dataset_ids = None
+        with ThreadPoolExecutor(max_workers=self.mixpanel_workers) as executor:
+            futures = [
+                executor.submit(
+                    self.get_checkpointed,
+                    f"{checkpoint_prefix}_{shard[0]}_{shard[1]}",
+                    self.get_mixpanel_shard,
+                    mputils,
+                    *shard,
+                    dataset_ids,
+                    daily,
+                )
+                for shard in shards
+            ]
+            return [future.result() for future in futures]
+
+    def get_mixpanel_downloads(self, months_ago):
+        """Get downloads per dataset over the last months_ago months. The window
+        is split into shards of mixpanel_shard_months months which are queried
+        concurrently and summed. As downloads are deduplicated by user, resource
+        and day, the sums match a single query over the whole window.
+
+        Args:
+            months_ago (int): Number of months to go back
+
+        Returns:
+            Dict: Dataset id to number of downloads
+        """
+        end_date = self.today
+        start_date = end_date - relativedelta(months=months_ago)
+        logger.info("Getting downloads from MixPanel")
+        shards = get_date_shards(start_date, end_date, self.mixpanel_shard_months)
+        datasets_dict = {}
+        for result in self.get_mixpanel_shards(shards):
+            for dataset_id, count in result.items():
+                datasets_dict[dataset_id] = datasets_dict.get(dataset_id, 0) + count
+        logger.info(f"Summed MixPanel downloads from {len(shards)} queries")
+        start_date_str, end_date_str = shards[0][0], shards[-1][1]
         if self.saved_dir:
             filename = self.mixpanel_file.replace(
                 ".json", f"_{start_date_str}-{end_date_str}.json"
             )
-            save_json(datasets_dict, join(self.saved_dir, filename))
+            self.snapshot_writer.save(datasets_dict, filename)
         return datasets_dict
 
+    def get_mixpanel_daily_downloads(self, start_date, end_date):
+        """Get downloads per dataset per day from start_date to end_date (both
+        inclusive). Days are the UTC days into which MixPanel buckets downloads
+        when deduplicating them, so summing the days of a window gives the
+        downloads of that window.
+
+        Args:
+            start_date (datetime): Start date
+            end_date (datetime): End date
+
+        Returns:
+            Dict[str, Dict[str, int]]: Dataset id to day (YYYY-MM-DD) to downloads
+        """
+        logger.info("Getting daily downloads from MixPanel")
+        shards = get_date_shards(start_date, end_date, self.mixpanel_shard_months)
+        dataset_id_to_days = {}
+        for result in self.get_mixpanel_shards(shards, daily=True):
+            for dataset_id, day, count in result:
+                day = (
+                    datetime.fromtimestamp(day / 1000, timezone.utc).date().isoformat()
+                )
+                days = dataset_id_to_days.setdefault(dataset_id, {})
+                days[day] = days.get(day, 0) + count
+        logger.info(f"Got daily MixPanel downloads from {len(shards)} queries")
+        if self.saved_dir:
+            filename = self.mixpanel_file.replace(
+                ".json", f"_daily_{shards[0][0]}-{shards[-1][1]}.json"
+            )
+            self.snapshot_writer.save(dataset_id_to_days, filename)
+        return dataset_id_to_days
+
+    def get_session(self):
+        """Get the pooled session shared by all sources, creating it on first use.
+        The CKAN helpers (eg. User.read_from_hdx) are set up to use it too.
+
+        Returns:
+            Session: requests session
+        """
+        if self.session is None:
+            configuration = Configuration.read()
+            self.session = create_session(
+                configuration.get_user_agent(),
+                self.retry_counts,
+                **self.session_options,
+            )
+            configuration.setup_session_remoteckan(session=self.session)
+        return self.session
+
+    def get_downloader(self):
+        # Closing this downloader would close the shared session, so only its
+        # response should be closed
+        return Download(session=self.get_session())
+
+    def log_retry_counts(self):
+        log_retry_counts(self.retry_counts)
+
+    @staticmethod
+    def get_hdx_url(path):
+        hdx_site_url = Configuration.read().get_hdx_site_url()
+        return f"{hdx_site_url}/{path}"
+
+    def get_ckan_action_url(self, action):
+        return self.get_hdx_url(f"api/action/{action}")
+
+    def stream_json_items(self, url, prefix, response_info=None, **kwargs):
+        """Stream the items at prefix from the JSON returned by url. If a
+        response_info dictionary is given, it is filled with the number of bytes
+        read from the network and the values of any of its keys that are
+        prefixes of scalars in the JSON (eg. result.count).
+
+        Args:
+            url (str): URL to download
+            prefix (str): ijson prefix of items eg. result.item
+            response_info (Optional[Dict]): Dictionary to fill. Defaults to None.
+            **kwargs: Keyword arguments to pass to Download.setup
+
+        Returns:
+            Iterator[Any]: Items at prefix
+        """
+        downloader = self.get_downloader()
+        response = None
+        try:
+            response = downloader.setup(url, headers=self.headers, **kwargs)
+            if hasattr(response.raw, "decode_content"):
+                response.raw.decode_content = True
+            if response_info is None:
+                yield from ijson.items(response.raw, prefix, use_float=True)
+            else:
+                events = ijson.parse(response.raw, use_float=True)
+                yield from ijson.items(tap_json_values(events, response_info), prefix)
+        finally:
+            if response is not None:
+                number_of_bytes = get_bytes_read(response)
+                self.bytes_downloaded[get_source(url)] += number_of_bytes
+                if response_info is not None:
+                    response_info["bytes"] = number_of_bytes
+            downloader.close_response()
+
+    def get_datasets_page(self, url, n, page_info=None, fq=None):
+        parameters = {
+            "q": "*:*",
+            "include_private": True,
+            "sort": "metadata_created asc",
+            "rows": self.page_size,
+            "start": n * self.page_size,
+        }
+        fqs = []
+        if self.organisation:
+            fqs.append(f"organization:{self.organisation}")
+        if self.shard_organisations is not None:
+            if not self.shard_organisations:
+                return []
+            names = " OR ".join(f'"{x}"' for x in sorted(self.shard_organisations))
+            fqs.append(f"organization:({names})")
+        if fq:
+            fqs.append(fq)
+        if fqs:
+            parameters["fq"] = " AND ".join(fqs)
+        return list(
+            self.stream_json_items(
+                url,
+                "result.results.item",
+                response_info=page_info,
+                post=True,
+                parameters=parameters,
+                json_string=True,
+            )
+        )
+
+    def fetch_datasets_page(self, url, n, page_info, fq=None):
+        dataset_dicts = self.get_datasets_page(url, n, page_info, fq)
+        if self.project_datasets:
+            dataset_dicts = [
+                project_dataset(dataset_dict) for dataset_dict in dataset_dicts
+            ]
+        return dataset_dicts
+
     def get_all_datasets(self):
         logger.info("Examining all datasets")
-        datasets = Dataset.get_all_datasets(include_private=True)
-        if self.saved_dir:
-            datasets_list = []
-            n = -1
+        url = self.get_ckan_action_url(Dataset.actions()["search"])
+        progress = ProgressReporter("datasets", self.progress_interval)
+        self.progress = progress
+        checkpoint = self.checkpoint
+        if checkpoint and self.maintainers is not None:
+            if checkpoint.has("maintainers"):
+                self.maintainers.update(checkpoint.load("maintainers"))
+        # Paging by offset over a catalogue that changes during the crawl can
+        # return a dataset twice or skip one, so duplicates are dropped and the
+        # number of datasets is checked against the counts CKAN gives
+        seen_ids = set()
+        counts = []
+        n = 0
+        while True:
+            checkpoint_name = f"datasets_{n}"
+            if checkpoint and checkpoint.has(checkpoint_name):
+                logger.info(f"Loading {checkpoint_name} from checkpoint")
+                dataset_dicts = checkpoint.load(checkpoint_name)
+                progress.add_page()
+                from_checkpoint = True
+            else:
+                page_info = {"result.count": None, "bytes": 0}
+                dataset_dicts = self.fetch_datasets_page(url, n, page_info)
+                progress.add_page(page_info["result.count"], page_info["bytes"])
+                if page_info["result.count"] is not None:
+                    counts.append(page_info["result.count"])
+                from_checkpoint = False
+            if self.saved_dir:
+                filename = self.datasets_file.replace(".json", f"_{n}.json")
+                self.snapshot_writer.save(dataset_dicts, filename)
+            if self.maintainers is not None:
+                self.lookup_maintainers(dataset_dicts)
+            # The page is only checkpointed once its maintainers have been saved
+            if checkpoint and not from_checkpoint:
+                if self.maintainers is not None:
+                    checkpoint.save("maintainers", self.maintainers)
+                checkpoint.save(checkpoint_name, dataset_dicts)
+            # Each dataset counts as processed once the caller asks for the next
+            for dataset_dict in dataset_dicts:
+                dataset_id = dataset_dict["id"]
+                if dataset_id in seen_ids:
+                    logger.warning(
+                        f"Dropping dataset {dataset_id} returned more than once by "
+                        "package_search"
+                    )
+                    continue
+                seen_ids.add(dataset_id)
+                yield get_dataset_from_dict(dataset_dict)
+                progress.add_processed()
+            if len(dataset_dicts) < self.page_size:
+                break
+            n += 1
+        check_dataset_counts(len(seen_ids), counts)
+        if self.snapshot_writer:
+            if self.maintainers is not None:
+                self.snapshot_writer.save(self.maintainers, self.users_file)
+            self.snapshot_writer.join()
+        progress.log_summary()
+        self.log_retry_counts()
 
-            def save_next():
-                nonlocal n
+    def get_organisation_dataset_ids(self):
+        """Get the ids of the datasets of the organisation given on creation.
 
-                if n >= 0:
-                    filename = self.datasets_file.replace(".json", f"_{n}.json")
-                    save_json(datasets_list, join(self.saved_dir, filename))
-                    datasets_list.clear()
+        Returns:
+            List[str]: Dataset ids
+        """
+        if self.organisation_dataset_ids is None:
+            url = self.get_ckan_action_url(Dataset.actions()["search"])
+            dataset_ids = []
+            n = 0
+            while True:
+                parameters = {
+                    "q": "*:*",
+                    "fq": f"organization:{self.organisation}",
+                    "fl": "id",
+                    "include_private": True,
+                    "sort": "metadata_created asc",
+                    "rows": self.page_size,
+                    "start": n * self.page_size,
+                }
+                page = list(
+                    self.stream_json_items(
+                        url,
+                        "result.results.item.id",
+                        post=True,
+                        parameters=parameters,
+                        json_string=True,
+                    )
+                )
+                dataset_ids.extend(page)
+                if len(page) < self.page_size:
+                    break
                 n += 1
+            logger.info(f"{len(dataset_ids)} datasets in {self.organisation}")
+            self.organisation_dataset_ids = dataset_ids
+        return self.organisation_dataset_ids
 
-            for i, dataset in enumerate(datasets):
-                if i % 1000 == 0:
-                    save_next()
-                datasets_list.append(dataset.get_dataset_dict())
-            save_next()
+    def get_datasets_modified_since(self, since):
+        """Get the dicts of datasets whose metadata was modified at or after
+        since. Deleted datasets are not returned.
 
-        return datasets
+        Args:
+            since (datetime): Date from which to get modified datasets
+
+        Returns:
+            List[Dict]: Dataset dicts
+        """
+        url = self.get_ckan_action_url(Dataset.actions()["search"])
+        fq = f"metadata_modified:[{since.strftime('%Y-%m-%dT%H:%M:%SZ')} TO *]"
+        dataset_dicts = []
+        n = 0
+        while True:
+            page_info = {"result.count": None, "bytes": 0}
+            page = self.fetch_datasets_page(url, n, page_info, fq)
+            dataset_dicts.extend(page)
+            if len(page) < self.page_size:
+                break
+            n += 1
+        logger.info(f"{len(dataset_dicts)} datasets modified since {since}")
+        return dataset_dicts
 
     def get_geospatiality_locations(self, url):
         logger.info("Downloading organisation geospatiality and location lookup")
-        lookups = Download().download_tabular_cols_as_dicts(url)
+        lookups = self.get_checkpointed(
+            "geospatiality_locations",
+            self.get_downloader().download_tabular_cols_as_dicts,
+            url,
+        )
         geospatiality = lookups["Geospatiality"]
         locations = lookups["Location (ISO 3)"]
         if self.saved_dir:
-            save_json(geospatiality, join(self.saved_dir, self.geospatiality_file))
-            save_json(locations, join(self.saved_dir, self.locations_file))
+            self.snapshot_writer.save(geospatiality, self.geospatiality_file)
+            self.snapshot_writer.save(locations, self.locations_file)
         return geospatiality, locations
 
     def get_package_links(self):
         logger.info("Downloading links to data explorers and grids")
-        json = Download().download_json(
-            "https://data.humdata.org/api/action/hdx_package_links_settings_show"
+        json = self.get_checkpointed(
+            "package_links",
+            self.get_downloader().download_json,
+            self.get_ckan_action_url("hdx_package_links_settings_show"),
         )
         if self.saved_dir:
-            save_json(json, join(self.saved_dir, self.packagelinks_file))
+            self.snapshot_writer.save(json, self.packagelinks_file)
         return json
 
     def get_requests(self):
         logger.info("Downloading HDX Connect requests")
-        json = Download(headers=self.headers).download_json(
-            "https://data.humdata.org/ckan-admin/requests_data/download?format=json"
-        )
+        checkpoint = self.checkpoint
+        if checkpoint and checkpoint.has("requests"):
+            logger.info("Loading requests from checkpoint")
+            requests = checkpoint.load("requests")
+            yield from requests
+        else:
+            requests = []
+            for request in self.stream_json_items(
+                self.get_hdx_url("ckan-admin/requests_data/download?format=json"),
+                "item",
+            ):
+                # Requests can only be downloaded all together
+                organisation_name = request["pkg_organization_name"]
+                if self.organisation and organisation_name != self.organisation:
+                    continue
+                if (
+                    self.shard_organisations is not None
+                    and organisation_name not in self.shard_organisations
+                ):
+                    continue
+                if self.saved_dir or checkpoint:
+                    requests.append(request)
+                yield request
+            if checkpoint:
+                checkpoint.save("requests", requests)
         if self.saved_dir:
-            save_json(json, join(self.saved_dir, self.hdxconnect_file))
-        return json
+            self.snapshot_writer.save(requests, self.hdxconnect_file)
+
+    def get_organisations_page(self, url, offset):
+        parameters = {
+            "all_fields": True,
+            "include_extras": True,
+            "include_users": True,
+            "include_followers": True,
+            "limit": self.organisations_page_size,
+            "offset": offset,
+        }
+        for organisation in self.stream_json_items(
+            url, "result.item", post=True, parameters=parameters, json_string=True
+        ):
+            yield project_organisation(organisation)
+
+    def get_organisation(self, name):
+        url = self.get_ckan_action_url(Organization.actions()["show"])
+        parameters = {"id": name, "include_datasets": False, "include_followers": True}
+        try:
+            for organisation in self.stream_json_items(
+                url, "result", post=True, parameters=parameters, json_string=True
+            ):
+                return project_organisation(organisation)
+        except DownloadError:
+            logger.exception(f"Could not read organisation {name}!")
+        return None
 
     def get_all_organisations(self):
         logger.info("Obtaining organisations data")
-        organisation_list = Organization.get_all_organization_names(
-            all_fields=True,
-            include_extras=True,
-            include_users=True,
-            include_followers=True,
+        organisations = self.get_checkpointed(
+            "organisations", self.download_all_organisations
         )
+        if self.saved_dir:
+            self.snapshot_writer.save(organisations, self.organisations_file)
+        return organisations
+
+    def download_all_organisations(self):
+        if self.organisation:
+            organisation = self.get_organisation(self.organisation)
+            if organisation is None:
+                raise ValueError(f"Organisation {self.organisation} not found!")
+            return {organisation["id"]: organisation}
+        url = self.get_ckan_action_url(Organization.actions()["list"])
+        # Keyed by name so that entries shifted across pages are deduplicated
+        name_to_organisation = {}
+        offset = 0
+        while True:
+            no_results = 0
+            for organisation in self.get_organisations_page(url, offset):
+                name_to_organisation[organisation["name"]] = organisation
+                no_results += 1
+            if no_results < self.organisations_page_size:
+                break
+            offset += self.organisations_page_size
+        # The list of names taken last is the ground truth: organisations created
+        # while paging are read individually and deleted ones are dropped
         organisations = {}
-        for organisation in organisation_list:
+        for name in self.stream_json_items(
+            url, "result.item", post=True, parameters={}, json_string=True
+        ):
+            organisation = name_to_organisation.get(name)
+            if organisation is None:
+                organisation = self.get_organisation(name)
+                if organisation is None:
+                    continue
             organisations[organisation["id"]] = organisation
-        if self.saved_dir:
-            save_json(organisations, join(self.saved_dir, self.organisations_file))
         return organisations
 
     def get_all_users(self):
         logger.info("Obtaining user data")
-        user_list = User.get_all_users()
-        users = {}
-        for user in user_list:
-            users[user["id"]] = user.data
+        users = self.get_checkpointed("users", self.download_all_users)
         if self.saved_dir:
-            save_json(users, join(self.saved_dir, self.users_file))
+            self.snapshot_writer.save(users, self.users_file)
+        return users
+
+    @staticmethod
+    def download_all_users():
+        users = {}
+        for user in User.get_all_users():
+            users[user["id"]] = user["sysadmin"]
         return users
+
+    def get_maintainers(self):
+        """Alternative to get_all_users which returns a dictionary of user id to
+        sysadmin flag that starts empty and is filled in during the dataset crawl
+        with just the users that are dataset maintainers.
+
+        Returns:
+            Dict: User id to sysadmin flag (None if user does not exist)
+        """
+        logger.info("Maintainers will be looked up during the dataset crawl")
+        self.maintainers = {}
+        return self.maintainers
+
+    @staticmethod
+    def get_user_sysadmin(user_id):
+        try:
+            user = User.read_from_hdx(user_id)
+        except HDXError as e:
+            if is_transient_error(e.__cause__):
+                raise
+            logger.warning(
+                f"Maintainer {user_id} is invalid as they could not be read: "
+                f"{e.__cause__!r}"
+            )
+            return user_id, None
+        # deleted users are not returned by user_list
+        if user is None or user["state"] == "deleted":
+            return user_id, None
+        return user_id, user["sysadmin"]
+
+    def lookup_maintainers(self, dataset_dicts):
+        user_ids = set()
+        for dataset_dict in dataset_dicts:
+            user_id = dataset_dict.get("maintainer")
+            if user_id and user_id not in self.maintainers:
+                user_ids.add(user_id)
+        if not user_ids:
+            return
+        with ThreadPoolExecutor(max_workers=self.user_lookup_workers) as executor:
+            for user_id, sysadmin in executor.map(self.get_user_sysadmin, user_ids):
+                self.maintainers[user_id] = sysadmin
+        logger.info(
+            f"Looked up {len(user_ids)} maintainers ({len(self.maintainers)} in total)"
+        )
@@ -0,0 +1,110 @@
+import logging
+import sqlite3
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Table name to the columns that identify a row within a run
+tables = {
+    "org_stats": ("Organisation name",),
+    "total_stats": (),
+    "datasets": ("id",),
+}
+
+
+def quote(identifier):
+    escaped = identifier.replace('"', '""')
+    return f'"{escaped}"'
+
+
+class HistoryStore:
+    """Append-only SQLite store of the rows output by each run keyed by run
+    date. Rerunning for the same date replaces that date's rows. Each table is
+    indexed on its key columns and run date so that the time series of one
+    column for one organisation, dataset or the totals is an index lookup.
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_columns(self, table):
+        cursor = self.connection.execute(f"PRAGMA table_info({quote(table)})")
+        return [row[1] for row in cursor]
+
+    def setup_table(self, table, headers):
+        key_columns = tables[table]
+        columns = self.get_columns(table)
+        if not columns:
+            column_definitions = ", ".join(
+                quote(header) for header in ["run_date", *headers]
+            )
+            primary_key = ", ".join(quote(x) for x in ("run_date", *key_columns))
+            self.connection.execute(
+                f"CREATE TABLE {quote(table)} ({column_definitions}, "
+                f"PRIMARY KEY ({primary_key}))"
+            )
+            if key_columns:
+                index_columns = ", ".join(quote(x) for x in (*key_columns, "run_date"))
+                self.connection.execute(
+                    f"CREATE INDEX {quote(f'{table}_key_run_date')} "
+                    f"ON {quote(table)} ({index_columns})"
+                )
+            return
+        for header in headers:
+            if header not in columns:
+                self.connection.execute(
+                    f"ALTER TABLE {quote(table)} ADD COLUMN {quote(header)}"
+                )
+
+    def append(self, table, run_date, headers, rows):
+        self.setup_table(table, headers)
+        column_names = ", ".join(quote(header) for header in ["run_date", *headers])
+        placeholders = ", ".join("?" * (len(headers) + 1))
+        values = ([run_date] + [convert_value(value) for value in row] for row in rows)
+        # A rerun replaces all of that date's rows including any no longer output
+        with self.connection:
+            self.connection.execute(
+                f"DELETE FROM {quote(table)} WHERE run_date = ?", (run_date,)
+            )
+            self.connection.executemany(
+                f"INSERT INTO {quote(table)} ({column_names}) VALUES ({placeholders})",
+                values,
+            )
+        logger.info(f"Appended {table} for {run_date} to history")
+
+    def get_series(self, table, column, key=None):
+        if column not in self.get_columns(table):
+            raise ValueError(f"Unknown column {column} in {table}!")
+        key_columns = tables[table]
+        query = f"SELECT run_date, {quote(column)} FROM {quote(table)}"
+        if key_columns:
+            query = f"{query} WHERE {quote(key_columns[0])} = ?"
+            parameters = (key,)
+        else:
+            parameters = ()
+        cursor = self.connection.execute(f"{query} ORDER BY run_date", parameters)
+        return cursor.fetchall()
+
+    def get_org_series(self, organisation_name, column):
+        return self.get_series("org_stats", column, organisation_name)
+
+    def get_dataset_series(self, dataset_id, column):
+        return self.get_series("datasets", column, dataset_id)
+
+    def get_total_series(self, column):
+        return self.get_series("total_stats", column)
+
+
+def convert_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
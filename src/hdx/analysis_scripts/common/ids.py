@@ -0,0 +1,84 @@
+from array import array
+
+from hdx.analysis_scripts.common import NO_REQUESTS
+
+
+class DatasetIndex:
+    """Assigns dense integers to dataset ids as they are loaded so that
+    download and request counts can be kept in typed arrays indexed by those
+    integers rather than in dictionaries keyed by UUID strings. Arrays only
+    cover the datasets that had counts when they were loaded, so datasets
+    first seen later in the crawl get a count of 0.
+    """
+
+    def __init__(self):
+        self.id_to_index = {}
+        self.ids = []
+        self.counts = {}
+        self.requests = array("q")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def get_index(self, dataset_id):
+        """Get the integer for a dataset id, assigning the next one if the id
+        has not been seen before.
+
+        Args:
+            dataset_id (str): Dataset id
+
+        Returns:
+            int: Dataset index
+        """
+        index = self.id_to_index.get(dataset_id)
+        if index is None:
+            index = len(self.ids)
+            self.id_to_index[dataset_id] = index
+            self.ids.append(dataset_id)
+        return index
+
+    def add_counts(self, name, dataset_id_to_count):
+        """Store counts by dataset id (eg. downloads) under a name.
+
+        Args:
+            name (str): Name of counts eg. downloads last 90 days
+            dataset_id_to_count (Dict[str, int]): Counts by dataset id
+
+        Returns:
+            None
+        """
+        for dataset_id in dataset_id_to_count:
+            self.get_index(dataset_id)
+        counts = array("q", bytes(8 * len(self.ids)))
+        for dataset_id, count in dataset_id_to_count.items():
+            counts[self.id_to_index[dataset_id]] = count
+        self.counts[name] = counts
+
+    def get_count(self, name, index):
+        counts = self.counts[name]
+        if index < len(counts):
+            return counts[index]
+        return 0
+
+    def add_requests(self, dataset_id_to_requests):
+        """Store request counts by dataset id as five consecutive entries per
+        dataset: new, open, archived, shared and denied.
+
+        Args:
+            dataset_id_to_requests (Dict[str, Tuple]): Request counts by dataset id
+
+        Returns:
+            None
+        """
+        for dataset_id in dataset_id_to_requests:
+            self.get_index(dataset_id)
+        self.requests = array("q", bytes(self.requests.itemsize * 5 * len(self.ids)))
+        for dataset_id, counts in dataset_id_to_requests.items():
+            start = self.id_to_index[dataset_id] * 5
+            self.requests[start : start + 5] = array("q", counts)
+
+    def get_requests(self, index):
+        start = index * 5
+        if start < len(self.requests):
+            return tuple(self.requests[start : start + 5])
+        return NO_REQUESTS
@@ -0,0 +1,140 @@
+import logging
+from os import replace
+from time import monotonic, time
+
+logger = logging.getLogger(__name__)
+
+
+def escape_label_value(value):
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+class RunMetrics:
+    """Collects metrics about a run (phase durations, bytes downloaded, cache
+    hit rates, totals etc.) and writes them in the OpenMetrics text format so
+    that they can be picked up by eg. the Prometheus node exporter's textfile
+    collector. Every metric is a gauge named hdx_analysis_<name> with a script
+    label.
+
+    Args:
+        script (str): Name of script eg. org_stats
+        clock (Callable[[], float]): Clock for phase durations. Defaults to
+            time.monotonic.
+    """
+
+    prefix = "hdx_analysis"
+
+    def __init__(self, script, clock=monotonic):
+        self.script = script
+        self.clock = clock
+        self.metrics = {}
+        self.phase = None
+        self.phase_start = None
+
+    def set(self, name, value, help_text, **labels):
+        """Set the value of a metric for the given labels.
+
+        Args:
+            name (str): Metric name without prefix eg. downloaded_bytes
+            value (float): Value
+            help_text (str): Description of metric
+            **labels: Labels of this value eg. source="package_search"
+
+        Returns:
+            None
+        """
+        _, values = self.metrics.setdefault(name, (help_text, {}))
+        values[tuple(sorted(labels.items()))] = value
+
+    def get(self, name, **labels):
+        _, values = self.metrics[name]
+        return values[tuple(sorted(labels.items()))]
+
+    def start_phase(self, phase):
+        """End any current phase and start timing a new one.
+
+        Args:
+            phase (str): Phase name eg. crawl
+
+        Returns:
+            None
+        """
+        self.end_phase()
+        self.phase = phase
+        self.phase_start = self.clock()
+
+    def end_phase(self):
+        if self.phase is None:
+            return
+        self.set(
+            "phase_duration_seconds",
+            self.clock() - self.phase_start,
+            "Time taken by each phase of the run",
+            phase=self.phase,
+        )
+        self.phase = None
+
+    def add_downloads(self, downloads):
+        """Add the bytes downloaded and retries made per source and the datasets
+        and pages crawled by a Downloads object.
+
+        Args:
+            downloads (Downloads): Downloads object used by the run
+
+        Returns:
+            None
+        """
+        for source, number_of_bytes in downloads.bytes_downloaded.items():
+            self.set(
+                "downloaded_bytes",
+                number_of_bytes,
+                "Bytes downloaded from each source before decompression",
+                source=source,
+            )
+        for source, retries in downloads.retry_counts.items():
+            self.set("retries", retries, "Retries made for each source", source=source)
+        progress = downloads.progress
+        if progress:
+            self.set("datasets_crawled", progress.processed, "Datasets crawled")
+            self.set("dataset_pages", progress.pages, "Pages of datasets crawled")
+            if progress.total is not None:
+                self.set("catalogue_datasets", progress.total, "Datasets in CKAN")
+
+    def set_ratio(self, name, numerator, denominator, help_text, **labels):
+        # Undefined ratios are left out rather than written as NaN
+        if denominator:
+            self.set(name, numerator / denominator, help_text, **labels)
+
+    def get_text(self):
+        lines = []
+        script = escape_label_value(self.script)
+        for name, (help_text, values) in self.metrics.items():
+            full_name = f"{self.prefix}_{name}"
+            lines.append(f"# TYPE {full_name} gauge")
+            lines.append(f"# HELP {full_name} {help_text}")
+            for labels, value in values.items():
+                label_strs = [f'script="{script}"']
+                for key, label_value in labels:
+                    label_strs.append(f'{key}="{escape_label_value(label_value)}"')
+                lines.append(f"{full_name}{{{','.join(label_strs)}}} {value}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write the metrics with the time of writing to path. The file is
+        written under a temporary name and moved into place so that a collector
+        never reads a partial file.
+
+        Args:
+            path (str): Path of metrics file
+
+        Returns:
+            None
+        """
+        self.end_phase()
+        self.set("last_run_timestamp_seconds", time(), "Time at which the run finished")
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(self.get_text())
+        replace(temp_path, path)
+        logger.info(f"Metrics written to {path}")
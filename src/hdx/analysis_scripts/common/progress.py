@@ -0,0 +1,90 @@
+import logging
+from time import monotonic
+
+logger = logging.getLogger(__name__)
+
+
+def format_bytes(number_of_bytes):
+    for unit in ("B", "KB", "MB", "GB"):
+        if number_of_bytes < 1024 or unit == "GB":
+            break
+        number_of_bytes /= 1024
+    if unit == "B":
+        return f"{number_of_bytes}B"
+    return f"{number_of_bytes:.1f}{unit}"
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}h{minutes:02d}m{seconds:02d}s"
+    if minutes:
+        return f"{minutes}m{seconds:02d}s"
+    return f"{seconds}s"
+
+
+class ProgressReporter:
+    """Logs how far through a crawl a run is at most every interval seconds:
+    datasets processed per second, pages fetched, bytes downloaded and, once
+    the total is known from CKAN, an estimate of the time remaining. A summary
+    of the throughput is logged when the crawl finishes.
+
+    Args:
+        name (str): What is being processed eg. datasets
+        interval (float): Seconds between progress lines. Defaults to 60.
+        clock (Callable[[], float]): Clock to use. Defaults to time.monotonic.
+    """
+
+    def __init__(self, name, interval=60, clock=monotonic):
+        self.name = name
+        self.interval = interval
+        self.clock = clock
+        self.start = clock()
+        self.last_report = self.start
+        self.total = None
+        self.processed = 0
+        self.pages = 0
+        self.bytes = 0
+
+    def add_page(self, total=None, number_of_bytes=0):
+        self.pages += 1
+        self.bytes += number_of_bytes
+        if total is not None:
+            self.total = total
+
+    def add_processed(self):
+        self.processed += 1
+        now = self.clock()
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            logger.info(self.get_progress(now))
+
+    def get_rate(self, now):
+        elapsed = now - self.start
+        if elapsed <= 0:
+            return 0.0
+        return self.processed / elapsed
+
+    def get_progress(self, now):
+        rate = self.get_rate(now)
+        processed = f"{self.processed}"
+        eta = ""
+        if self.total:
+            percentage = min(self.processed / self.total, 1)
+            processed = f"{processed}/{self.total} ({percentage:.1%})"
+            if rate > 0:
+                remaining = max(self.total - self.processed, 0) / rate
+                eta = f", ETA {format_duration(remaining)}"
+        return (
+            f"{processed} {self.name} at {rate:.1f}/s, {self.pages} pages, "
+            f"{format_bytes(self.bytes)} downloaded{eta}"
+        )
+
+    def log_summary(self):
+        now = self.clock()
+        logger.info(
+            f"Processed {self.processed} {self.name} in "
+            f"{format_duration(now - self.start)} at {self.get_rate(now):.1f}/s "
+            f"from {self.pages} pages ({format_bytes(self.bytes)} downloaded)"
+        )
@@ -0,0 +1,112 @@
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from dateutil.relativedelta import relativedelta
+
+from hdx.analysis_scripts.common import get_aging, get_previous_quarter
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+
+def get_timestamp(date):
+    """Get the exact number of microseconds since the epoch of a timezone aware
+    datetime. Epoch seconds as floats would lose the microseconds.
+
+    Args:
+        date (datetime): Timezone aware datetime
+
+    Returns:
+        int: Microseconds since the epoch
+    """
+    return (date - EPOCH) // ONE_MICROSECOND
+
+
+def get_cutoffs(today, aging):
+    """Turn aging thresholds per update frequency into cutoff timestamps sorted
+    in ascending order with the status that applies at or before each cutoff.
+    A date of today - threshold or earlier has aged by at least the threshold.
+
+    Args:
+        today (datetime): Date of run
+        aging (Dict[int, Dict[str, timedelta]]): Aging from get_aging
+
+    Returns:
+        Dict[int, Tuple[Tuple[int, ...], Tuple[str, ...]]]: Cutoffs and statuses
+    """
+    cutoffs = {}
+    for update_frequency, thresholds in aging.items():
+        # Thresholds are configured from least to most aged and the most aged
+        # status wins when cutoffs are equal, so sort stably in reverse
+        status_cutoffs = sorted(
+            (
+                (get_timestamp(today - threshold), status)
+                for status, threshold in reversed(thresholds.items())
+            ),
+            key=lambda x: x[0],
+        )
+        cutoffs[update_frequency] = (
+            tuple(cutoff for cutoff, _ in status_cutoffs),
+            tuple(status for _, status in status_cutoffs),
+        )
+    return cutoffs
+
+
+@dataclass(frozen=True)
+class RunContext:
+    """Values that are the same for every dataset in a run, computed once. Dates
+    are held as microseconds since the epoch so that checks against them are
+    integer comparisons.
+    """
+
+    today: datetime
+    today_timestamp: int
+    last_3_months_timestamp: int
+    previous_quarter_timestamps: tuple
+    last_modified_cutoffs: dict
+    end_date_cutoffs: dict
+
+    @classmethod
+    def create(cls, today, configuration):
+        previous_quarter = get_previous_quarter(today)
+        return cls(
+            today=today,
+            today_timestamp=get_timestamp(today),
+            last_3_months_timestamp=get_timestamp(today - relativedelta(months=3)),
+            previous_quarter_timestamps=(
+                get_timestamp(previous_quarter[0]),
+                get_timestamp(previous_quarter[1]),
+            ),
+            last_modified_cutoffs=get_cutoffs(
+                today, get_aging(configuration["last_modified_aging"])
+            ),
+            end_date_cutoffs=get_cutoffs(
+                today, get_aging(configuration["end_date_aging"])
+            ),
+        )
+
+    def is_last_3_months(self, timestamp):
+        return self.last_3_months_timestamp < timestamp <= self.today_timestamp
+
+    def is_previous_quarter(self, timestamp):
+        start, end = self.previous_quarter_timestamps
+        return start <= timestamp <= end
+
+    def get_last_modified_freshness(self, timestamp, update_frequency):
+        """Get "Fresh", "Due", "Overdue" or "Delinquent" for a last modified
+        timestamp and expected update frequency."""
+        cutoffs, statuses = self.last_modified_cutoffs[update_frequency]
+        index = bisect_left(cutoffs, timestamp)
+        if index == len(cutoffs):
+            return "Fresh"
+        return statuses[index]
+
+    def get_end_date_uptodate(self, timestamp, update_frequency):
+        """Get "UpToDate" or "OutOfDate" for an end date timestamp and expected
+        update frequency."""
+        cutoffs, statuses = self.end_date_cutoffs[update_frequency]
+        index = bisect_left(cutoffs, timestamp)
+        if index == len(cutoffs):
+            return "UpToDate"
+        return statuses[index]
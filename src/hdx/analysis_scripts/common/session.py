@@ -0,0 +1,102 @@
+import logging
+from os.path import basename
+from urllib.parse import urlsplit
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+def get_source(url):
+    """Name used in the logs for the source of a url: the last part of its path
+    (eg. the CKAN action) or the host if there is no path."""
+    spliturl = urlsplit(url)
+    return basename(spliturl.path.rstrip("/")) or spliturl.netloc or url
+
+
+class CountingRetry(Retry):
+    """Retry that counts the retries made for each source in a Counter shared
+    by the copies urllib3 makes of it on every retry."""
+
+    retry_counts = None
+
+    def increment(self, method=None, url=None, *args, **kwargs):
+        new_retry = super().increment(method, url, *args, **kwargs)
+        new_retry.retry_counts = self.retry_counts
+        if self.retry_counts is not None:
+            source = get_source(url or "")
+            self.retry_counts[source] += 1
+            logger.warning(
+                f"Retrying {method} {source} (retry {len(new_retry.history)})"
+            )
+        return new_retry
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that applies a default timeout to requests made without one."""
+
+    def __init__(self, timeout, *args, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def create_session(
+    user_agent,
+    retry_counts,
+    pool_size=16,
+    retries=5,
+    backoff_factor=1,
+    backoff_jitter=1,
+    timeout=(10, 300),
+):
+    """Create a session with a connection pool of pool_size, gzip compression,
+    exponential backoff with jitter and a default (connect, read) timeout.
+    Retries made are counted by source in retry_counts.
+
+    Args:
+        user_agent (str): User agent
+        retry_counts (Counter): Counter to which retries are added by source
+        pool_size (int): Number of connections kept per host. Defaults to 16.
+        retries (int): Number of retries. Defaults to 5.
+        backoff_factor (float): Exponential backoff factor. Defaults to 1.
+        backoff_jitter (float): Maximum random seconds added to backoff. Defaults to 1.
+        timeout (Tuple[float, float]): Connect and read timeouts. Defaults to (10, 300).
+
+    Returns:
+        Session: requests session
+    """
+    retry = CountingRetry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        backoff_jitter=backoff_jitter,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("HEAD", "GET", "POST", "PUT", "OPTIONS", "DELETE"),
+        raise_on_redirect=True,
+        raise_on_status=True,
+    )
+    retry.retry_counts = retry_counts
+    adapter = TimeoutHTTPAdapter(
+        timeout, max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size
+    )
+    session = Session()
+    session.headers.update(
+        {"User-Agent": user_agent, "Accept-Encoding": "gzip, deflate"}
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def log_retry_counts(retry_counts):
+    if not retry_counts:
+        logger.info("No requests needed retrying")
+        return
+    for source, count in sorted(retry_counts.items()):
+        logger.info(f"{source}: {count} retries")
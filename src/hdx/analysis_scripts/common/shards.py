@@ -0,0 +1,118 @@
+import gzip
+import json
+import logging
+from datetime import datetime
+from os.path import join
+from zlib import crc32
+
+logger = logging.getLogger(__name__)
+
+
+def parse_shard(shard_str):
+    """Parse a shard of the form i/N where i counts from 0 to N - 1.
+
+    Args:
+        shard_str (str): Shard eg. 0/4
+
+    Returns:
+        Tuple[int, int]: Shard index and number of shards
+    """
+    try:
+        index, count = (int(x) for x in shard_str.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard {shard_str} should be of form i/N!")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Shard {shard_str} should have 0 <= i < N!")
+    return index, count
+
+
+def in_shard(key, shard):
+    index, count = shard
+    return crc32(key.encode("utf-8")) % count == index
+
+
+def get_shard_organisation_names(organisations, shard):
+    """Get the names of the organisations in a shard. Shards are partitioned by
+    organisation id.
+
+    Args:
+        organisations (Dict[str, Dict]): Organisation id to organisation
+        shard (Tuple[int, int]): Shard index and number of shards
+
+    Returns:
+        List[str]: Names of organisations in shard
+    """
+    return [
+        organisation["name"]
+        for organisation_id, organisation in organisations.items()
+        if in_shard(organisation_id, shard)
+    ]
+
+
+def encode_value(value):
+    if isinstance(value, datetime):
+        return {"datetime": value.isoformat()}
+    raise TypeError(f"{type(value).__name__} is not JSON serializable!")
+
+
+def decode_object(obj):
+    if len(obj) == 1 and "datetime" in obj:
+        return datetime.fromisoformat(obj["datetime"])
+    return obj
+
+
+def get_partial_filename(name, shard):
+    index, count = shard
+    return f"{name}_partial_{index}_of_{count}.json.gz"
+
+
+def save_partial(folder, name, shard, partial):
+    """Save the partial results of one shard. Datetimes are stored in a form
+    that is turned back into datetimes on loading.
+
+    Args:
+        folder (str): Folder in which to save the file
+        name (str): Name of the outputs eg. org_stats
+        shard (Tuple[int, int]): Shard index and number of shards
+        partial (Dict): Partial results
+
+    Returns:
+        str: Path of partial results file
+    """
+    path = join(folder, get_partial_filename(name, shard))
+    partial = {"name": name, "shard": list(shard), **partial}
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump(partial, f, default=encode_value)
+    logger.info(f"Partial results written to {path}")
+    return path
+
+
+def load_partials(paths):
+    """Load the partial results files of all shards of a run, checking that
+    they are for the same outputs and run date and that no shard is missing.
+
+    Args:
+        paths (List[str]): Paths of partial results files
+
+    Returns:
+        Tuple[str, List[Dict]]: Name of the outputs and partial results by shard
+    """
+    partials = []
+    for path in paths:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            partials.append(json.load(f, object_hook=decode_object))
+    if not partials:
+        raise ValueError("No partial results files given!")
+    name = partials[0]["name"]
+    count = partials[0]["shard"][1]
+    run_date = partials[0]["run_date"]
+    for partial in partials:
+        if partial["name"] != name or partial["shard"][1] != count:
+            raise ValueError("Partial results files are from different runs!")
+        if partial["run_date"] != run_date:
+            raise ValueError("Partial results files have different run dates!")
+    partials = sorted(partials, key=lambda x: x["shard"][0])
+    indices = [partial["shard"][0] for partial in partials]
+    if indices != list(range(count)):
+        raise ValueError(f"Expected shards 0 to {count - 1} but got {indices}!")
+    return name, partials
@@ -0,0 +1,124 @@
+import gzip
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from os.path import isfile, join
+
+import ijson
+
+from hdx.data.dataset import Dataset
+from hdx.utilities.saver import save_json
+
+logger = logging.getLogger(__name__)
+
+manifest_file = "manifest.json"
+
+
+class SnapshotWriter:
+    """Writes snapshot files gzip compressed in a background thread, keeping a
+    manifest of file name, number of entries, compressed size and hash. JSON
+    encoding happens in the calling thread so that callers are free to change
+    the data afterwards. Compression, hashing and disk I/O run on the worker.
+    zlib releases the GIL, so they overlap with the crawl. The worker is
+    started on the first save after creation or close.
+    """
+
+    def __init__(self, folder, compresslevel=6):
+        self.folder = folder
+        self.compresslevel = compresslevel
+        self.manifest = {}
+        self.executor = None
+        self.futures = []
+
+    def save(self, data, filename):
+        contents = json.dumps(data, separators=(",", ":")).encode("utf-8")
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="SnapshotWriter"
+            )
+        future = self.executor.submit(self.write, contents, filename, len(data))
+        self.futures.append(future)
+
+    def write(self, contents, filename, count):
+        filename = f"{filename}.gz"
+        contents = gzip.compress(contents, compresslevel=self.compresslevel)
+        with open(join(self.folder, filename), "wb") as f:
+            f.write(contents)
+        self.manifest[filename] = {
+            "count": count,
+            "bytes": len(contents),
+            "sha256": sha256(contents).hexdigest(),
+        }
+        save_json(self.manifest, join(self.folder, manifest_file), pretty=True)
+
+    def join(self):
+        futures = self.futures
+        self.futures = []
+        for future in futures:
+            future.result()
+
+    def close(self):
+        """Wait for queued writes to finish and stop the worker. Raises the
+        first error of a failed write if any.
+
+        Returns:
+            None
+        """
+        try:
+            self.join()
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+
+
+def get_saved_path(folder, filename):
+    path = join(folder, f"{filename}.gz")
+    if isfile(path):
+        return path
+    return join(folder, filename)
+
+
+def open_saved_file(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def load_saved_json(folder, filename):
+    with open_saved_file(get_saved_path(folder, filename)) as f:
+        return json.load(f)
+
+
+def get_dataset_from_dict(dataset_dict):
+    # Setting data directly avoids the resource matching done by Dataset.__setitem__
+    dataset = Dataset()
+    dataset.data = dataset_dict
+    try:
+        dataset.separate_resources()
+    except KeyError:
+        pass
+    return dataset
+
+
+def iterate_json_items(path, prefix="item"):
+    with open_saved_file(path) as f:
+        yield from ijson.items(f, prefix, use_float=True)
+
+
+def iterate_json_kvitems(path, prefix=""):
+    with open_saved_file(path) as f:
+        yield from ijson.kvitems(f, prefix, use_float=True)
+
+
+def iterate_saved_datasets(folder, datasets_file):
+    n = 0
+    while True:
+        filename = datasets_file.replace(".json", f"_{n}.json")
+        path = get_saved_path(folder, filename)
+        if not isfile(path):
+            break
+        for dataset_dict in iterate_json_items(path):
+            yield get_dataset_from_dict(dataset_dict)
+        n += 1
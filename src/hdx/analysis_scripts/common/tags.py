@@ -0,0 +1,48 @@
+class TagVocabulary:
+    """Interns tag names to integer ids so that a set of tags can be held as an
+    int bitset in which bit i is set if the tag with id i is present. Bitsets
+    are combined with | and a mask of the crisis tags is kept up to date as
+    tags are added, so checking for a crisis tag is a single &.
+    """
+
+    crisis_prefix = "crisis-"
+
+    def __init__(self):
+        self.tag_to_id = {}
+        self.tags = []
+        self.crisis_mask = 0
+
+    def get_id(self, tag):
+        tag_id = self.tag_to_id.get(tag)
+        if tag_id is None:
+            tag_id = len(self.tags)
+            self.tag_to_id[tag] = tag_id
+            self.tags.append(tag)
+            if tag.startswith(self.crisis_prefix):
+                self.crisis_mask |= 1 << tag_id
+        return tag_id
+
+    def get_bitset(self, tags):
+        bitset = 0
+        for tag in tags:
+            bitset |= 1 << self.get_id(tag)
+        return bitset
+
+    def has_crisis(self, bitset):
+        return bitset & self.crisis_mask != 0
+
+    def get_tags(self, bitset):
+        """Get the sorted tag names in a bitset.
+
+        Args:
+            bitset (int): Bitset of tag ids
+
+        Returns:
+            List[str]: Sorted tag names
+        """
+        tags = []
+        while bitset:
+            lowest_bit = bitset & -bitset
+            tags.append(self.tags[lowest_bit.bit_length() - 1])
+            bitset ^= lowest_bit
+        return sorted(tags)
@@ -0,0 +1,105 @@
+import logging
+import re
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from dateutil.parser import ParserError
+
+from hdx.utilities.dateparse import parse_date
+
+logger = logging.getLogger(__name__)
+
+EXCLUDED = "excluded"
+NO_DATE = "no date"
+COD = "cod"
+SCRIPT = "script"
+
+
+def parse_script_date(date_str):
+    # Scripts write naive ISO timestamps which are much faster to parse with
+    # fromisoformat. Anything else goes through parse_date (which drops offsets).
+    try:
+        date = datetime.fromisoformat(date_str)
+        if date.tzinfo is None:
+            return date.replace(tzinfo=timezone.utc)
+    except ValueError:
+        pass
+    try:
+        return parse_date(date_str, include_microseconds=True)
+    except ParserError:
+        return None
+
+
+class UpdatedByScriptClassifier:
+    """Classifies updated_by_script values into a category (EXCLUDED, NO_DATE,
+    COD or SCRIPT) and the date in brackets. The exclusions come from the
+    updated_by_script section of the project configuration and are compiled
+    into one regular expression.
+
+    Parsing the date is the costly part of classifying, so the category and
+    date of each value are memoised in an LRU cache. Datasets updated by the
+    same run of a script often share a value.
+    """
+
+    bracketed_date = re.compile(r"\((.*)\)")
+
+    def __init__(self, configuration, cache_size=4096):
+        self.internal = configuration["internal"]
+        self.cod = configuration["cod"]
+        patterns = [re.escape(x) for x in configuration.get("excluded", [])]
+        internal_excluded = configuration.get("internal_excluded")
+        if internal_excluded:
+            internal_excluded = "|".join(re.escape(x) for x in internal_excluded)
+            patterns.append(
+                f"^(?=.*{re.escape(self.internal)}).*(?:{internal_excluded})"
+            )
+        if patterns:
+            self.excluded = re.compile("|".join(patterns), re.DOTALL)
+        else:
+            self.excluded = None
+        self.get_classification = lru_cache(maxsize=cache_size)(
+            self.get_value_classification
+        )
+
+    def get_value_classification(self, updated_by_script):
+        if self.excluded and self.excluded.search(updated_by_script):
+            return EXCLUDED, None
+        match = self.bracketed_date.search(updated_by_script)
+        if match is None:
+            return NO_DATE, None
+        date = parse_script_date(match.group(1))
+        if date is None:
+            return NO_DATE, None
+        script = (
+            f"{updated_by_script[: match.start()]}{updated_by_script[match.end() :]}"
+        )
+        if self.internal in script and self.cod in script:
+            return COD, date
+        return SCRIPT, date
+
+    def classify(self, updated_by_script):
+        """Get the category and date of an updated_by_script value. The date is
+        None unless the category is COD or SCRIPT.
+
+        Args:
+            updated_by_script (str): updated_by_script value
+
+        Returns:
+            Tuple[str, Optional[datetime]]: Category and date
+        """
+        return self.get_classification(updated_by_script)
+
+    def get_hit_rate(self):
+        cache_info = self.get_classification.cache_info()
+        lookups = cache_info.hits + cache_info.misses
+        if lookups == 0:
+            return 0.0
+        return cache_info.hits / lookups
+
+    def log_cache_info(self):
+        cache_info = self.get_classification.cache_info()
+        logger.info(
+            f"updated_by_script classifier cache: {cache_info.hits} hits, "
+            f"{cache_info.misses} misses, {cache_info.currsize} values "
+            f"({self.get_hit_rate():.1%} hit rate)"
+        )
@@ -1,17 +1,35 @@
 import argparse
 import logging
 import os
-from os import mkdir
+from os import makedirs, mkdir
 from os.path import expanduser, join
 from shutil import rmtree
 
 from hdx.analysis_scripts.common import (
-    get_aging,
     get_dataset_name_to_explorers,
     get_requests_mappings,
 )
+from hdx.analysis_scripts.common.catalogue import CatalogueDatabase
+from hdx.analysis_scripts.common.columnar import (
+    check_output_formats,
+    output_formats,
+    write_columnar,
+)
 from hdx.analysis_scripts.common.dataset_statistics import DatasetStatistics
+from hdx.analysis_scripts.common.delta import write_delta
 from hdx.analysis_scripts.common.downloads import Downloads
+from hdx.analysis_scripts.common.history import HistoryStore
+from hdx.analysis_scripts.common.ids import DatasetIndex
+from hdx.analysis_scripts.common.metrics import RunMetrics
+from hdx.analysis_scripts.common.run_context import RunContext
+from hdx.analysis_scripts.common.shards import (
+    get_shard_organisation_names,
+    in_shard,
+    parse_shard,
+    save_partial,
+)
+from hdx.analysis_scripts.common.tags import TagVocabulary
+from hdx.analysis_scripts.common.updated_by_script import UpdatedByScriptClassifier
 from hdx.api.configuration import Configuration
 from hdx.facades.keyword_arguments import facade
 from hdx.utilities.dateparse import now_utc
@@ -23,20 +41,73 @@ logger = logging.getLogger(__name__)
 lookup = "hdx-analysis-scripts"
 
 
-def main(downloads, output_dir, **ignore):
-    rmtree(output_dir, ignore_errors=True)
-    mkdir(output_dir)
+def main(downloads, output_dir, **kwargs):
+    """Get the datasets info, making sure that downloads finishes writing any
+    snapshots even if the run fails.
+
+    Args:
+        downloads (Downloads): Downloads object used to load data
+        output_dir (Optional[str]): Output folder. None to not write outputs.
+        **kwargs: Arguments passed to get_datasets_info eg. tables, a dictionary to
+            which to add table name to headers and rows
+
+    Returns:
+        Any: Result of get_datasets_info
+    """
+    try:
+        return get_datasets_info(downloads, output_dir, **kwargs)
+    finally:
+        downloads.close()
+
+
+def get_datasets_info(
+    downloads,
+    output_dir,
+    history_db=None,
+    catalogue_db=None,
+    delta_dir=None,
+    all_users=False,
+    shard=None,
+    metrics_file=None,
+    output_formats=None,
+    tables=None,
+    **ignore,
+):
+    check_output_formats(output_formats)
+    if output_dir:
+        rmtree(output_dir, ignore_errors=True)
+        mkdir(output_dir)
+    metrics = RunMetrics("datasets")
+    metrics.start_phase("download")
 
     configuration = Configuration.read()
     downloads.set_api_key(configuration.get_api_key())
 
     dataset_name_to_explorers = get_dataset_name_to_explorers(downloads)
-    dataset_id_to_requests, _ = get_requests_mappings(downloads)
-    last_modified_aging = get_aging(configuration["last_modified_aging"])
-    end_date_aging = get_aging(configuration["end_date_aging"])
-    dataset_downloads = downloads.get_mixpanel_downloads(60)
     organisations = downloads.get_all_organisations()
-    users = downloads.get_all_users()
+    if shard:
+        downloads.set_shard_organisations(
+            get_shard_organisation_names(organisations, shard)
+        )
+    dataset_id_to_requests, _ = get_requests_mappings(downloads)
+    dataset_index = DatasetIndex()
+    dataset_index.add_requests(dataset_id_to_requests)
+    run_context = RunContext.create(downloads.today, configuration)
+    tag_vocabulary = TagVocabulary()
+    updated_by_script_classifier = UpdatedByScriptClassifier(
+        configuration["updated_by_script"]
+    )
+    dataset_index.add_counts(
+        "downloads last 5 years", downloads.get_mixpanel_downloads(60)
+    )
+    if all_users:
+        users = downloads.get_all_users()
+    else:
+        users = downloads.get_maintainers()
+    if catalogue_db:
+        catalogue = CatalogueDatabase(catalogue_db)
+    else:
+        catalogue = None
     created_per_month = {}
     metadata_updated_per_month = {}
     data_updated_per_month = {}
@@ -74,15 +145,19 @@ def main(downloads, output_dir, **ignore):
             "valid maintainer",
         )
     ]
+    metrics.start_phase("crawl")
     for dataset in downloads.get_all_datasets():
+        # Saved snapshots are not filtered by organisation
+        if shard and not in_shard(dataset["organization"]["id"], shard):
+            continue
         datasetstats = DatasetStatistics(
             organisations,
             users,
-            downloads.today,
+            run_context,
             dataset_name_to_explorers,
-            dataset_id_to_requests,
-            last_modified_aging,
-            end_date_aging,
+            dataset_index,
+            tag_vocabulary,
+            updated_by_script_classifier,
             dataset,
         )
         if datasetstats.last_modified is None:
@@ -90,7 +165,9 @@ def main(downloads, output_dir, **ignore):
         dataset_id = dataset["id"]
         name = dataset["name"]
         title = dataset["title"]
-        downloads_5years = dataset_downloads.get(dataset_id, 0)
+        downloads_5years = dataset_index.get_count(
+            "downloads last 5 years", datasetstats.index
+        )
         created = dataset["metadata_created"]
         metadata_updated = dataset["metadata_modified"]
         if not datasetstats.updated_by_script:
@@ -144,10 +221,81 @@ def main(downloads, output_dir, **ignore):
             datasetstats.valid_maintainer,
         )
         rows.append(row)
-    if rows:
+        if catalogue:
+            catalogue.add(datasetstats, downloads_5years)
+    updated_by_script_classifier.log_cache_info()
+    if catalogue:
+        catalogue.close()
+    run_date = downloads.today.date().isoformat()
+    metrics.start_phase("write")
+    if shard:
+        partial = {
+            "run_date": run_date,
+            "rows": rows,
+            "created_per_month": created_per_month,
+            "metadata_updated_per_month": metadata_updated_per_month,
+            "data_updated_per_month": data_updated_per_month,
+        }
+        save_partial(output_dir, "datasets", shard, partial)
+    else:
+        datasets_tables = write_datasets_info(
+            output_dir,
+            rows,
+            created_per_month,
+            metadata_updated_per_month,
+            data_updated_per_month,
+            run_date,
+            history_db,
+            delta_dir,
+            output_formats,
+        )
+        if tables is not None:
+            tables.update(datasets_tables)
+    if metrics_file:
+        metrics.end_phase()
+        metrics.add_downloads(downloads)
+        metrics.set("dataset_rows", len(rows) - 1, "Rows written to datasets.csv")
+        metrics.set(
+            "cache_hit_ratio",
+            updated_by_script_classifier.get_hit_rate(),
+            "Hit rate of caches used in the run",
+            cache="updated_by_script",
+        )
+        metrics.write(metrics_file)
+
+
+def write_datasets_info(
+    output_dir,
+    rows,
+    created_per_month,
+    metadata_updated_per_month,
+    data_updated_per_month,
+    run_date,
+    history_db=None,
+    delta_dir=None,
+    output_formats=None,
+):
+    """Write datasets.csv and non_script_updates.csv (and the other output
+    formats given) to output_dir unless it is None, and append them to
+    history_db and the delta in delta_dir if given.
+
+    Returns:
+        Dict[str, Tuple[List[str], List[List]]]: Table name to headers and rows
+    """
+    tables = {"datasets": (rows[0], rows[1:])}
+    if rows and output_dir:
         filepath = join(output_dir, "datasets.csv")
         logger.info(f"Writing rows to {filepath}")
         save_iterable(filepath, rows, headers=1, encoding="utf-8")
+        write_columnar(
+            output_dir, "datasets", rows[0], rows[1:], run_date, output_formats
+        )
+    if delta_dir and output_dir:
+        makedirs(delta_dir, exist_ok=True)
+        write_delta(output_dir, delta_dir, "datasets", rows[0], rows[1:], "id")
+    if history_db:
+        with HistoryStore(history_db) as history:
+            history.append("datasets", run_date, rows[0], rows[1:])
     keys = set(created_per_month.keys())
     keys.update(metadata_updated_per_month.keys())
     keys.update(data_updated_per_month.keys())
@@ -160,10 +308,20 @@ def main(downloads, output_dir, **ignore):
             data_updated_per_month.get(key, ""),
         )
         rows.append(row)
-    if rows:
+    tables["non_script_updates"] = rows[0], rows[1:]
+    if output_dir:
         filepath = join(output_dir, "non_script_updates.csv")
         logger.info(f"Writing rows to {filepath}")
         save_iterable(filepath, rows, headers=1, encoding="utf-8")
+        write_columnar(
+            output_dir,
+            "non_script_updates",
+            rows[0],
+            rows[1:],
+            run_date,
+            output_formats,
+        )
+    return tables
 
 
 if __name__ == "__main__":
@@ -172,11 +330,109 @@ if __name__ == "__main__":
     parser.add_argument(
         "-sd", "--saved_dir", default=None, help="Dir for downloaded data"
     )
+    parser.add_argument(
+        "-hd",
+        "--history_db",
+        default=None,
+        help="SQLite file to which to append this run's results",
+    )
+    parser.add_argument(
+        "-cd",
+        "--catalogue_db",
+        default=None,
+        help="SQLite file in which to store the crawled catalogue for querying",
+    )
+    parser.add_argument(
+        "-dd",
+        "--delta_dir",
+        default=None,
+        help="Dir for row hash index used to output changes since last run",
+    )
+    parser.add_argument(
+        "-au",
+        "--all_users",
+        action="store_true",
+        help="Download all users rather than looking up dataset maintainers",
+    )
+    parser.add_argument(
+        "-pc",
+        "--projected_crawl",
+        action="store_true",
+        help="Keep only the dataset fields used by the script",
+    )
+    parser.add_argument(
+        "-sh",
+        "--shard",
+        default=None,
+        help="Shard i/N (i from 0) to process, writing partial results to merge",
+    )
+    parser.add_argument(
+        "-cp",
+        "--checkpoint_dir",
+        default=None,
+        help="Dir in which to checkpoint downloads and crawled pages",
+    )
+    parser.add_argument(
+        "-re",
+        "--resume",
+        action="store_true",
+        help="Resume from the checkpoint in checkpoint_dir",
+    )
+    parser.add_argument(
+        "-pi",
+        "--progress_interval",
+        type=float,
+        default=60,
+        help="Seconds between progress lines while crawling datasets",
+    )
+    parser.add_argument(
+        "-og",
+        "--org",
+        default=None,
+        help="Name of the only organisation for which to download data",
+    )
+    parser.add_argument(
+        "-mf",
+        "--metrics_file",
+        default=None,
+        help="OpenMetrics textfile to which to write metrics of the run",
+    )
+    parser.add_argument(
+        "-of",
+        "--output_format",
+        action="append",
+        choices=output_formats,
+        default=None,
+        help="Also write outputs in this format (can be repeated)",
+    )
     args = parser.parse_args()
+    if args.resume and not args.checkpoint_dir:
+        parser.error("--resume requires --checkpoint_dir")
+    # Each of these holds results for the whole catalogue
+    for option in ("history_db", "delta_dir", "shard", "catalogue_db"):
+        if args.org and getattr(args, option):
+            parser.error(f"--org cannot be used with --{option}")
+    # Each shard would overwrite these with results for its part of the catalogue
+    for option in ("history_db", "delta_dir", "catalogue_db"):
+        if args.shard and getattr(args, option):
+            parser.error(f"--shard cannot be used with --{option}")
     home_folder = expanduser("~")
     today = now_utc()
     mixpanel_config_yaml = join(home_folder, ".mixpanel.yaml")
-    downloads = Downloads(today, mixpanel_config_yaml, args.saved_dir)
+    downloads = Downloads(
+        today,
+        mixpanel_config_yaml,
+        args.saved_dir,
+        project_datasets=args.projected_crawl,
+        checkpoint_dir=args.checkpoint_dir,
+        resume=args.resume,
+        progress_interval=args.progress_interval,
+        organisation=args.org,
+    )
+    if args.shard:
+        shard = parse_shard(args.shard)
+    else:
+        shard = None
 
     user_agent_config_path = join(home_folder, ".useragents.yaml")
     if not os.path.exists(user_agent_config_path):
@@ -192,4 +448,11 @@ if __name__ == "__main__":
         ),
         downloads=downloads,
         output_dir=args.output_dir,
+        history_db=args.history_db,
+        catalogue_db=args.catalogue_db,
+        delta_dir=args.delta_dir,
+        all_users=args.all_users,
+        shard=shard,
+        metrics_file=args.metrics_file,
+        output_formats=args.output_format,
     )
@@ -0,0 +1,36 @@
+import argparse
+import csv
+import sys
+
+from hdx.analysis_scripts.common.history import HistoryStore
+
+
+def main(history_db, column, organisation=None, dataset=None, **ignore):
+    with HistoryStore(history_db) as history:
+        if organisation:
+            series = history.get_org_series(organisation, column)
+        elif dataset:
+            series = history.get_dataset_series(dataset, column)
+        else:
+            series = history.get_total_series(column)
+    writer = csv.writer(sys.stdout)
+    writer.writerow(("Run date", column))
+    writer.writerows(series)
+    return series
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Historical Stats query")
+    parser.add_argument(
+        "-hd", "--history_db", required=True, help="SQLite history file"
+    )
+    parser.add_argument(
+        "-c",
+        "--column",
+        required=True,
+        help="Column to return eg. 'Quarterly %% API OKR' or 'Public datasets'",
+    )
+    parser.add_argument("-o", "--organisation", default=None, help="Organisation name")
+    parser.add_argument("-d", "--dataset", default=None, help="Dataset id")
+    args = parser.parse_args()
+    main(args.history_db, args.column, args.organisation, args.dataset)
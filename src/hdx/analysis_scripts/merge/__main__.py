@@ -0,0 +1,151 @@
+import argparse
+import logging
+from os import makedirs
+
+from hdx.analysis_scripts.common.columnar import check_output_formats, output_formats
+from hdx.analysis_scripts.common.metrics import RunMetrics
+from hdx.analysis_scripts.common.shards import load_partials
+from hdx.analysis_scripts.datasets.__main__ import write_datasets_info
+from hdx.analysis_scripts.orgs.__main__ import write_org_stats
+from hdx.utilities.easy_logging import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+def add_counts(counts, partial_counts):
+    for key, value in partial_counts.items():
+        counts[key] = counts.get(key, 0) + value
+
+
+def merge_org_stats(
+    partials,
+    output_dir,
+    history_db=None,
+    delta_dir=None,
+    metrics=None,
+    output_formats=None,
+):
+    rows = []
+    totals = {}
+    outdated_lastmodifieds = {}
+    for partial in partials:
+        rows.extend(partial["rows"])
+        add_counts(totals, partial["totals"])
+        outdated_lastmodifieds.update(partial["outdated_lastmodifieds"])
+    rows = sorted(rows, key=lambda row: row[0])
+    return write_org_stats(
+        output_dir,
+        partials[0]["headers"],
+        rows,
+        totals,
+        outdated_lastmodifieds,
+        partials[0]["run_date"],
+        history_db,
+        delta_dir,
+        metrics,
+        output_formats,
+    )
+
+
+def merge_datasets(
+    partials, output_dir, history_db=None, delta_dir=None, output_formats=None
+):
+    headers = partials[0]["rows"][0]
+    rows = []
+    created_per_month = {}
+    metadata_updated_per_month = {}
+    data_updated_per_month = {}
+    for partial in partials:
+        rows.extend(partial["rows"][1:])
+        add_counts(created_per_month, partial["created_per_month"])
+        add_counts(metadata_updated_per_month, partial["metadata_updated_per_month"])
+        add_counts(data_updated_per_month, partial["data_updated_per_month"])
+    # Datasets are crawled in order of creation
+    created = headers.index("date created")
+    dataset_id = headers.index("id")
+    rows = sorted(rows, key=lambda row: (row[created], row[dataset_id]))
+    rows.insert(0, headers)
+    return write_datasets_info(
+        output_dir,
+        rows,
+        created_per_month,
+        metadata_updated_per_month,
+        data_updated_per_month,
+        partials[0]["run_date"],
+        history_db,
+        delta_dir,
+        output_formats,
+    )
+
+
+def main(
+    partial_files,
+    output_dir,
+    history_db=None,
+    delta_dir=None,
+    metrics_file=None,
+    output_formats=None,
+    **ignore,
+):
+    check_output_formats(output_formats)
+    name, partials = load_partials(partial_files)
+    metrics = RunMetrics(f"merge_{name}")
+    metrics.start_phase("merge")
+    logger.info(f"Merging {len(partials)} shards of {name}")
+    makedirs(output_dir, exist_ok=True)
+    if name == "org_stats":
+        result = merge_org_stats(
+            partials, output_dir, history_db, delta_dir, metrics, output_formats
+        )
+    else:
+        result = merge_datasets(
+            partials, output_dir, history_db, delta_dir, output_formats
+        )
+    if metrics_file:
+        metrics.set("shards", len(partials), "Shards merged")
+        metrics.write(metrics_file)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge sharded results")
+    parser.add_argument(
+        "partial_files", nargs="+", help="Partial results files of all shards"
+    )
+    parser.add_argument("-od", "--output_dir", default="output", help="Output folder")
+    parser.add_argument(
+        "-hd",
+        "--history_db",
+        default=None,
+        help="SQLite file to which to append the merged results",
+    )
+    parser.add_argument(
+        "-dd",
+        "--delta_dir",
+        default=None,
+        help="Dir for row hash index used to output changes since last run",
+    )
+    parser.add_argument(
+        "-mf",
+        "--metrics_file",
+        default=None,
+        help="OpenMetrics textfile to which to write metrics of the merge",
+    )
+    parser.add_argument(
+        "-of",
+        "--output_format",
+        action="append",
+        choices=output_formats,
+        default=None,
+        help="Also write outputs in this format (can be repeated)",
+    )
+    args = parser.parse_args()
+    setup_logging()
+    main(
+        args.partial_files,
+        args.output_dir,
+        args.history_db,
+        args.delta_dir,
+        args.metrics_file,
+        args.output_format,
+    )
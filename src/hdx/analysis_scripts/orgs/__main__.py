@@ -2,22 +2,42 @@ import argparse
 import logging
 import os
 import re
-from os import mkdir
+from os import makedirs, mkdir
 from os.path import expanduser, join
 from shutil import rmtree
 
 from hdx.analysis_scripts.common import (
-    get_aging,
+    NO_REQUESTS,
     get_dataset_name_to_explorers,
     get_requests_mappings,
 )
+from hdx.analysis_scripts.common.aging_sweep import AgingSweep
+from hdx.analysis_scripts.common.columnar import (
+    check_output_formats,
+    output_formats,
+    write_columnar,
+)
 from hdx.analysis_scripts.common.dataset_statistics import DatasetStatistics
+from hdx.analysis_scripts.common.delta import write_delta
 from hdx.analysis_scripts.common.downloads import Downloads
+from hdx.analysis_scripts.common.history import HistoryStore
+from hdx.analysis_scripts.common.ids import DatasetIndex
+from hdx.analysis_scripts.common.metrics import RunMetrics
+from hdx.analysis_scripts.common.run_context import RunContext
+from hdx.analysis_scripts.common.shards import (
+    get_shard_organisation_names,
+    in_shard,
+    parse_shard,
+    save_partial,
+)
+from hdx.analysis_scripts.common.tags import TagVocabulary
+from hdx.analysis_scripts.common.updated_by_script import UpdatedByScriptClassifier
 from hdx.api.configuration import Configuration
 from hdx.facades.keyword_arguments import facade
 from hdx.location.country import Country
 from hdx.utilities.dateparse import default_date, now_utc
 from hdx.utilities.dictandlist import dict_of_lists_add
+from hdx.utilities.loader import load_yaml
 from hdx.utilities.path import script_dir_plus_file
 from hdx.utilities.saver import save_iterable
 from hdx.utilities.text import get_fraction_str
@@ -29,11 +49,50 @@ lookup = "hdx-analysis-scripts"
 bracketed_date = re.compile(r"\((.*)\)")
 
 
-def main(downloads, output_dir, **ignore):
-    rmtree(output_dir, ignore_errors=True)
-    mkdir(output_dir)
+def main(downloads, output_dir, **kwargs):
+    """Get the org stats, making sure that downloads finishes writing any
+    snapshots even if the run fails.
+
+    Args:
+        downloads (Downloads): Downloads object used to load data
+        output_dir (Optional[str]): Output folder. None to not write outputs.
+        **kwargs: Arguments passed to get_org_stats eg. tables, a dictionary to
+            which to add table name to headers and rows
+
+    Returns:
+        Any: Result of get_org_stats
+    """
+    try:
+        return get_org_stats(downloads, output_dir, **kwargs)
+    finally:
+        downloads.close()
+
+
+def get_org_stats(
+    downloads,
+    output_dir,
+    history_db=None,
+    delta_dir=None,
+    all_users=False,
+    shard=None,
+    metrics_file=None,
+    output_formats=None,
+    aging_configs=None,
+    tables=None,
+    **ignore,
+):
+    check_output_formats(output_formats)
+    if output_dir:
+        rmtree(output_dir, ignore_errors=True)
+        mkdir(output_dir)
+    metrics = RunMetrics("org_stats")
+    metrics.start_phase("download")
 
     configuration = Configuration.read()
+    if aging_configs:
+        aging_sweep = AgingSweep(downloads.today, configuration, aging_configs)
+    else:
+        aging_sweep = None
 
     downloads.set_api_key(configuration.get_api_key())
     org_type_mapping = configuration["org_type_mapping"]
@@ -42,15 +101,31 @@ def main(downloads, output_dir, **ignore):
         org_stats_url
     )
     dataset_name_to_explorers = get_dataset_name_to_explorers(downloads)
+    organisations = downloads.get_all_organisations()
+    if shard:
+        downloads.set_shard_organisations(
+            get_shard_organisation_names(organisations, shard)
+        )
     dataset_id_to_requests, organisation_name_to_requests = get_requests_mappings(
         downloads
     )
-    last_modified_aging = get_aging(configuration["last_modified_aging"])
-    end_date_aging = get_aging(configuration["end_date_aging"])
-    dataset_3m_downloads = downloads.get_mixpanel_downloads(3)
-    dataset_1y_downloads = downloads.get_mixpanel_downloads(12)
-    organisations = downloads.get_all_organisations()
-    users = downloads.get_all_users()
+    dataset_index = DatasetIndex()
+    dataset_index.add_requests(dataset_id_to_requests)
+    run_context = RunContext.create(downloads.today, configuration)
+    tag_vocabulary = TagVocabulary()
+    updated_by_script_classifier = UpdatedByScriptClassifier(
+        configuration["updated_by_script"]
+    )
+    dataset_index.add_counts(
+        "downloads last 90 days", downloads.get_mixpanel_downloads(3)
+    )
+    dataset_index.add_counts(
+        "downloads last 12 months", downloads.get_mixpanel_downloads(12)
+    )
+    if all_users:
+        users = downloads.get_all_users()
+    else:
+        users = downloads.get_maintainers()
     total_public = 0
     total_public_internal = 0
     total_public_external = 0
@@ -121,40 +196,35 @@ def main(downloads, output_dir, **ignore):
         organisation["in explorer or grid"] = "No"
         organisation["closed"] = "Yes" if organisation["closed_organization"] else "No"
 
-        new_requests = 0
-        open_requests = 0
-        archived_requests = 0
-        shared_requests = 0
-        denied_requests = 0
-        for request in organisation_name_to_requests.get(organisation_name, []):
-            if request["state"] == "new":
-                new_requests += 1
-            elif request["state"] == "open":
-                open_requests += 1
-            else:
-                archived_requests += 1
-                if request["data_shared"]:
-                    shared_requests += 1
-                elif request["rejected"]:
-                    denied_requests += 1
+        (
+            new_requests,
+            open_requests,
+            archived_requests,
+            shared_requests,
+            denied_requests,
+        ) = organisation_name_to_requests.get(organisation_name, NO_REQUESTS)
         organisation["new requests"] = new_requests
         organisation["open requests"] = open_requests
         organisation["archived requests"] = archived_requests
         organisation["shared requests"] = shared_requests
         organisation["denied requests"] = denied_requests
-        organisation["tags"] = set()
+        organisation["tags"] = 0
         organisation["has crisis"] = "N"
         organisation["valid maintainers"] = "Y"
     outdated_lastmodifieds = {}
+    metrics.start_phase("crawl")
     for dataset in downloads.get_all_datasets():
+        # Saved snapshots are not filtered by organisation
+        if shard and not in_shard(dataset["organization"]["id"], shard):
+            continue
         datasetstats = DatasetStatistics(
             organisations,
             users,
-            downloads.today,
+            run_context,
             dataset_name_to_explorers,
-            dataset_id_to_requests,
-            last_modified_aging,
-            end_date_aging,
+            dataset_index,
+            tag_vocabulary,
+            updated_by_script_classifier,
             dataset,
         )
         name = dataset["name"]
@@ -177,10 +247,12 @@ def main(downloads, output_dir, **ignore):
             total_public_internal += datasetstats.internal_resources
             total_public_external += datasetstats.external_resources
 
-        downloads_last_3months = dataset_3m_downloads.get(dataset["id"], 0)
-        organisation["downloads last 90 days"] += downloads_last_3months
-        downloads_last_year = dataset_1y_downloads.get(dataset["id"], 0)
-        organisation["downloads last 12 months"] += downloads_last_year
+        organisation["downloads last 90 days"] += dataset_index.get_count(
+            "downloads last 90 days", datasetstats.index
+        )
+        organisation["downloads last 12 months"] += dataset_index.get_count(
+            "downloads last 12 months", datasetstats.index
+        )
         if datasetstats.last_modified is None:
             continue
         if datasetstats.updated_last_3_months == "Y":
@@ -196,6 +268,8 @@ def main(downloads, output_dir, **ignore):
                 organisation["public live datasets"] += 1
             if datasetstats.ongoing == "Y":
                 organisation["public ongoing datasets"] += 1
+        if aging_sweep:
+            aging_sweep.add(datasetstats)
         match datasetstats.last_modified_fresh:
             case "Fresh":
                 organisation["lm fresh datasets"] += 1
@@ -244,11 +318,12 @@ def main(downloads, output_dir, **ignore):
                 dict_of_lists_add(outdated_lastmodifieds, organisation["name"], name)
             if datasetstats.old_updated_by_noncod_script == "Y":
                 organisation["old updated by script"] += 1
-        datasetstats.add_tags_to_set(organisation["tags"])
+        organisation["tags"] |= datasetstats.tag_bitset
         if datasetstats.crisis_tag == "Y":
             organisation["has crisis"] = "Y"
         if datasetstats.valid_maintainer == "N":
             organisation["valid maintainers"] = "N"
+    updated_by_script_classifier.log_cache_info()
 
     headers = [
         "Organisation name",
@@ -319,10 +394,14 @@ def main(downloads, output_dir, **ignore):
         )
         return number, percentage
 
+    metrics.start_phase("rows")
     logger.info("Generating rows")
     rows = list()
     for organisation_name in sorted(organisation_name_to_id):
-        organisation = organisations[organisation_name_to_id[organisation_name]]
+        organisation_id = organisation_name_to_id[organisation_name]
+        if shard and not in_shard(organisation_id, shard):
+            continue
+        organisation = organisations[organisation_id]
         organisation_type = org_type_mapping[organisation["hdx_org_type"]]
         updated_by_cod_script, percentage_cod = get_number_percentage(
             organisation, "updated by cod script"
@@ -406,15 +485,110 @@ def main(downloads, output_dir, **ignore):
             organisation["archived requests"],
             organisation["shared requests"],
             organisation["denied requests"],
-            ",".join(sorted(organisation["tags"])),
+            ",".join(tag_vocabulary.get_tags(organisation["tags"])),
             organisation["has crisis"],
             organisation["valid maintainers"],
         ]
         rows.append(row)
-    if rows:
+    totals = {
+        "public": total_public,
+        "public internal": total_public_internal,
+        "public external": total_public_external,
+        "updated by cod": total_updated_by_cod,
+        "updated by script": total_updated_by_script,
+        "lm fresh": total_lm_fresh,
+        "lm not fresh": total_lm_not_fresh,
+        "ed uptodate": total_ed_uptodate,
+        "ed outofdate": total_ed_outofdate,
+    }
+    run_date = downloads.today.date().isoformat()
+    metrics.start_phase("write")
+    if shard:
+        partial = {
+            "run_date": run_date,
+            "headers": headers,
+            "rows": rows,
+            "totals": totals,
+            "outdated_lastmodifieds": outdated_lastmodifieds,
+        }
+        save_partial(output_dir, "org_stats", shard, partial)
+    else:
+        org_tables = write_org_stats(
+            output_dir,
+            headers,
+            rows,
+            totals,
+            outdated_lastmodifieds,
+            run_date,
+            history_db,
+            delta_dir,
+            metrics,
+            output_formats,
+        )
+        if aging_sweep:
+            org_tables["aging_sweep"] = aging_sweep.get_rows()
+            if output_dir:
+                filepath = join(output_dir, "aging_sweep.csv")
+                logger.info(f"Writing aging sweep to {filepath}")
+                headers, rows = org_tables["aging_sweep"]
+                save_iterable(filepath, rows, headers, encoding="utf-8")
+        if tables is not None:
+            tables.update(org_tables)
+    if metrics_file:
+        metrics.end_phase()
+        metrics.add_downloads(downloads)
+        metrics.set(
+            "cache_hit_ratio",
+            updated_by_script_classifier.get_hit_rate(),
+            "Hit rate of caches used in the run",
+            cache="updated_by_script",
+        )
+        metrics.write(metrics_file)
+    return total_public, total_updated_by_cod, total_updated_by_script
+
+
+def write_org_stats(
+    output_dir,
+    headers,
+    rows,
+    totals,
+    outdated_lastmodifieds,
+    run_date,
+    history_db=None,
+    delta_dir=None,
+    metrics=None,
+    output_formats=None,
+):
+    """Write org_stats.csv and total_stats.csv (and the other output formats
+    given) to output_dir unless it is None, and append them to history_db and
+    the delta in delta_dir if given.
+
+    Returns:
+        Dict[str, Tuple[List[str], List[List]]]: Table name to headers and rows
+    """
+    tables = {"org_stats": (headers, rows)}
+    total_public = totals["public"]
+    total_public_internal = totals["public internal"]
+    total_public_external = totals["public external"]
+    total_updated_by_cod = totals["updated by cod"]
+    total_updated_by_script = totals["updated by script"]
+    total_lm_fresh = totals["lm fresh"]
+    total_lm_not_fresh = totals["lm not fresh"]
+    total_ed_uptodate = totals["ed uptodate"]
+    total_ed_outofdate = totals["ed outofdate"]
+    if rows and output_dir:
         filepath = join(output_dir, "org_stats.csv")
         logger.info(f"Writing rows to {filepath}")
         save_iterable(filepath, rows, headers, encoding="utf-8")
+        write_columnar(output_dir, "org_stats", headers, rows, run_date, output_formats)
+    if delta_dir and output_dir:
+        makedirs(delta_dir, exist_ok=True)
+        write_delta(
+            output_dir, delta_dir, "org_stats", headers, rows, "Organisation id"
+        )
+    if history_db:
+        with HistoryStore(history_db) as history:
+            history.append("org_stats", run_date, headers, rows)
 
     if outdated_lastmodifieds:
         message = ["updated_by_script is significantly after last_modified for:\n"]
@@ -463,8 +637,30 @@ def main(downloads, output_dir, **ignore):
         format="%.0f",
     )
     logger.info(f"Quarterly % end date up to date OKR = {quarterly_ed_uptodate_okr}")
-    filepath = join(output_dir, "total_stats.csv")
-    logger.info(f"Writing totals to {filepath}")
+    if metrics:
+        for key, value in totals.items():
+            metrics.set("totals", value, "Totals in total_stats.csv", total=key)
+        metrics.set_ratio(
+            "okr_percentage",
+            total_updated_by_script * 100,
+            total_public,
+            "Quarterly OKR percentages",
+            okr="api",
+        )
+        metrics.set_ratio(
+            "okr_percentage",
+            total_lm_fresh * 100,
+            total_lm_fresh + total_lm_not_fresh,
+            "Quarterly OKR percentages",
+            okr="last modified fresh",
+        )
+        metrics.set_ratio(
+            "okr_percentage",
+            total_ed_uptodate * 100,
+            total_ed_uptodate + total_ed_outofdate,
+            "Quarterly OKR percentages",
+            okr="end date up to date",
+        )
     headers = [
         "Public - Request & Archive",
         "Public Internal Resources",
@@ -495,8 +691,18 @@ def main(downloads, output_dir, **ignore):
             quarterly_ed_uptodate_okr,
         ]
     ]
-    save_iterable(filepath, rows, headers, encoding="utf-8")
-    return total_public, total_updated_by_cod, total_updated_by_script
+    tables["total_stats"] = headers, rows
+    if output_dir:
+        filepath = join(output_dir, "total_stats.csv")
+        logger.info(f"Writing totals to {filepath}")
+        save_iterable(filepath, rows, headers, encoding="utf-8")
+        write_columnar(
+            output_dir, "total_stats", headers, rows, run_date, output_formats
+        )
+    if history_db:
+        with HistoryStore(history_db) as history:
+            history.append("total_stats", run_date, headers, rows)
+    return tables
 
 
 if __name__ == "__main__":
@@ -505,11 +711,115 @@ if __name__ == "__main__":
     parser.add_argument(
         "-sd", "--saved_dir", default=None, help="Dir for downloaded data"
     )
+    parser.add_argument(
+        "-hd",
+        "--history_db",
+        default=None,
+        help="SQLite file to which to append this run's results",
+    )
+    parser.add_argument(
+        "-dd",
+        "--delta_dir",
+        default=None,
+        help="Dir for row hash index used to output changes since last run",
+    )
+    parser.add_argument(
+        "-au",
+        "--all_users",
+        action="store_true",
+        help="Download all users rather than looking up dataset maintainers",
+    )
+    parser.add_argument(
+        "-pc",
+        "--projected_crawl",
+        action="store_true",
+        help="Keep only the dataset fields used by the script",
+    )
+    parser.add_argument(
+        "-sh",
+        "--shard",
+        default=None,
+        help="Shard i/N (i from 0) to process, writing partial results to merge",
+    )
+    parser.add_argument(
+        "-cp",
+        "--checkpoint_dir",
+        default=None,
+        help="Dir in which to checkpoint downloads and crawled pages",
+    )
+    parser.add_argument(
+        "-re",
+        "--resume",
+        action="store_true",
+        help="Resume from the checkpoint in checkpoint_dir",
+    )
+    parser.add_argument(
+        "-pi",
+        "--progress_interval",
+        type=float,
+        default=60,
+        help="Seconds between progress lines while crawling datasets",
+    )
+    parser.add_argument(
+        "-og",
+        "--org",
+        default=None,
+        help="Name of the only organisation for which to download data",
+    )
+    parser.add_argument(
+        "-mf",
+        "--metrics_file",
+        default=None,
+        help="OpenMetrics textfile to which to write metrics of the run",
+    )
+    parser.add_argument(
+        "-of",
+        "--output_format",
+        action="append",
+        choices=output_formats,
+        default=None,
+        help="Also write outputs in this format (can be repeated)",
+    )
+    parser.add_argument(
+        "-as",
+        "--aging_sweep",
+        default=None,
+        help="YAML file of alternative aging configurations to evaluate",
+    )
     args = parser.parse_args()
+    if args.resume and not args.checkpoint_dir:
+        parser.error("--resume requires --checkpoint_dir")
+    # Each of these holds results for the whole catalogue
+    for option in ("history_db", "delta_dir", "shard"):
+        if args.org and getattr(args, option):
+            parser.error(f"--org cannot be used with --{option}")
+    # Each shard would overwrite these with results for its part of the catalogue
+    for option in ("history_db", "delta_dir"):
+        if args.shard and getattr(args, option):
+            parser.error(f"--shard cannot be used with --{option}")
+    if args.aging_sweep and args.shard:
+        parser.error("--aging_sweep cannot be used with --shard")
     home_folder = expanduser("~")
     today = now_utc()
     mixpanel_config_yaml = join(home_folder, ".mixpanel.yaml")
-    downloads = Downloads(today, mixpanel_config_yaml, args.saved_dir)
+    downloads = Downloads(
+        today,
+        mixpanel_config_yaml,
+        args.saved_dir,
+        project_datasets=args.projected_crawl,
+        checkpoint_dir=args.checkpoint_dir,
+        resume=args.resume,
+        progress_interval=args.progress_interval,
+        organisation=args.org,
+    )
+    if args.shard:
+        shard = parse_shard(args.shard)
+    else:
+        shard = None
+    if args.aging_sweep:
+        aging_configs = load_yaml(args.aging_sweep)
+    else:
+        aging_configs = None
 
     user_agent_config_path = join(home_folder, ".useragents.yaml")
     if not os.path.exists(user_agent_config_path):
@@ -524,4 +834,11 @@ if __name__ == "__main__":
         ),
         downloads=downloads,
         output_dir=args.output_dir,
+        history_db=args.history_db,
+        delta_dir=args.delta_dir,
+        all_users=args.all_users,
+        shard=shard,
+        metrics_file=args.metrics_file,
+        output_formats=args.output_format,
+        aging_configs=aging_configs,
     )
@@ -0,0 +1,394 @@
+import argparse
+import copy
+import csv
+import io
+import json
+import logging
+import os
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os.path import expanduser, join
+from threading import Event, Lock, Thread
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from hdx.analysis_scripts.common.downloads import Downloads
+from hdx.analysis_scripts.common.snapshots import get_dataset_from_dict
+from hdx.analysis_scripts.datasets.__main__ import main as datasets_main
+from hdx.analysis_scripts.orgs.__main__ import main as orgs_main
+from hdx.api.configuration import Configuration
+from hdx.facades.keyword_arguments import facade
+from hdx.utilities.dateparse import now_utc
+from hdx.utilities.path import script_dir_plus_file
+
+logger = logging.getLogger(__name__)
+
+lookup = "hdx-analysis-scripts"
+
+mixpanel_months = (3, 12, 60)
+
+
+class CachedDownloads:
+    """Stands in for Downloads in the main functions of the scripts, serving
+    the lookups and the dataset catalogue from memory. A full load downloads
+    everything again, while an incremental load only gets the datasets whose
+    metadata was modified since the previous load. Deleted datasets are only
+    dropped by a full load.
+
+    Args:
+        downloads (Downloads): Downloads object used to load data
+        overlap (timedelta): Overlap between incremental loads to allow for
+            clock differences. Defaults to 5 minutes.
+    """
+
+    def __init__(self, downloads, overlap=timedelta(minutes=5)):
+        self.downloads = downloads
+        self.overlap = overlap
+        self.today = None
+        self.loaded_at = None
+        self.geospatiality_locations = None
+        self.package_links = None
+        self.requests = None
+        self.organisations = None
+        self.users = None
+        self.mixpanel_downloads = {}
+        self.datasets = {}
+
+    def load(self, today, full):
+        """Load the lookups and all datasets if full is True or just the datasets
+        modified since the last load otherwise.
+
+        Args:
+            today (datetime): Date of this load
+            full (bool): Whether to load everything
+
+        Returns:
+            None
+        """
+        downloads = self.downloads
+        if full or self.loaded_at is None:
+            logger.info("Loading all data")
+            configuration = Configuration.read()
+            downloads.set_api_key(configuration.get_api_key())
+            downloads.today = today
+            self.geospatiality_locations = downloads.get_geospatiality_locations(
+                configuration["org_stats_url"]
+            )
+            self.package_links = downloads.get_package_links()
+            self.requests = list(downloads.get_requests())
+            self.organisations = downloads.get_all_organisations()
+            self.users = downloads.get_all_users()
+            self.load_mixpanel_downloads()
+            self.datasets = {
+                dataset["id"]: dataset for dataset in downloads.get_all_datasets()
+            }
+        else:
+            since = self.loaded_at - self.overlap
+            # Modified datasets keep their place in the crawl order and new
+            # ones, which are created last, go at the end
+            for dataset_dict in downloads.get_datasets_modified_since(since):
+                self.datasets[dataset_dict["id"]] = get_dataset_from_dict(dataset_dict)
+        self.today = today
+        self.loaded_at = today
+        logger.info(f"{len(self.datasets)} datasets in memory")
+
+    def load_mixpanel_downloads(self):
+        self.mixpanel_downloads = {
+            months_ago: self.downloads.get_mixpanel_downloads(months_ago)
+            for months_ago in mixpanel_months
+        }
+
+    def set_api_key(self, api_key):
+        pass
+
+    def close(self):
+        self.downloads.close()
+
+    def get_geospatiality_locations(self, url):
+        return self.geospatiality_locations
+
+    def get_package_links(self):
+        return self.package_links
+
+    def get_requests(self):
+        return iter(self.requests)
+
+    def get_mixpanel_downloads(self, months_ago):
+        return self.mixpanel_downloads[months_ago]
+
+    def get_all_organisations(self):
+        # The org stats script adds its counts to the organisations
+        return copy.deepcopy(self.organisations)
+
+    def get_all_users(self):
+        return self.users
+
+    def get_maintainers(self):
+        return self.users
+
+    def get_all_datasets(self):
+        return iter(list(self.datasets.values()))
+
+
+class StatsTable:
+    """Rows of an output of the scripts held in memory with the CSV and JSON
+    responses prepared in advance and rows indexed by their key columns. Values
+    are held as they appear in the CSV files written by the scripts.
+
+    Args:
+        headers (Sequence[str]): Column headers
+        rows (Sequence[Sequence]): Rows without headers
+        key_columns (Sequence[str]): Columns by which rows can be looked up
+    """
+
+    def __init__(self, headers, rows, key_columns=()):
+        self.headers = list(headers)
+        self.rows = [["" if x is None else str(x) for x in row] for row in rows]
+        if self.rows:
+            self.csv_bytes = self.get_csv_bytes(self.rows)
+        else:
+            self.csv_bytes = b""
+        self.key_to_row = {}
+        for key_column in key_columns:
+            index = self.headers.index(key_column)
+            for row in self.rows:
+                self.key_to_row[row[index]] = row
+        self.json_bytes = self.get_json_bytes(self.rows)
+
+    def get_json_bytes(self, rows):
+        return json.dumps(
+            [dict(zip(self.headers, row)) for row in rows], ensure_ascii=False
+        ).encode("utf-8")
+
+    def get_csv_bytes(self, rows):
+        output = io.StringIO(newline="")
+        # As written by save_iterable
+        writer = csv.writer(output, lineterminator="\r\n")
+        writer.writerow(self.headers)
+        writer.writerows(rows)
+        return output.getvalue().encode("utf-8")
+
+
+class StatsService:
+    """Keeps the outputs of the org stats and datasets scripts in memory,
+    recomputing them on each refresh from data held by CachedDownloads. Every
+    full_refresh_every refreshes (starting with the first), all data is
+    downloaded again. The refreshes in between only download modified datasets.
+    The statistics of all datasets are recomputed on every refresh as freshness
+    depends on the date.
+
+    Args:
+        downloads (Downloads): Downloads object used to load data
+        work_dir (Optional[str]): Folder to which to also write the outputs of
+            the scripts. Defaults to None (not written).
+        full_refresh_every (int): Refreshes between full loads. Defaults to 24.
+        clock (Callable[[], datetime]): Gives the date of each refresh. Defaults
+            to now_utc.
+    """
+
+    def __init__(self, downloads, work_dir=None, full_refresh_every=24, clock=now_utc):
+        self.cached_downloads = CachedDownloads(downloads)
+        self.work_dir = work_dir
+        self.full_refresh_every = full_refresh_every
+        self.clock = clock
+        self.lock = Lock()
+        self.refreshes = 0
+        self.last_refresh = None
+        self.tables = {}
+
+    def refresh(self):
+        with self.lock:
+            today = self.clock()
+            full = self.refreshes % self.full_refresh_every == 0
+            self.cached_downloads.load(today, full)
+            if self.work_dir:
+                orgs_dir = join(self.work_dir, "orgs")
+                datasets_dir = join(self.work_dir, "datasets")
+            else:
+                orgs_dir = None
+                datasets_dir = None
+            outputs = {}
+            orgs_main(self.cached_downloads, orgs_dir, all_users=True, tables=outputs)
+            datasets_main(
+                self.cached_downloads, datasets_dir, all_users=True, tables=outputs
+            )
+            tables = {
+                "org_stats": StatsTable(
+                    *outputs["org_stats"], ("Organisation name", "Organisation id")
+                ),
+                "total_stats": StatsTable(*outputs["total_stats"]),
+                "datasets": StatsTable(*outputs["datasets"], ("name", "id")),
+            }
+            # Requests being served keep using the tables they started with
+            self.tables = tables
+            self.refreshes += 1
+            self.last_refresh = today
+            logger.info(f"Refresh {self.refreshes} of stats complete")
+
+    def get_status(self):
+        return {
+            "refreshes": self.refreshes,
+            "last_refresh": self.last_refresh.isoformat(),
+            "rows": {name: len(table.rows) for name, table in self.tables.items()},
+        }
+
+    def refresh_periodically(self, interval, stop_event):
+        while not stop_event.wait(interval):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Refresh of stats failed!")
+
+
+class StatsRequestHandler(BaseHTTPRequestHandler):
+    """Serves GET /org_stats, /total_stats and /datasets with all rows or
+    /org_stats/<name or id> and /datasets/<name or id> with one row. Rows are
+    JSON objects keyed by the CSV headers unless format=csv is given. GET
+    /status gives the number of refreshes and rows."""
+
+    service = None
+
+    def send_body(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message):
+        body = json.dumps({"error": message}).encode("utf-8")
+        self.send_body(status, body, "application/json")
+
+    def do_GET(self):
+        spliturl = urlsplit(self.path)
+        parts = [unquote(part) for part in spliturl.path.strip("/").split("/")]
+        output_format = parse_qs(spliturl.query).get("format", ["json"])[0]
+        if parts == ["status"]:
+            body = json.dumps(self.service.get_status()).encode("utf-8")
+            self.send_body(200, body, "application/json")
+            return
+        table = self.service.tables.get(parts[0])
+        if table is None or len(parts) > 2:
+            self.send_error_json(404, f"No such path {spliturl.path}!")
+            return
+        if output_format not in ("json", "csv"):
+            self.send_error_json(400, f"Unknown format {output_format}!")
+            return
+        if len(parts) == 1:
+            if output_format == "csv":
+                body = table.csv_bytes
+            else:
+                body = table.json_bytes
+        else:
+            row = table.key_to_row.get(parts[1])
+            if row is None:
+                self.send_error_json(404, f"No row for {parts[1]} in {parts[0]}!")
+                return
+            if output_format == "csv":
+                body = table.get_csv_bytes([row])
+            else:
+                body = json.dumps(
+                    dict(zip(table.headers, row)), ensure_ascii=False
+                ).encode("utf-8")
+        if output_format == "csv":
+            content_type = "text/csv; charset=utf-8"
+        else:
+            content_type = "application/json"
+        self.send_body(200, body, content_type)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+def create_server(service, host, port):
+    handler = type("Handler", (StatsRequestHandler,), {"service": service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(
+    downloads,
+    host="127.0.0.1",
+    port=8080,
+    refresh_interval=3600,
+    full_refresh_every=24,
+    work_dir=None,
+    **ignore,
+):
+    service = StatsService(downloads, work_dir, full_refresh_every)
+    service.refresh()
+    stop_event = Event()
+    refresher = Thread(
+        target=service.refresh_periodically,
+        args=(refresh_interval, stop_event),
+        daemon=True,
+    )
+    refresher.start()
+    server = create_server(service, host, port)
+    logger.info(f"Serving stats on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stats service")
+    parser.add_argument("-ho", "--host", default="127.0.0.1", help="Host to bind")
+    parser.add_argument("-po", "--port", type=int, default=8080, help="Port")
+    parser.add_argument(
+        "-ri",
+        "--refresh_interval",
+        type=float,
+        default=3600,
+        help="Seconds between refreshes of the stats",
+    )
+    parser.add_argument(
+        "-fr",
+        "--full_refresh_every",
+        type=int,
+        default=24,
+        help="Refreshes between downloading everything rather than only "
+        "modified datasets",
+    )
+    parser.add_argument(
+        "-wd",
+        "--work_dir",
+        default=None,
+        help="Folder to which to also write the scripts' outputs",
+    )
+    parser.add_argument(
+        "-pc",
+        "--projected_crawl",
+        action="store_true",
+        help="Keep only the dataset fields used by the scripts",
+    )
+    args = parser.parse_args()
+    home_folder = expanduser("~")
+    today = now_utc()
+    mixpanel_config_yaml = join(home_folder, ".mixpanel.yaml")
+    downloads = Downloads(
+        today,
+        mixpanel_config_yaml,
+        project_datasets=args.projected_crawl,
+    )
+
+    user_agent_config_path = join(home_folder, ".useragents.yaml")
+    if not os.path.exists(user_agent_config_path):
+        user_agent_config_path = join(home_folder, ".useragents.yml")
+    facade(
+        main,
+        hdx_site="prod",
+        user_agent_config_yaml=user_agent_config_path,
+        user_agent_lookup=lookup,
+        project_config_yaml=script_dir_plus_file(
+            join("config", "project_configuration.yaml"), Downloads
+        ),
+        downloads=downloads,
+        host=args.host,
+        port=args.port,
+        refresh_interval=args.refresh_interval,
+        full_refresh_every=args.full_refresh_every,
+        work_dir=args.work_dir,
+    )
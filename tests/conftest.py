@@ -1,13 +1,19 @@
-from os.path import isfile, join
+from os.path import join
 
 import pytest
 from dateutil.relativedelta import relativedelta
 
 from hdx.analysis_scripts.common.downloads import Downloads
+from hdx.analysis_scripts.common.snapshots import (
+    get_saved_path,
+    iterate_json_items,
+    iterate_json_kvitems,
+    iterate_saved_datasets,
+    load_saved_json,
+)
 from hdx.api.configuration import Configuration
-from hdx.data.dataset import Dataset
 from hdx.utilities.dateparse import parse_date
-from hdx.utilities.loader import load_json, load_yaml
+from hdx.utilities.loader import load_yaml
 from hdx.utilities.path import script_dir_plus_file
 from hdx.utilities.useragent import UserAgent
 
@@ -45,6 +51,14 @@ def mock_downloads(input_folder):
         def set_api_key(cls, api_key):
             pass
 
+        @staticmethod
+        def close():
+            pass
+
+        @staticmethod
+        def set_shard_organisations(names):
+            pass
+
         @classmethod
         def get_mixpanel_downloads(cls, months_ago):
             end_date = cls.today
@@ -54,52 +68,48 @@ def mock_downloads(input_folder):
             filename = Downloads.mixpanel_file.replace(
                 ".json", f"_{start_date_str}-{end_date_str}.json"
             )
-            return load_json(join(input_folder, filename))
+            return load_saved_json(input_folder, filename)
 
         @staticmethod
         def get_all_datasets():
-            n = 0
-            dataset_dict_list = []
-            while 1:
-                filename = Downloads.datasets_file.replace(".json", f"_{n}.json")
-                path = join(input_folder, filename)
-                if not isfile(path):
-                    break
-                dataset_dict_list.extend(load_json(path))
-                n += 1
-
-            dataset_list = []
-            for dataset_dict in dataset_dict_list:
-                dataset = Dataset()
-                dataset.data = dataset_dict
-                try:
-                    dataset.separate_resources()
-                except KeyError:
-                    pass
-                dataset_list.append(dataset)
-            return dataset_list
+            return iterate_saved_datasets(input_folder, Downloads.datasets_file)
 
         @staticmethod
         def get_geospatiality_locations(url):
-            geospatiality = load_json(join(input_folder, Downloads.geospatiality_file))
-            locations = load_json(join(input_folder, Downloads.locations_file))
+            geospatiality = load_saved_json(input_folder, Downloads.geospatiality_file)
+            locations = load_saved_json(input_folder, Downloads.locations_file)
             return geospatiality, locations
 
         @staticmethod
         def get_package_links():
-            return load_json(join(input_folder, Downloads.packagelinks_file))
+            return load_saved_json(input_folder, Downloads.packagelinks_file)
 
         @staticmethod
         def get_requests():
-            return load_json(join(input_folder, Downloads.hdxconnect_file))
+            return iterate_json_items(
+                get_saved_path(input_folder, Downloads.hdxconnect_file)
+            )
 
         @staticmethod
         def get_all_organisations():
-            return load_json(join(input_folder, Downloads.organisations_file))
+            return dict(
+                iterate_json_kvitems(
+                    get_saved_path(input_folder, Downloads.organisations_file)
+                )
+            )
 
         @staticmethod
         def get_all_users():
-            return load_json(join(input_folder, Downloads.users_file))
+            users = load_saved_json(input_folder, Downloads.users_file)
+            # Older snapshots have the full user dictionary
+            return {
+                user_id: user["sysadmin"] if isinstance(user, dict) else user
+                for user_id, user in users.items()
+            }
+
+        @classmethod
+        def get_maintainers(cls):
+            return cls.get_all_users()
 
         @staticmethod
         def get_aging(url):
@@ -0,0 +1,421 @@
+"""Local stand-in for the CKAN, HDX and Mixpanel endpoints used by Downloads,
+serving the recorded fixtures so that the real network code can be tested and
+benchmarked offline. Latency, errors and a larger catalogue can be simulated.
+
+Run a benchmark of Downloads against it with eg.:
+
+    python -m tests.stand_in --latency 0.05 --error_rate 0.01 --scale 10
+"""
+
+import argparse
+import copy
+import csv
+import gzip
+import io
+import json
+import logging
+import re
+import time
+from glob import glob
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os.path import basename, isfile, join
+from random import Random
+from threading import Lock, Thread
+from urllib.parse import parse_qs, urlsplit
+from uuid import NAMESPACE_URL, uuid5
+
+from hdx.analysis_scripts.common.downloads import Downloads
+from hdx.analysis_scripts.common.snapshots import (
+    get_saved_path,
+    iterate_json_items,
+    iterate_json_kvitems,
+    load_saved_json,
+    open_saved_file,
+)
+from hdx.utilities.dateparse import parse_date
+
+logger = logging.getLogger(__name__)
+
+mixpanel_file_pattern = re.compile(r"mixpanel_(\d{4}-\d{2}-\d{2})-(\d{4}-\d{2}-\d{2})")
+
+
+def load_optional_json(folder, filename, default):
+    if not isfile(get_saved_path(folder, filename)):
+        return default
+    return load_saved_json(folder, filename)
+
+
+def scale_dataset(dataset, copy_number):
+    """Make a copy of a dataset with a new id and name for a larger catalogue."""
+    dataset = copy.deepcopy(dataset)
+    dataset["id"] = str(uuid5(NAMESPACE_URL, f"{dataset['id']}/{copy_number}"))
+    dataset["name"] = f"{dataset['name']}-{copy_number}"
+    return dataset
+
+
+def get_index_fields(dataset):
+    """Get the fields of a dataset as in the CKAN search index, which is what
+    package_search returns when given fl. The index is flat, so there are no
+    resource or organisation dicts."""
+    fields = {
+        key: value
+        for key, value in dataset.items()
+        if not isinstance(value, (dict, list))
+    }
+    organisation = dataset.get("organization")
+    if organisation:
+        fields["organization"] = organisation["name"]
+    fields["tags"] = [tag["name"] for tag in dataset.get("tags", [])]
+    resources = dataset.get("resources", [])
+    for key in ("name", "url", "format"):
+        fields[f"res_{key}"] = [resource.get(key, "") for resource in resources]
+    return fields
+
+
+class StandInData:
+    """The recorded fixtures served by the stand-in. With a scale of N, each
+    dataset is served N times (the copies having new ids and names) and the
+    copies get the same Mixpanel downloads as the original.
+
+    Args:
+        input_folder (str): Folder of recorded fixtures
+        scale (int): Number of times to serve each dataset. Defaults to 1.
+    """
+
+    def __init__(self, input_folder, scale=1):
+        datasets = []
+        n = 0
+        while True:
+            filename = Downloads.datasets_file.replace(".json", f"_{n}.json")
+            path = get_saved_path(input_folder, filename)
+            if not isfile(path):
+                break
+            datasets.extend(iterate_json_items(path))
+            n += 1
+        self.original_to_copies = {}
+        self.datasets = []
+        for dataset in datasets:
+            self.datasets.append(dataset)
+            copies = []
+            for copy_number in range(1, scale):
+                dataset_copy = scale_dataset(dataset, copy_number)
+                self.datasets.append(dataset_copy)
+                copies.append(dataset_copy["id"])
+            self.original_to_copies[dataset["id"]] = copies
+        self.organisations = dict(
+            iterate_json_kvitems(
+                get_saved_path(input_folder, Downloads.organisations_file)
+            )
+        )
+        self.name_to_organisation = {
+            organisation["name"]: organisation
+            for organisation in self.organisations.values()
+        }
+        self.users = {}
+        users = load_optional_json(input_folder, Downloads.users_file, {})
+        for user_id, user in users.items():
+            if user is None:
+                continue
+            if not isinstance(user, dict):
+                user = {"id": user_id, "name": user_id, "sysadmin": user}
+            self.users[user_id] = {"state": "active", **user}
+        self.package_links = load_saved_json(input_folder, Downloads.packagelinks_file)
+        self.requests = load_optional_json(input_folder, Downloads.hdxconnect_file, [])
+        geospatiality = load_saved_json(input_folder, Downloads.geospatiality_file)
+        locations = load_saved_json(input_folder, Downloads.locations_file)
+        output = io.StringIO(newline="")
+        writer = csv.writer(output)
+        writer.writerow(("Organisation", "Geospatiality", "Location (ISO 3)"))
+        for name in sorted(set(geospatiality) | set(locations)):
+            writer.writerow(
+                (name, geospatiality.get(name, ""), locations.get(name, ""))
+            )
+        self.geospatiality_csv = output.getvalue().encode("utf-8")
+        self.mixpanel_windows = {}
+        for path in sorted(glob(join(input_folder, "mixpanel_*.json*"))):
+            match = mixpanel_file_pattern.search(basename(path))
+            if match is None:
+                continue
+            with open_saved_file(path) as f:
+                counts = json.load(f)
+            for dataset_id, copies in self.original_to_copies.items():
+                count = counts.get(dataset_id)
+                if count:
+                    for copy_id in copies:
+                        counts[copy_id] = count
+            self.mixpanel_windows[match.groups()] = counts
+
+    def search_datasets(self, fq, fl):
+        datasets = self.datasets
+        for condition in fq.split(" AND ") if fq else ():
+            field, value = condition.split(":", 1)
+            if field == "organization":
+                if value.startswith("("):
+                    names = {x.strip('"') for x in value[1:-1].split(" OR ")}
+                else:
+                    names = {value}
+                datasets = [
+                    dataset
+                    for dataset in datasets
+                    if dataset["organization"]["name"] in names
+                ]
+            elif field == "metadata_modified":
+                since = value[1:].split(" TO ")[0].rstrip("Z")
+                datasets = [
+                    dataset
+                    for dataset in datasets
+                    if dataset["metadata_modified"] >= since
+                ]
+            else:
+                raise ValueError(f"Unsupported fq {condition}!")
+        if fl:
+            fields = fl.split(",")
+            datasets = [
+                {
+                    field: value
+                    for field, value in get_index_fields(dataset).items()
+                    if field in fields
+                }
+                for dataset in datasets
+            ]
+        return datasets
+
+    def get_mixpanel_downloads(self, jql_query):
+        """Get the downloads for the window of a JQL query. Only the recorded
+        windows (queried without sharding) have downloads."""
+        from_date, to_date = re.findall(r"'(\d{4}-\d{2}-\d{2})'", jql_query)[:2]
+        counts = self.mixpanel_windows.get((from_date, to_date), {})
+        match = re.search(r"const DATASET_IDS = (.*)", jql_query)
+        if match:
+            dataset_ids = json.loads(match.group(1))
+            counts = {k: v for k, v in counts.items() if k in dataset_ids}
+        return [[dataset_id, count] for dataset_id, count in counts.items()]
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves the CKAN actions, HDX Connect requests export, organisation
+    geospatiality CSV and Mixpanel JQL endpoint from StandInData."""
+
+    server_version = "StandIn/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def send_body(self, status, body, content_type="application/json"):
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body, compresslevel=1)
+            encoding = "gzip"
+        else:
+            encoding = None
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, obj, status=200):
+        self.send_body(status, json.dumps(obj).encode("utf-8"))
+
+    def send_result(self, result):
+        self.send_json({"success": True, "result": result})
+
+    def send_not_found(self):
+        self.send_json(
+            {"success": False, "error": {"__type": "Not Found Error"}}, status=404
+        )
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else b""
+        if self.headers.get("Content-Type", "").startswith(
+            "application/x-www-form-urlencoded"
+        ):
+            return {k: v[0] for k, v in parse_qs(body.decode("utf-8")).items()}
+        if body:
+            return json.loads(body)
+        return {}
+
+    def handle_request(self, method):
+        server = self.server
+        spliturl = urlsplit(self.path)
+        path = spliturl.path
+        parameters = self.read_body() if method == "POST" else {}
+        for key, values in parse_qs(spliturl.query).items():
+            parameters.setdefault(key, values[0])
+        endpoint = basename(path.rstrip("/"))
+        server.record(endpoint)
+        if server.latency:
+            time.sleep(server.latency)
+        if server.should_fail(endpoint):
+            self.send_json({"success": False, "error": "Injected"}, status=503)
+            return
+        data = server.data
+        if path.endswith("/jql"):
+            self.send_json(data.get_mixpanel_downloads(parameters["script"]))
+        elif path.endswith("/requests_data/download"):
+            self.send_json(data.requests)
+        elif path.endswith("/geospatiality.csv"):
+            self.send_body(200, data.geospatiality_csv, "text/csv")
+        elif endpoint == "package_search":
+            datasets = data.search_datasets(parameters.get("fq"), parameters.get("fl"))
+            start = int(parameters.get("start", 0))
+            rows = int(parameters.get("rows", 10))
+            self.send_result(
+                {"count": len(datasets), "results": datasets[start : start + rows]}
+            )
+        elif endpoint == "organization_list":
+            organisations = sorted(data.organisations.values(), key=lambda x: x["name"])
+            if parameters.get("all_fields"):
+                offset = int(parameters.get("offset", 0))
+                limit = int(parameters.get("limit", 1000))
+                self.send_result(organisations[offset : offset + limit])
+            else:
+                self.send_result([x["name"] for x in organisations])
+        elif endpoint == "organization_show":
+            identifier = parameters.get("id")
+            organisation = data.organisations.get(
+                identifier
+            ) or data.name_to_organisation.get(identifier)
+            if organisation is None:
+                self.send_not_found()
+            else:
+                self.send_result(organisation)
+        elif endpoint == "user_list":
+            self.send_result(list(data.users.values()))
+        elif endpoint == "user_show":
+            user = data.users.get(parameters.get("id"))
+            if user is None:
+                self.send_not_found()
+            else:
+                self.send_result(user)
+        elif endpoint == "hdx_package_links_settings_show":
+            self.send_json(data.package_links)
+        else:
+            self.send_not_found()
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Stand-in server. Every request is delayed by latency seconds. Requests
+    fail with a 503 with probability error_rate (drawn from a generator seeded
+    with seed) and the first fail_first[endpoint] requests to an endpoint
+    always fail.
+
+    Args:
+        data (StandInData): Data to serve
+        latency (float): Seconds to delay each request. Defaults to 0.
+        error_rate (float): Probability of a request failing. Defaults to 0.
+        fail_first (Optional[Dict[str, int]]): Failures by endpoint. Defaults to None.
+        seed (int): Seed for error injection. Defaults to 0.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, data, latency=0, error_rate=0, fail_first=None, seed=0, port=0):
+        super().__init__(("127.0.0.1", port), StandInHandler)
+        self.data = data
+        self.latency = latency
+        self.error_rate = error_rate
+        self.fail_first = dict(fail_first or {})
+        self.random = Random(seed)
+        self.lock = Lock()
+        self.requests = {}
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def record(self, endpoint):
+        with self.lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def should_fail(self, endpoint):
+        with self.lock:
+            if self.fail_first.get(endpoint):
+                self.fail_first[endpoint] -= 1
+                return True
+            return self.error_rate > 0 and self.random.random() < self.error_rate
+
+    def start(self):
+        self.thread = Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def run_benchmark(input_folder, latency, error_rate, scale, page_size):
+    from hdx.api.configuration import Configuration
+    from hdx.utilities.useragent import UserAgent
+
+    data = StandInData(input_folder, scale)
+    server = StandInServer(data, latency, error_rate).start()
+    Configuration._create(hdx_read_only=True, hdx_url=server.url, user_agent="test")
+    UserAgent.set_global("test")
+    downloads = Downloads(
+        parse_date("2025-11-16 22:50:00"),
+        "missing.yaml",
+        page_size=page_size,
+        backoff_factor=0.1,
+        mixpanel_shard_months=None,
+        mixpanel_api_url=f"{server.url}/mixpanel/api",
+    )
+    timings = {}
+    start = time.perf_counter()
+    downloads.get_all_organisations()
+    timings["organisations"] = time.perf_counter() - start
+    start = time.perf_counter()
+    downloads.get_mixpanel_downloads(12)
+    timings["mixpanel"] = time.perf_counter() - start
+    start = time.perf_counter()
+    downloads.get_maintainers()
+    number_of_datasets = sum(1 for _ in downloads.get_all_datasets())
+    timings["datasets"] = time.perf_counter() - start
+    server.stop()
+    for name, seconds in timings.items():
+        logger.info(f"{name}: {seconds:.2f}s")
+    logger.info(
+        f"{number_of_datasets} datasets at "
+        f"{number_of_datasets / timings['datasets']:.0f}/s with "
+        f"{sum(downloads.retry_counts.values())} retries and requests "
+        f"{server.requests}"
+    )
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Downloads offline")
+    parser.add_argument(
+        "-if",
+        "--input_folder",
+        default=join("tests", "fixtures", "input"),
+        help="Folder of recorded fixtures",
+    )
+    parser.add_argument(
+        "-la", "--latency", type=float, default=0, help="Seconds per request"
+    )
+    parser.add_argument(
+        "-er", "--error_rate", type=float, default=0, help="Failure probability"
+    )
+    parser.add_argument(
+        "-sc", "--scale", type=int, default=1, help="Copies of each dataset"
+    )
+    parser.add_argument(
+        "-ps", "--page_size", type=int, default=1000, help="Datasets per page"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    run_benchmark(
+        args.input_folder, args.latency, args.error_rate, args.scale, args.page_size
+    )
@@ -0,0 +1,93 @@
+import csv
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from os.path import join
+
+import pytest
+
+from hdx.analysis_scripts.common import get_aging
+from hdx.analysis_scripts.common.aging_sweep import AgingSweep, get_status_counts
+from hdx.analysis_scripts.common.run_context import (
+    RunContext,
+    get_cutoffs,
+    get_timestamp,
+)
+from hdx.analysis_scripts.orgs.__main__ import main
+from hdx.utilities.path import temp_dir
+
+
+class TestAgingSweep:
+    def test_get_status_counts(self, configuration):
+        today = datetime(2025, 5, 15, 12, 30, 1, 500, tzinfo=timezone.utc)
+        run_context = RunContext.create(today, configuration)
+        cutoffs = get_cutoffs(today, get_aging(configuration["last_modified_aging"]))
+        timestamps = sorted(
+            get_timestamp(today - timedelta(days=days, microseconds=microseconds))
+            for days in range(30)
+            for microseconds in (-1, 0, 1)
+        )
+        for update_frequency in (1, 7, 14):
+            expected = Counter(
+                run_context.get_last_modified_freshness(x, update_frequency)
+                for x in timestamps
+            )
+            counts = get_status_counts(timestamps, cutoffs[update_frequency], "Fresh")
+            assert +counts == expected
+
+    def test_aging_sweep(self, configuration, fixtures, mock_downloads):
+        relaxed = {
+            update_frequency: {status: days * 2 for status, days in thresholds.items()}
+            for update_frequency, thresholds in configuration[
+                "last_modified_aging"
+            ].items()
+        }
+        aging_configs = {"relaxed": {"last_modified_aging": relaxed}}
+        with temp_dir(
+            "test_aging_sweep", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            main(mock_downloads, folder, aging_configs=aging_configs)
+            with open(join(fixtures, "total_stats.csv"), encoding="utf-8") as f:
+                totals = list(csv.DictReader(f))[0]
+            with open(join(folder, "aging_sweep.csv"), encoding="utf-8") as f:
+                rows = {row["Aging"]: row for row in csv.DictReader(f)}
+        current = rows["current"]
+        assert current["Fresh"] == totals["Last Modified Fresh"]
+        not_fresh = sum(int(current[x]) for x in ("Due", "Overdue", "Delinquent"))
+        assert not_fresh == int(totals["Last Modified Not Fresh"])
+        for key in (
+            "Quarterly % Last Modified Fresh OKR",
+            "Quarterly % End Date Up To Date OKR",
+        ):
+            assert current[key] == totals[key]
+        assert current["UpToDate"] == totals["End Date Up to Date"]
+        assert current["OutOfDate"] == totals["End Date Out Of Date"]
+        relaxed = rows["relaxed"]
+        assert int(relaxed["Fresh"]) > int(current["Fresh"])
+        assert int(relaxed["Delinquent"]) < int(current["Delinquent"])
+        assert sum(
+            int(relaxed[x]) for x in ("Fresh", "Due", "Overdue", "Delinquent")
+        ) == sum(int(current[x]) for x in ("Fresh", "Due", "Overdue", "Delinquent"))
+        # End date aging is the project's when not given
+        assert relaxed["UpToDate"] == current["UpToDate"]
+        assert relaxed["OutOfDate"] == current["OutOfDate"]
+
+    def test_missing_thresholds(self, configuration, mock_downloads):
+        aging = dict(configuration["last_modified_aging"])
+        del aging[7]
+        aging_configs = {"partial": {"last_modified_aging": aging}}
+        with pytest.raises(ValueError, match=r"aging partial .* \[7\]"):
+            AgingSweep(mock_downloads.today, configuration, aging_configs)
+
+        # The run fails before anything is downloaded
+        class NoDownloads:
+            today = mock_downloads.today
+
+            @staticmethod
+            def close():
+                pass
+
+        with temp_dir(
+            "test_aging_sweep_missing", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with pytest.raises(ValueError):
+                main(NoDownloads(), folder, aging_configs=aging_configs)
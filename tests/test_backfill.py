@@ -0,0 +1,86 @@
+import csv
+from datetime import date, datetime, timezone
+from os.path import exists, join
+
+from dateutil.relativedelta import relativedelta
+
+from hdx.analysis_scripts.backfill.__main__ import DailyDownloads, main
+from hdx.utilities.compare import assert_files_same
+from hdx.utilities.path import temp_dir
+
+# Downloads deduplicated by user, resource and day
+events = {
+    "a": {"2024-01-01": 2, "2024-03-31": 1, "2024-09-30": 3},
+    "b": {"2024-01-01": 1, "2024-04-01": 4},
+    "c": {"2024-09-30": 1, "2024-10-01": 2},
+}
+
+
+class DailyMockDownloads:
+    """Adds daily downloads to the mock Downloads by putting the downloads of
+    each recorded window ending on its date on one day of the window that is
+    not in the shorter windows."""
+
+    def __init__(self, mock_downloads):
+        self.mock_downloads = mock_downloads
+        self.today = mock_downloads.today
+        self.daily_windows = []
+
+    def __getattr__(self, name):
+        return getattr(self.mock_downloads, name)
+
+    def get_mixpanel_daily_downloads(self, start_date, end_date):
+        self.daily_windows.append((start_date, end_date))
+        today = self.mock_downloads.today
+        dataset_id_to_days = {}
+        previous = {}
+        for months_ago, day_months_ago in ((3, 0), (12, 6), (60, 36)):
+            day = (today - relativedelta(months=day_months_ago)).date().isoformat()
+            counts = self.mock_downloads.get_mixpanel_downloads(months_ago)
+            for dataset_id, count in counts.items():
+                count -= previous.get(dataset_id, 0)
+                if count:
+                    dataset_id_to_days.setdefault(dataset_id, {})[day] = count
+            previous = counts
+        return dataset_id_to_days
+
+
+class TestBackfill:
+    def test_daily_downloads(self):
+        daily_downloads = DailyDownloads(events)
+        get_downloads = daily_downloads.get_downloads
+        assert get_downloads(date(2024, 1, 1), date(2024, 10, 1)) == {
+            "a": 6,
+            "b": 5,
+            "c": 3,
+        }
+        assert get_downloads(date(2024, 1, 2), date(2024, 9, 30)) == {
+            "a": 4,
+            "b": 4,
+            "c": 1,
+        }
+        assert get_downloads(date(2024, 4, 1), date(2024, 4, 1)) == {"b": 4}
+        assert get_downloads(date(2024, 4, 2), date(2024, 9, 29)) == {}
+
+    def test_backfill(self, configuration, fixtures, mock_downloads):
+        downloads = DailyMockDownloads(mock_downloads)
+        earlier = datetime(2025, 6, 30, 23, 59, 59, tzinfo=timezone.utc)
+        with temp_dir(
+            "test_backfill", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            main(downloads, [mock_downloads.today, earlier], folder, ("orgs",))
+            assert downloads.daily_windows == [
+                (earlier - relativedelta(months=60), mock_downloads.today)
+            ]
+            orgs_dir = join(folder, "2025-11-16", "orgs")
+            for filename in ("org_stats.csv", "total_stats.csv"):
+                assert_files_same(join(fixtures, filename), join(orgs_dir, filename))
+            assert not exists(join(folder, "2025-11-16", "datasets"))
+            totals = []
+            for run_date in ("2025-06-30", "2025-11-16"):
+                path = join(folder, run_date, "orgs", "total_stats.csv")
+                with open(path, encoding="utf-8") as f:
+                    totals.append(list(csv.DictReader(f))[0])
+            # Datasets created after 30 June are left out
+            key = "Public - Request & Archive"
+            assert int(totals[0][key]) < int(totals[1][key])
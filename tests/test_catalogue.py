@@ -0,0 +1,27 @@
+from os.path import join
+
+from hdx.analysis_scripts.common.catalogue import query_catalogue
+from hdx.analysis_scripts.datasets.__main__ import main
+from hdx.utilities.path import temp_dir
+
+
+class TestCatalogue:
+    def test_catalogue(self, configuration, fixtures, mock_downloads):
+        with temp_dir(
+            "test_catalogue", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            catalogue_db = join(folder, "catalogue.sqlite")
+            main(mock_downloads, folder, catalogue_db=catalogue_db)
+            with open(join(folder, "datasets.csv"), encoding="utf-8") as f:
+                no_rows = sum(1 for _ in f) - 1
+            headers, rows = query_catalogue(catalogue_db)
+            assert len(rows) == no_rows
+            filters = {"public": "Y", "last_modified_fresh": "Delinquent"}
+            _, delinquent = query_catalogue(catalogue_db, filters)
+            public = headers.index("public")
+            last_modified_fresh = headers.index("last_modified_fresh")
+            assert delinquent == [
+                row
+                for row in rows
+                if row[last_modified_fresh] == "Delinquent" and row[public] == "Y"
+            ]
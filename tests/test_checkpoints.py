@@ -0,0 +1,78 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from hdx.analysis_scripts.common.checkpoints import Checkpoint
+from hdx.analysis_scripts.common.downloads import Downloads
+from hdx.utilities.path import temp_dir
+
+
+class TestCheckpoints:
+    def test_checkpoint(self):
+        today = datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        with temp_dir(
+            "test_checkpoint", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            checkpoint = Checkpoint(folder, today)
+            assert checkpoint.get("a", dict, {"x": 1}) == {"x": 1}
+            assert checkpoint.has("a") is True
+            assert checkpoint.has("b") is False
+            later = datetime(2025, 1, 3, tzinfo=timezone.utc)
+            checkpoint = Checkpoint(folder, later, resume=True)
+            assert checkpoint.today == today
+            assert checkpoint.get("a", dict, {"x": 2}) == {"x": 1}
+            checkpoint = Checkpoint(folder, later)
+            assert checkpoint.today == later
+            assert checkpoint.get("a", dict, {"x": 2}) == {"x": 2}
+
+    def test_resume_crawl(self, configuration, monkeypatch):
+        dataset_dicts = [
+            {"id": f"id{i}", "name": f"name{i}", "maintainer": f"user{i % 3}"}
+            for i in range(25)
+        ]
+        pages_requested = []
+        users_looked_up = []
+        fail_at = [2]
+
+        def get_datasets_page(url, n, page_info=None, fq=None):
+            if n == fail_at[0]:
+                raise ConnectionError("Crawl failed")
+            pages_requested.append(n)
+            page_info["result.count"] = len(dataset_dicts)
+            return dataset_dicts[n * 10 : (n + 1) * 10]
+
+        def get_user_sysadmin(user_id):
+            users_looked_up.append(user_id)
+            return user_id, user_id == "user0"
+
+        monkeypatch.setattr(
+            Downloads, "get_user_sysadmin", staticmethod(get_user_sysadmin)
+        )
+        today = datetime(2025, 1, 2, tzinfo=timezone.utc)
+        with temp_dir(
+            "test_resume_crawl", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            downloads = Downloads(today, "", page_size=10, checkpoint_dir=folder)
+            downloads.get_ckan_action_url = lambda action: action
+            downloads.get_datasets_page = get_datasets_page
+            downloads.get_maintainers()
+            with pytest.raises(ConnectionError):
+                for _ in downloads.get_all_datasets():
+                    pass
+            assert pages_requested == [0, 1]
+            assert sorted(users_looked_up) == ["user0", "user1", "user2"]
+
+            fail_at[0] = None
+            later = datetime(2025, 1, 3, tzinfo=timezone.utc)
+            downloads = Downloads(
+                later, "", page_size=10, checkpoint_dir=folder, resume=True
+            )
+            assert downloads.today == today
+            downloads.get_ckan_action_url = lambda action: action
+            downloads.get_datasets_page = get_datasets_page
+            maintainers = downloads.get_maintainers()
+            datasets = [dataset.data for dataset in downloads.get_all_datasets()]
+            assert datasets == dataset_dicts
+            assert pages_requested == [0, 1, 2]
+            assert len(users_looked_up) == 3
+            assert maintainers == {"user0": True, "user1": False, "user2": False}
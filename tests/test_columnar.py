@@ -0,0 +1,112 @@
+import csv
+from datetime import date, datetime, timezone
+from os.path import join
+
+import pytest
+
+from hdx.analysis_scripts.common.columnar import check_output_formats, get_table
+from hdx.analysis_scripts.orgs.__main__ import main
+from hdx.utilities.compare import assert_files_same
+from hdx.utilities.path import temp_dir
+
+pyarrow = pytest.importorskip("pyarrow")
+from pyarrow import feather, parquet  # noqa: E402
+
+
+class TestColumnar:
+    def test_get_table(self):
+        headers = (
+            "name",
+            "downloads last 5 years",
+            "date created",
+            "date data updated",
+            "update frequency",
+            "public",
+            "date updated by script",
+        )
+        rows = [
+            (
+                "a",
+                3,
+                "2015-05-28T06:34:59.298977",
+                datetime(2015, 8, 10, 18, 1, 44, tzinfo=timezone.utc),
+                "-1",
+                "Y",
+                None,
+            ),
+            ("b", 0, "2025-08-26T15:48:24.994384", "2025-08-26", "", "N", ""),
+        ]
+        table = get_table("datasets", headers, rows, "2025-11-16")
+        assert table.schema.field("downloads last 5 years").type == pyarrow.int64()
+        assert table.schema.field("public").type == pyarrow.bool_()
+        assert table.schema.metadata == {b"run_date": b"2025-11-16"}
+        assert table.to_pylist() == [
+            {
+                "name": "a",
+                "downloads last 5 years": 3,
+                "date created": datetime(
+                    2015, 5, 28, 6, 34, 59, 298977, tzinfo=timezone.utc
+                ),
+                "date data updated": datetime(
+                    2015, 8, 10, 18, 1, 44, tzinfo=timezone.utc
+                ),
+                "update frequency": -1,
+                "public": True,
+                "date updated by script": None,
+            },
+            {
+                "name": "b",
+                "downloads last 5 years": 0,
+                "date created": datetime(
+                    2025, 8, 26, 15, 48, 24, 994384, tzinfo=timezone.utc
+                ),
+                "date data updated": datetime(2025, 8, 26, tzinfo=timezone.utc),
+                "update frequency": None,
+                "public": False,
+                "date updated by script": None,
+            },
+        ]
+        table = get_table("datasets", headers, [], "2025-11-16")
+        assert table.num_rows == 0
+        assert table.num_columns == len(headers)
+
+    def test_check_output_formats(self):
+        check_output_formats(None)
+        check_output_formats(["csv", "parquet", "feather"])
+        with pytest.raises(ValueError):
+            check_output_formats(["xlsx"])
+
+    def test_get_org_stats(self, configuration, fixtures, mock_downloads):
+        with temp_dir(
+            "test_columnar", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            main(mock_downloads, folder, output_formats=["parquet", "feather"])
+            for filename in ("org_stats.csv", "total_stats.csv"):
+                assert_files_same(join(fixtures, filename), join(folder, filename))
+            table = parquet.read_table(join(folder, "org_stats.parquet"))
+            assert table.equals(feather.read_table(join(folder, "org_stats.feather")))
+            with open(join(fixtures, "org_stats.csv"), encoding="utf-8") as f:
+                rows = list(csv.DictReader(f))
+            assert table.num_rows == len(rows)
+            assert table.schema.field("Public datasets").type == pyarrow.int64()
+            assert table.schema.field("Closed").type == pyarrow.bool_()
+            row = table.slice(0, 1).to_pylist()[0]
+            expected = rows[0]
+            assert row["Organisation name"] == expected["Organisation name"]
+            assert row["Public datasets"] == int(expected["Public datasets"])
+            assert row["Latitude"] == float(expected["Latitude"])
+            assert row["Any updated last 3 months"] == (
+                expected["Any updated last 3 months"] == "Yes"
+            )
+            latest = expected["Latest created dataset date"]
+            if latest:
+                assert row["Latest created dataset date"] == date.fromisoformat(latest)
+            table = parquet.read_table(join(folder, "total_stats.parquet"))
+            with open(join(fixtures, "total_stats.csv"), encoding="utf-8") as f:
+                headers, values = csv.reader(f)
+            assert table.to_pylist() == [
+                {
+                    header: float(value) if "%" in header else int(value)
+                    for header, value in zip(headers, values)
+                }
+            ]
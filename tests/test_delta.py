@@ -0,0 +1,52 @@
+from os.path import join
+
+from hdx.analysis_scripts.common.delta import write_delta
+from hdx.utilities.path import temp_dir
+
+
+class TestDelta:
+    def test_write_delta(self):
+        headers = ["id", "name", "public", "downloads"]
+        rows = [
+            ["a", "dataset-a", "Y", 10],
+            ["b", "dataset-b", "N", None],
+            ["c", "dataset-c", "Y", 5],
+        ]
+        with temp_dir(
+            "test_delta", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            delta_rows = write_delta(folder, folder, "datasets", headers, rows, "id")
+            assert [row[:3] for row in delta_rows] == [
+                ["added", "", "a"],
+                ["added", "", "b"],
+                ["added", "", "c"],
+            ]
+            delta_rows = write_delta(folder, folder, "datasets", headers, rows, "id")
+            assert delta_rows == []
+            rows = [
+                ["a", "dataset-a", "Y", 12],
+                ["c", "dataset-c", "Y", 5],
+                ["d", "dataset-d", "Y", 1],
+            ]
+            delta_rows = write_delta(folder, folder, "datasets", headers, rows, "id")
+            assert delta_rows == [
+                ["changed", "downloads", "a", "dataset-a", "Y", 12],
+                ["added", "", "d", "dataset-d", "Y", 1],
+                ["removed", "", "b", "", "", ""],
+            ]
+            headers = ["id", "name", "title", "public", "downloads"]
+            rows = [
+                ["a", "dataset-a", "A", "Y", 12],
+                ["c", "dataset-c", "C", "N", 5],
+                ["d", "dataset-d", "D", "Y", 1],
+            ]
+            delta_rows = write_delta(folder, folder, "datasets", headers, rows, "id")
+            assert [row[:3] for row in delta_rows] == [
+                ["changed", "title", "a"],
+                ["changed", "title;public", "c"],
+                ["changed", "title", "d"],
+            ]
+            with open(join(folder, "datasets_delta.csv"), encoding="utf-8") as f:
+                assert f.readline().strip() == (
+                    "change,changed columns,id,name,title,public,downloads"
+                )
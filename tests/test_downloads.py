@@ -0,0 +1,95 @@
+from datetime import datetime, timezone
+
+import pytest
+import requests
+from ckanapi.errors import NotAuthorized, NotFound
+
+from hdx.analysis_scripts.common.downloads import Downloads, check_dataset_counts
+from hdx.data.hdxobject import HDXError
+
+
+class TestDownloads:
+    def test_crawl_changing_catalogue(self, configuration, caplog):
+        dataset_dicts = [{"id": f"id{i}", "name": f"name{i}"} for i in range(25)]
+
+        # A dataset created during the crawl pushes id9 onto the next page
+        def get_datasets_page(url, n, page_info=None, fq=None):
+            if n == 0:
+                page_info["result.count"] = 25
+                return dataset_dicts[:10]
+            page_info["result.count"] = 26
+            page = dataset_dicts[n * 10 - 1 : (n + 1) * 10 - 1]
+            if n == 2:
+                page.append({"id": "id25", "name": "name25"})
+            return page
+
+        today = datetime(2025, 1, 2, tzinfo=timezone.utc)
+        downloads = Downloads(today, "", page_size=10)
+        downloads.get_ckan_action_url = lambda action: action
+        downloads.get_datasets_page = get_datasets_page
+        ids = [dataset["id"] for dataset in downloads.get_all_datasets()]
+        assert ids == [f"id{i}" for i in range(26)]
+        assert "Dropping dataset id9 returned more than once" in caplog.text
+        assert "Dataset count changed during crawl from 25 to 26!" in caplog.text
+        assert "Crawled 26 datasets but package_search counted 25!" in caplog.text
+
+    def test_check_dataset_counts(self):
+        assert check_dataset_counts(10, []) is True
+        assert check_dataset_counts(10, [10, 10]) is True
+        assert check_dataset_counts(9, [10, 10]) is False
+        assert check_dataset_counts(10, [10, 9]) is False
+
+    def test_lookup_maintainers(self, configuration, monkeypatch, caplog):
+        users = {
+            "admin": {"id": "admin", "state": "active", "sysadmin": True},
+            "editor": {"id": "editor", "state": "active", "sysadmin": False},
+            "gone": {"id": "gone", "state": "deleted", "sysadmin": False},
+        }
+        looked_up = []
+
+        def call_remoteckan(action, data):
+            assert action == "user_show"
+            user_id = data["id"]
+            looked_up.append(user_id)
+            if user_id == "private":
+                raise NotAuthorized("Access denied")
+            if user_id == "down":
+                raise requests.ConnectionError("Connection reset")
+            user = users.get(user_id)
+            if user is None:
+                raise NotFound("User not found")
+            return user
+
+        monkeypatch.setattr(configuration, "call_remoteckan", call_remoteckan)
+        dataset_dicts = [
+            {"id": f"id{i}", "name": f"name{i}", "maintainer": maintainer}
+            for i, maintainer in enumerate(
+                ("admin", "editor", "gone", "missing", "private", "admin")
+            )
+        ]
+
+        def get_datasets_page(url, n, page_info=None, fq=None):
+            page_info["result.count"] = len(dataset_dicts)
+            return dataset_dicts
+
+        today = datetime(2025, 1, 2, tzinfo=timezone.utc)
+        downloads = Downloads(today, "", page_size=10)
+        downloads.get_ckan_action_url = lambda action: action
+        downloads.get_datasets_page = get_datasets_page
+        maintainers = downloads.get_maintainers()
+        assert len(list(downloads.get_all_datasets())) == 6
+        assert maintainers == {
+            "admin": True,
+            "editor": False,
+            "gone": None,
+            "missing": None,
+            "private": None,
+        }
+        assert sorted(looked_up) == ["admin", "editor", "gone", "missing", "private"]
+        assert "Maintainer private is invalid" in caplog.text
+
+        # Transient errors stop the crawl rather than invalidating maintainers
+        dataset_dicts.append({"id": "id6", "name": "name6", "maintainer": "down"})
+        with pytest.raises(HDXError):
+            list(downloads.get_all_datasets())
+        assert "down" not in maintainers
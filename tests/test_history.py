@@ -0,0 +1,73 @@
+from os.path import join
+
+import pytest
+
+from hdx.analysis_scripts.common.history import HistoryStore
+from hdx.utilities.dateparse import parse_date
+from hdx.utilities.path import temp_dir
+
+
+class TestHistory:
+    def test_history(self):
+        with temp_dir(
+            "test_history", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            path = join(folder, "history.sqlite")
+            headers = ["Organisation name", "Public datasets"]
+            with HistoryStore(path) as history:
+                history.append(
+                    "org_stats", "2025-11-15", headers, [["acled", 5], ["wfp", 7]]
+                )
+                history.append(
+                    "total_stats", "2025-11-15", ["Quarterly % API OKR"], [["81"]]
+                )
+            with HistoryStore(path) as history:
+                history.append(
+                    "org_stats",
+                    "2025-11-16",
+                    [*headers, "Latest created dataset date"],
+                    [["acled", 6, parse_date("2025-11-16")]],
+                )
+                history.append(
+                    "total_stats", "2025-11-16", ["Quarterly % API OKR"], [["83"]]
+                )
+                # rerun on the same date replaces rather than duplicates
+                history.append(
+                    "total_stats", "2025-11-16", ["Quarterly % API OKR"], [["84"]]
+                )
+                assert history.get_org_series("acled", "Public datasets") == [
+                    ("2025-11-15", 5),
+                    ("2025-11-16", 6),
+                ]
+                assert history.get_org_series(
+                    "acled", "Latest created dataset date"
+                ) == [("2025-11-15", None), ("2025-11-16", "2025-11-16T00:00:00+00:00")]
+                assert history.get_total_series("Quarterly % API OKR") == [
+                    ("2025-11-15", "81"),
+                    ("2025-11-16", "84"),
+                ]
+                with pytest.raises(ValueError):
+                    history.get_total_series("Unknown")
+
+    def test_rerun_with_fewer_rows(self):
+        with temp_dir(
+            "test_history_rerun", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            path = join(folder, "history.sqlite")
+            headers = ["Organisation name", "Public datasets"]
+            with HistoryStore(path) as history:
+                history.append(
+                    "org_stats", "2025-11-15", headers, [["acled", 5], ["wfp", 7]]
+                )
+                history.append(
+                    "org_stats", "2025-11-16", headers, [["acled", 6], ["wfp", 8]]
+                )
+                # wfp was removed before the rerun of 16 November
+                history.append("org_stats", "2025-11-16", headers, [["acled", 4]])
+                assert history.get_org_series("wfp", "Public datasets") == [
+                    ("2025-11-15", 7)
+                ]
+                assert history.get_org_series("acled", "Public datasets") == [
+                    ("2025-11-15", 5),
+                    ("2025-11-16", 4),
+                ]
@@ -0,0 +1,21 @@
+from hdx.analysis_scripts.common import NO_REQUESTS
+from hdx.analysis_scripts.common.ids import DatasetIndex
+
+
+class TestIds:
+    def test_dataset_index(self):
+        dataset_index = DatasetIndex()
+        dataset_index.add_requests({"b": (1, 0, 2, 1, 0), "c": (0, 3, 0, 0, 0)})
+        dataset_index.add_counts("downloads", {"a": 5, "c": 12})
+        assert len(dataset_index) == 3
+        assert dataset_index.ids == ["b", "c", "a"]
+        assert dataset_index.get_index("c") == 1
+        assert dataset_index.get_index("d") == 3
+        assert dataset_index.get_count("downloads", 0) == 0
+        assert dataset_index.get_count("downloads", 1) == 12
+        assert dataset_index.get_count("downloads", 2) == 5
+        assert dataset_index.get_count("downloads", 3) == 0
+        assert dataset_index.get_requests(0) == (1, 0, 2, 1, 0)
+        assert dataset_index.get_requests(1) == (0, 3, 0, 0, 0)
+        assert dataset_index.get_requests(2) == NO_REQUESTS
+        assert dataset_index.get_requests(3) == NO_REQUESTS
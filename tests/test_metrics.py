@@ -0,0 +1,69 @@
+from collections import Counter
+from os.path import join
+from types import SimpleNamespace
+
+from hdx.analysis_scripts.common.metrics import RunMetrics
+from hdx.analysis_scripts.common.progress import ProgressReporter
+
+
+class TestMetrics:
+    def test_run_metrics(self, tmp_path):
+        now = [10.0]
+        metrics = RunMetrics("org_stats", clock=lambda: now[0])
+        metrics.start_phase("download")
+        now[0] += 2.5
+        metrics.start_phase("crawl")
+        now[0] += 4
+        metrics.end_phase()
+        assert metrics.get("phase_duration_seconds", phase="download") == 2.5
+        assert metrics.get("phase_duration_seconds", phase="crawl") == 4
+        metrics.set("totals", 100, "Totals", total="public")
+        metrics.set_ratio("okr_percentage", 2500, 100, "OKRs", okr="api")
+        metrics.set_ratio("okr_percentage", 0, 0, "OKRs", okr="end date up to date")
+        progress = ProgressReporter("datasets")
+        progress.add_page(total=1234, number_of_bytes=4096)
+        progress.processed = 1000
+        downloads = SimpleNamespace(
+            bytes_downloaded=Counter({"package_search": 4096}),
+            retry_counts=Counter({"package_search": 2}),
+            progress=progress,
+        )
+        metrics.add_downloads(downloads)
+        metrics.set("label", 1, "Label escaping", org='a "b"\\c')
+        assert metrics.get_text() == (
+            "# TYPE hdx_analysis_phase_duration_seconds gauge\n"
+            "# HELP hdx_analysis_phase_duration_seconds Time taken by each phase of the run\n"
+            'hdx_analysis_phase_duration_seconds{script="org_stats",phase="download"} 2.5\n'
+            'hdx_analysis_phase_duration_seconds{script="org_stats",phase="crawl"} 4.0\n'
+            "# TYPE hdx_analysis_totals gauge\n"
+            "# HELP hdx_analysis_totals Totals\n"
+            'hdx_analysis_totals{script="org_stats",total="public"} 100\n'
+            "# TYPE hdx_analysis_okr_percentage gauge\n"
+            "# HELP hdx_analysis_okr_percentage OKRs\n"
+            'hdx_analysis_okr_percentage{script="org_stats",okr="api"} 25.0\n'
+            "# TYPE hdx_analysis_downloaded_bytes gauge\n"
+            "# HELP hdx_analysis_downloaded_bytes Bytes downloaded from each source before decompression\n"
+            'hdx_analysis_downloaded_bytes{script="org_stats",source="package_search"} 4096\n'
+            "# TYPE hdx_analysis_retries gauge\n"
+            "# HELP hdx_analysis_retries Retries made for each source\n"
+            'hdx_analysis_retries{script="org_stats",source="package_search"} 2\n'
+            "# TYPE hdx_analysis_datasets_crawled gauge\n"
+            "# HELP hdx_analysis_datasets_crawled Datasets crawled\n"
+            'hdx_analysis_datasets_crawled{script="org_stats"} 1000\n'
+            "# TYPE hdx_analysis_dataset_pages gauge\n"
+            "# HELP hdx_analysis_dataset_pages Pages of datasets crawled\n"
+            'hdx_analysis_dataset_pages{script="org_stats"} 1\n'
+            "# TYPE hdx_analysis_catalogue_datasets gauge\n"
+            "# HELP hdx_analysis_catalogue_datasets Datasets in CKAN\n"
+            'hdx_analysis_catalogue_datasets{script="org_stats"} 1234\n'
+            "# TYPE hdx_analysis_label gauge\n"
+            "# HELP hdx_analysis_label Label escaping\n"
+            'hdx_analysis_label{script="org_stats",org="a \\"b\\"\\\\c"} 1\n'
+            "# EOF\n"
+        )
+        path = join(tmp_path, "metrics.prom")
+        metrics.write(path)
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        assert "hdx_analysis_last_run_timestamp_seconds" in text
+        assert text.endswith("# EOF\n")
@@ -0,0 +1,116 @@
+import json
+import re
+from datetime import datetime, timezone
+
+from hdx.analysis_scripts.common.downloads import (
+    Downloads,
+    get_date_shards,
+    get_jql_dataset_filter,
+)
+
+# Downloads deduplicated by user, resource and day
+events = {
+    "2024-01-01": {"a": 2, "b": 1},
+    "2024-03-31": {"a": 1},
+    "2024-04-01": {"b": 4},
+    "2024-09-30": {"a": 3, "c": 1},
+    "2024-10-01": {"c": 2},
+}
+
+
+class TestMixpanel:
+    def test_get_date_shards(self):
+        start_date = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        end_date = datetime(2024, 10, 1, tzinfo=timezone.utc)
+        assert get_date_shards(start_date, end_date, None) == [
+            ("2024-01-01", "2024-10-01")
+        ]
+        assert get_date_shards(start_date, end_date, 3) == [
+            ("2024-01-01", "2024-03-31"),
+            ("2024-04-01", "2024-06-30"),
+            ("2024-07-01", "2024-09-30"),
+            ("2024-10-01", "2024-10-01"),
+        ]
+        start_date = datetime(2023, 11, 30, tzinfo=timezone.utc)
+        end_date = datetime(2024, 2, 29, tzinfo=timezone.utc)
+        assert get_date_shards(start_date, end_date, 1) == [
+            ("2023-11-30", "2023-12-29"),
+            ("2023-12-30", "2024-01-29"),
+            ("2024-01-30", "2024-02-28"),
+            ("2024-02-29", "2024-02-29"),
+        ]
+
+    def test_get_mixpanel_downloads(self, monkeypatch):
+        monkeypatch.setattr("hdx.analysis_scripts.common.downloads.sleep", id)
+        failures = {"2024-04-01": 1}
+
+        def query_jql(mputils, jql_query):
+            from_date, to_date = re.findall(r"\d{4}-\d{2}-\d{2}", jql_query)
+            if failures.get(from_date):
+                failures[from_date] -= 1
+                raise BaseException
+            counts = {}
+            for date, date_counts in events.items():
+                if from_date <= date <= to_date:
+                    for dataset_id, count in date_counts.items():
+                        counts[dataset_id] = counts.get(dataset_id, 0) + count
+            return counts
+
+        today = datetime(2024, 10, 1, tzinfo=timezone.utc)
+        expected = {"a": 6, "b": 5, "c": 3}
+        for shard_months in (None, 3, 1):
+            downloads = Downloads(
+                today, "missing.yaml", mixpanel_shard_months=shard_months
+            )
+            downloads.rate_limited_query_jql = query_jql
+            assert downloads.get_mixpanel_downloads(9) == expected
+        assert failures == {"2024-04-01": 0}
+
+    def test_get_organisation_mixpanel_downloads(self, monkeypatch):
+        assert get_jql_dataset_filter(None) == ("", "")
+        constant, dataset_filter = get_jql_dataset_filter(["a", "c"])
+        assert constant == '\nconst DATASET_IDS = {"a": true, "c": true}'
+        assert "DATASET_IDS[event.properties['dataset id']]" in dataset_filter
+
+        def query_jql(mputils, jql_query):
+            from_date, to_date = re.findall(r"\d{4}-\d{2}-\d{2}", jql_query)
+            match = re.search(r"const DATASET_IDS = (.*)", jql_query)
+            dataset_ids = json.loads(match.group(1))
+            counts = {}
+            for date, date_counts in events.items():
+                if from_date <= date <= to_date:
+                    for dataset_id, count in date_counts.items():
+                        if dataset_ids.get(dataset_id):
+                            counts[dataset_id] = counts.get(dataset_id, 0) + count
+            return counts
+
+        today = datetime(2024, 10, 1, tzinfo=timezone.utc)
+        downloads = Downloads(today, "missing.yaml", organisation="org")
+        downloads.rate_limited_query_jql = query_jql
+        downloads.organisation_dataset_ids = ["a", "c"]
+        assert downloads.get_mixpanel_downloads(9) == {"a": 6, "c": 3}
+
+    def test_get_mixpanel_daily_downloads(self):
+        def query_jql(mputils, jql_query):
+            assert '.groupBy(["key.2", "key.3"]' in jql_query
+            from_date, to_date = re.findall(r"\d{4}-\d{2}-\d{2}", jql_query)
+            rows = []
+            for date, date_counts in events.items():
+                if from_date <= date <= to_date:
+                    day = datetime.fromisoformat(date).replace(tzinfo=timezone.utc)
+                    for dataset_id, count in date_counts.items():
+                        rows.append([dataset_id, day.timestamp() * 1000, count])
+            return rows
+
+        start_date = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        end_date = datetime(2024, 9, 30, tzinfo=timezone.utc)
+        for shard_months in (None, 3):
+            downloads = Downloads(
+                end_date, "missing.yaml", mixpanel_shard_months=shard_months
+            )
+            downloads.rate_limited_query_jql = query_jql
+            assert downloads.get_mixpanel_daily_downloads(start_date, end_date) == {
+                "a": {"2024-01-01": 2, "2024-03-31": 1, "2024-09-30": 3},
+                "b": {"2024-01-01": 1, "2024-04-01": 4},
+                "c": {"2024-09-30": 1},
+            }
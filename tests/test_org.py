@@ -0,0 +1,49 @@
+import runpy
+import sys
+
+import pytest
+
+
+class TestOrg:
+    @pytest.mark.parametrize(
+        "script, option",
+        [
+            ("orgs", "--history_db=history.sqlite"),
+            ("orgs", "--delta_dir=delta"),
+            ("orgs", "--shard=0/2"),
+            ("datasets", "--history_db=history.sqlite"),
+            ("datasets", "--delta_dir=delta"),
+            ("datasets", "--shard=0/2"),
+            ("datasets", "--catalogue_db=catalogue.sqlite"),
+        ],
+    )
+    def test_org_rejected(self, monkeypatch, capsys, script, option):
+        module = f"hdx.analysis_scripts.{script}"
+        monkeypatch.setattr(sys, "argv", [script, "--org=wfp", option])
+        # Run the script afresh even if other tests imported it
+        monkeypatch.delitem(sys.modules, f"{module}.__main__", raising=False)
+        with pytest.raises(SystemExit) as excinfo:
+            runpy.run_module(module, run_name="__main__")
+        assert excinfo.value.code == 2
+        name = option[2:].split("=")[0]
+        assert f"--org cannot be used with --{name}" in capsys.readouterr().err
+
+    @pytest.mark.parametrize(
+        "script, option",
+        [
+            ("orgs", "--history_db=history.sqlite"),
+            ("orgs", "--delta_dir=delta"),
+            ("datasets", "--history_db=history.sqlite"),
+            ("datasets", "--delta_dir=delta"),
+            ("datasets", "--catalogue_db=catalogue.sqlite"),
+        ],
+    )
+    def test_shard_rejected(self, monkeypatch, capsys, script, option):
+        module = f"hdx.analysis_scripts.{script}"
+        monkeypatch.setattr(sys, "argv", [script, "--shard=0/2", option])
+        monkeypatch.delitem(sys.modules, f"{module}.__main__", raising=False)
+        with pytest.raises(SystemExit) as excinfo:
+            runpy.run_module(module, run_name="__main__")
+        assert excinfo.value.code == 2
+        name = option[2:].split("=")[0]
+        assert f"--shard cannot be used with --{name}" in capsys.readouterr().err
@@ -0,0 +1,38 @@
+import logging
+
+from hdx.analysis_scripts.common.progress import (
+    ProgressReporter,
+    format_bytes,
+    format_duration,
+)
+
+
+class TestProgress:
+    def test_format(self):
+        assert format_bytes(512) == "512B"
+        assert format_bytes(2048) == "2.0KB"
+        assert format_bytes(5 * 1024 * 1024 * 1024 * 1024) == "5120.0GB"
+        assert format_duration(42.7) == "42s"
+        assert format_duration(125) == "2m05s"
+        assert format_duration(3723) == "1h02m03s"
+
+    def test_progress_reporter(self, caplog):
+        now = [100.0]
+        progress = ProgressReporter("datasets", interval=10, clock=lambda: now[0])
+        progress.add_page(total=40, number_of_bytes=3000)
+        with caplog.at_level(logging.INFO):
+            for _ in range(10):
+                now[0] += 1
+                progress.add_processed()
+            assert caplog.messages == [
+                "10/40 (25.0%) datasets at 1.0/s, 1 pages, 2.9KB downloaded, ETA 30s"
+            ]
+            progress.add_page(number_of_bytes=1000)
+            now[0] += 5
+            progress.add_processed()
+            assert len(caplog.messages) == 1
+            progress.log_summary()
+        assert caplog.messages[-1] == (
+            "Processed 11 datasets in 15s at 0.7/s from 2 pages (3.9KB downloaded)"
+        )
+        assert progress.total == 40
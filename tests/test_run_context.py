@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta, timezone
+
+from hdx.analysis_scripts.common import get_aging
+from hdx.analysis_scripts.common.run_context import RunContext, get_timestamp
+
+
+class TestRunContext:
+    def test_run_context(self, configuration):
+        today = datetime(2025, 5, 15, 12, 30, 1, 500, tzinfo=timezone.utc)
+        run_context = RunContext.create(today, configuration)
+        assert get_timestamp(today) == 1747312201000500
+        assert run_context.today_timestamp == 1747312201000500
+
+        def get_status(date):
+            return run_context.get_last_modified_freshness(get_timestamp(date), 7)
+
+        assert get_status(today) == "Fresh"
+        assert get_status(today - timedelta(days=7) + timedelta(microseconds=1)) == (
+            "Fresh"
+        )
+        assert get_status(today - timedelta(days=7)) == "Due"
+        assert get_status(today - timedelta(days=14)) == "Overdue"
+        assert get_status(today - timedelta(days=21)) == "Delinquent"
+        assert get_status(today - timedelta(days=1000)) == "Delinquent"
+
+        aging = get_aging(configuration["end_date_aging"])
+        for days in (0, 29, 30, 31):
+            date = today - timedelta(days=days)
+            expected = (
+                "OutOfDate" if today - date >= aging[30]["OutOfDate"] else "UpToDate"
+            )
+            assert (
+                run_context.get_end_date_uptodate(get_timestamp(date), 30) == expected
+            )
+
+        assert run_context.is_last_3_months(get_timestamp(today)) is True
+        assert (
+            run_context.is_last_3_months(get_timestamp(today + timedelta(seconds=1)))
+            is False
+        )
+        last_3_months = datetime(2025, 2, 15, 12, 30, 1, 500, tzinfo=timezone.utc)
+        assert run_context.is_last_3_months(get_timestamp(last_3_months)) is False
+        assert (
+            run_context.is_last_3_months(
+                get_timestamp(last_3_months + timedelta(microseconds=1))
+            )
+            is True
+        )
+        start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        end = datetime(2025, 3, 31, 23, 59, 59, 999999, tzinfo=timezone.utc)
+        assert run_context.is_previous_quarter(get_timestamp(start)) is True
+        assert run_context.is_previous_quarter(get_timestamp(end)) is True
+        assert (
+            run_context.is_previous_quarter(
+                get_timestamp(end + timedelta(microseconds=1))
+            )
+            is False
+        )
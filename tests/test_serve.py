@@ -0,0 +1,96 @@
+import csv
+import json
+from os.path import join
+from threading import Thread
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pytest
+
+from hdx.analysis_scripts.serve.__main__ import StatsService, create_server
+from hdx.utilities.compare import assert_files_same
+from hdx.utilities.path import temp_dir
+
+
+class TestServe:
+    @pytest.fixture
+    def service(self, configuration, mock_downloads):
+        service = StatsService(
+            mock_downloads,
+            full_refresh_every=2,
+            clock=lambda: mock_downloads.today,
+        )
+        service.refresh()
+        return service
+
+    def test_serve(self, fixtures, mock_downloads, monkeypatch, service):
+        server = create_server(service, "127.0.0.1", 0)
+        Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+
+        def get(path):
+            with urlopen(f"{url}/{path}") as response:
+                return response.read()
+
+        try:
+            with open(join(fixtures, "org_stats.csv"), "rb") as f:
+                assert get("org_stats?format=csv") == f.read()
+            with open(join(fixtures, "total_stats.csv"), "rb") as f:
+                assert get("total_stats?format=csv") == f.read()
+            with open(join(fixtures, "total_stats.csv"), encoding="utf-8") as f:
+                headers, row = csv.reader(f)
+            assert json.loads(get("total_stats")) == [dict(zip(headers, row))]
+            org_stats = json.loads(get("org_stats"))
+            organisation = org_stats[0]
+            name = organisation["Organisation name"]
+            assert json.loads(get(f"org_stats/{name}")) == organisation
+            organisation_id = organisation["Organisation id"]
+            assert json.loads(get(f"org_stats/{organisation_id}")) == organisation
+            rows = get(f"org_stats/{name}?format=csv").decode("utf-8").splitlines()
+            assert len(rows) == 2
+            assert rows[0].startswith("Organisation name,")
+            datasets = json.loads(get("datasets"))
+            dataset = datasets[0]
+            assert json.loads(get(f"datasets/{dataset['id']}")) == dataset
+            with pytest.raises(HTTPError) as excinfo:
+                get("datasets/not-a-dataset")
+            assert excinfo.value.code == 404
+            with pytest.raises(HTTPError) as excinfo:
+                get("datasets?format=xml")
+            assert excinfo.value.code == 400
+
+            # An incremental refresh only asks for modified datasets
+            modified_since = []
+
+            def get_datasets_modified_since(since):
+                modified_since.append(since)
+                return []
+
+            monkeypatch.setattr(
+                mock_downloads,
+                "get_datasets_modified_since",
+                get_datasets_modified_since,
+                raising=False,
+            )
+            service.refresh()
+            assert len(modified_since) == 1
+            status = json.loads(get("status"))
+            assert status["refreshes"] == 2
+            assert status["rows"]["datasets"] == len(datasets)
+            assert json.loads(get("org_stats")) == org_stats
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_work_dir(self, configuration, fixtures, mock_downloads, service):
+        with temp_dir(
+            "test_serve", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            written = StatsService(
+                mock_downloads, folder, clock=lambda: mock_downloads.today
+            )
+            written.refresh()
+            filename = "total_stats.csv"
+            with open(join(folder, "orgs", filename), "rb") as f:
+                assert f.read() == service.tables["total_stats"].csv_bytes
+            assert_files_same(join(fixtures, filename), join(folder, "orgs", filename))
@@ -0,0 +1,60 @@
+import gzip
+import json
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+from hdx.analysis_scripts.common.session import create_session, get_source
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    failures = 2
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        if FlakyHandler.failures:
+            FlakyHandler.failures -= 1
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = json.dumps({"result": self.headers["Accept-Encoding"]})
+        body = gzip.compress(body.encode("utf-8"))
+        self.send_response(200)
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestSession:
+    def test_get_source(self):
+        assert (
+            get_source("https://data.humdata.org/api/action/package_search")
+            == "package_search"
+        )
+        assert get_source("/ckan-admin/requests_data/download?format=json") == (
+            "download"
+        )
+        assert get_source("https://docs.google.com/") == "docs.google.com"
+
+    def test_create_session(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+        thread = Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            retry_counts = Counter()
+            session = create_session(
+                "test", retry_counts, backoff_factor=0, backoff_jitter=0
+            )
+            url = f"http://127.0.0.1:{server.server_port}/api/action/package_search"
+            response = session.post(url, json={})
+            assert response.json() == {"result": "gzip, deflate"}
+            assert retry_counts == {"package_search": 2}
+            session.close()
+        finally:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,46 @@
+from os.path import join
+
+import pytest
+
+from hdx.analysis_scripts.common.shards import in_shard, load_partials, parse_shard
+from hdx.analysis_scripts.datasets.__main__ import main as datasets_main
+from hdx.analysis_scripts.merge.__main__ import main as merge_main
+from hdx.analysis_scripts.orgs.__main__ import main as orgs_main
+from hdx.utilities.compare import assert_files_same
+from hdx.utilities.path import temp_dir
+
+
+class TestShards:
+    def test_parse_shard(self):
+        assert parse_shard("0/4") == (0, 4)
+        assert parse_shard("3/4") == (3, 4)
+        with pytest.raises(ValueError):
+            parse_shard("4/4")
+        with pytest.raises(ValueError):
+            parse_shard("1")
+        keys = [f"key{i}" for i in range(100)]
+        shards = [sum(in_shard(key, (i, 3)) for i in range(3)) for key in keys]
+        assert shards == [1] * 100
+
+    def test_merge(self, configuration, fixtures, mock_downloads):
+        with temp_dir(
+            "test_shards", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            for name, main in (("org_stats", orgs_main), ("datasets", datasets_main)):
+                partial_files = []
+                for index in range(2):
+                    shard_dir = join(folder, f"{name}_{index}")
+                    main(mock_downloads, shard_dir, shard=(index, 2))
+                    partial_files.append(
+                        join(shard_dir, f"{name}_partial_{index}_of_2.json.gz")
+                    )
+                with pytest.raises(ValueError):
+                    load_partials(partial_files[:1])
+                merge_main(partial_files, folder)
+            for filename in (
+                "org_stats.csv",
+                "total_stats.csv",
+                "datasets.csv",
+                "non_script_updates.csv",
+            ):
+                assert_files_same(join(fixtures, filename), join(folder, filename))
@@ -0,0 +1,50 @@
+from os.path import exists, join
+
+from hdx.analysis_scripts.common.downloads import Downloads
+from hdx.analysis_scripts.common.snapshots import (
+    SnapshotWriter,
+    iterate_saved_datasets,
+    load_saved_json,
+    manifest_file,
+)
+from hdx.utilities.path import temp_dir
+
+
+class TestSnapshots:
+    def test_snapshot_writer(self, configuration, input_folder):
+        datasets = list(iterate_saved_datasets(input_folder, Downloads.datasets_file))
+        with temp_dir(
+            "test_snapshots", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            snapshot_writer = SnapshotWriter(folder)
+            for n, start in enumerate(range(0, len(datasets), 1000)):
+                dataset_dicts = [
+                    dataset.get_dataset_dict()
+                    for dataset in datasets[start : start + 1000]
+                ]
+                filename = Downloads.datasets_file.replace(".json", f"_{n}.json")
+                snapshot_writer.save(dataset_dicts, filename)
+            snapshot_writer.join()
+            assert not exists(join(folder, "datasets_0.json"))
+            manifest = load_saved_json(folder, manifest_file)
+            assert sum(entry["count"] for entry in manifest.values()) == len(datasets)
+            replayed = list(iterate_saved_datasets(folder, Downloads.datasets_file))
+            assert [dataset["id"] for dataset in replayed] == [
+                dataset["id"] for dataset in datasets
+            ]
+            assert replayed[0].get_resources() == datasets[0].get_resources()
+
+    def test_close(self, configuration, mock_downloads):
+        with temp_dir(
+            "test_snapshots_close", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            downloads = Downloads(mock_downloads.today, None, folder)
+            downloads.snapshot_writer.save({"a": 1}, Downloads.mixpanel_file)
+            downloads.close()
+            assert downloads.snapshot_writer.executor is None
+            assert load_saved_json(folder, Downloads.mixpanel_file) == {"a": 1}
+            # Snapshots can still be saved after closing eg. by the service
+            downloads.snapshot_writer.save({"b": 2}, Downloads.users_file)
+            downloads.close()
+            manifest = load_saved_json(folder, manifest_file)
+            assert sorted(manifest) == ["mixpanel.json.gz", "users.json.gz"]
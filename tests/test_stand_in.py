@@ -0,0 +1,129 @@
+from os.path import join
+
+import pytest
+
+from .stand_in import StandInData, StandInServer
+from hdx.analysis_scripts.common.downloads import (
+    Downloads,
+    dataset_fields,
+    project_dataset,
+)
+from hdx.analysis_scripts.common.shards import get_partial_filename
+from hdx.analysis_scripts.merge.__main__ import main as merge_main
+from hdx.analysis_scripts.orgs.__main__ import main
+from hdx.api.configuration import Configuration
+from hdx.utilities.compare import assert_files_same
+from hdx.utilities.path import script_dir_plus_file, temp_dir
+from hdx.utilities.useragent import UserAgent
+
+
+@pytest.fixture(scope="module")
+def stand_in_data(input_folder):
+    return StandInData(input_folder)
+
+
+class TestStandIn:
+    @pytest.fixture
+    def stand_in(self, stand_in_data):
+        # The stand-in replaces the HDX site for the duration of the test
+        previous_configuration = Configuration._configuration
+        server = StandInServer(stand_in_data).start()
+        Configuration._create(
+            hdx_read_only=True,
+            hdx_url=server.url,
+            user_agent="test",
+            project_config_yaml=script_dir_plus_file(
+                join("config", "project_configuration.yaml"), Downloads
+            ),
+        )
+        UserAgent.set_global("test")
+        configuration = Configuration.read()
+        configuration["org_stats_url"] = f"{server.url}/geospatiality.csv"
+        yield server
+        server.stop()
+        Configuration._configuration = previous_configuration
+
+    @staticmethod
+    def get_downloads(server, mock_downloads, **kwargs):
+        return Downloads(
+            mock_downloads.today,
+            "missing.yaml",
+            page_size=1000,
+            organisations_page_size=100,
+            backoff_factor=0,
+            backoff_jitter=0,
+            mixpanel_shard_months=None,
+            mixpanel_api_url=f"{server.url}/mixpanel/api",
+            **kwargs,
+        )
+
+    @pytest.mark.parametrize("project_datasets", (False, True))
+    def test_get_org_stats(self, fixtures, mock_downloads, stand_in, project_datasets):
+        downloads = self.get_downloads(
+            stand_in, mock_downloads, project_datasets=project_datasets
+        )
+        with temp_dir(
+            "test_stand_in", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            main(downloads, folder)
+            for filename in ("org_stats.csv", "total_stats.csv"):
+                assert_files_same(join(fixtures, filename), join(folder, filename))
+        assert stand_in.requests["package_search"] > 1
+        assert stand_in.requests["organization_list"] > 1
+        assert stand_in.requests["jql"] == 2
+        assert sum(downloads.retry_counts.values()) == 0
+
+    def test_projected_crawl(self, mock_downloads, stand_in, stand_in_data):
+        # package_search with fl gives flat index fields, not dataset dicts
+        flat = stand_in_data.search_datasets(None, ",".join(dataset_fields))
+        assert "resources" not in flat[0]
+        assert (
+            flat[0]["organization"] == stand_in_data.datasets[0]["organization"]["name"]
+        )
+        # so projected crawls get full records and project them
+        downloads = self.get_downloads(stand_in, mock_downloads, project_datasets=True)
+        url = downloads.get_ckan_action_url("package_search")
+        page_info = {"result.count": None, "bytes": 0}
+        page = downloads.fetch_datasets_page(url, 0, page_info)
+        expected = [project_dataset(x) for x in stand_in_data.datasets[:1000]]
+        assert page == expected
+        assert stand_in.requests["package_search"] == 1
+
+    def test_shards(self, fixtures, mock_downloads, stand_in, stand_in_data):
+        with temp_dir(
+            "test_stand_in_shards", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            partial_files = []
+            processed = 0
+            for index in range(2):
+                shard = (index, 2)
+                downloads = self.get_downloads(stand_in, mock_downloads)
+                shard_dir = join(folder, f"org_stats_{index}")
+                main(downloads, shard_dir, shard=shard)
+                partial_files.append(
+                    join(shard_dir, get_partial_filename("org_stats", shard))
+                )
+                # Each shard only crawls the datasets of its organisations
+                assert downloads.progress.processed < len(stand_in_data.datasets)
+                processed += downloads.progress.processed
+            assert processed == len(stand_in_data.datasets)
+            merge_main(partial_files, folder)
+            for filename in ("org_stats.csv", "total_stats.csv"):
+                assert_files_same(join(fixtures, filename), join(folder, filename))
+
+    def test_retries(self, fixtures, mock_downloads, stand_in):
+        stand_in.fail_first = {
+            "package_search": 2,
+            "organization_list": 1,
+            "hdx_package_links_settings_show": 1,
+            "download": 1,
+        }
+        downloads = self.get_downloads(stand_in, mock_downloads)
+        with temp_dir(
+            "test_stand_in_retries", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            main(downloads, folder, all_users=True)
+            for filename in ("org_stats.csv", "total_stats.csv"):
+                assert_files_same(join(fixtures, filename), join(folder, filename))
+        assert sum(downloads.retry_counts.values()) == 5
+        assert stand_in.requests["user_list"] == 1
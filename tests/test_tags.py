@@ -0,0 +1,24 @@
+from hdx.analysis_scripts.common.tags import TagVocabulary
+
+
+class TestTags:
+    def test_tag_vocabulary(self):
+        tag_vocabulary = TagVocabulary()
+        bitset1 = tag_vocabulary.get_bitset(["health", "cholera", "crisis-somalia"])
+        bitset2 = tag_vocabulary.get_bitset(["education", "health"])
+        assert tag_vocabulary.tags == [
+            "health",
+            "cholera",
+            "crisis-somalia",
+            "education",
+        ]
+        assert tag_vocabulary.has_crisis(bitset1) is True
+        assert tag_vocabulary.has_crisis(bitset2) is False
+        assert tag_vocabulary.has_crisis(0) is False
+        assert tag_vocabulary.get_tags(bitset1 | bitset2) == [
+            "cholera",
+            "crisis-somalia",
+            "education",
+            "health",
+        ]
+        assert tag_vocabulary.get_tags(0) == []
@@ -0,0 +1,45 @@
+from datetime import datetime, timezone
+
+from hdx.analysis_scripts.common.updated_by_script import (
+    COD,
+    EXCLUDED,
+    NO_DATE,
+    SCRIPT,
+    UpdatedByScriptClassifier,
+)
+
+
+class TestUpdatedByScript:
+    def test_classify(self, configuration):
+        classifier = UpdatedByScriptClassifier(configuration["updated_by_script"])
+        date = datetime(2024, 5, 1, 10, 11, 12, tzinfo=timezone.utc)
+        assert classifier.classify("HDXINTERNAL tagbot (2024-05-01T10:11:12)") == (
+            EXCLUDED,
+            None,
+        )
+        assert classifier.classify(
+            "HDXPythonLibrary/5.4.8-test (2022-01-04T08:00:00)"
+        ) == (EXCLUDED, None)
+        assert classifier.classify("tagbot (2024-05-01T10:11:12)") == (SCRIPT, date)
+        assert classifier.classify("HDXINTERNAL CODs (2024-05-01T10:11:12)") == (
+            COD,
+            date,
+        )
+        assert classifier.classify("CODs (2024-05-01T10:11:12)") == (SCRIPT, date)
+        assert classifier.classify("my script") == (NO_DATE, None)
+        assert classifier.classify("my script (not a date)") == (NO_DATE, None)
+        assert classifier.classify("tagbot (2024-05-01T10:11:12+02:00)") == (
+            SCRIPT,
+            date,
+        )
+        assert classifier.classify("tagbot (2024-05-02)") == (
+            SCRIPT,
+            datetime(2024, 5, 2, tzinfo=timezone.utc),
+        )
+        # Repeated values are not parsed again
+        assert classifier.classify("tagbot (2024-05-01T10:11:12)") == (SCRIPT, date)
+        assert classifier.classify("my script") == (NO_DATE, None)
+        cache_info = classifier.get_classification.cache_info()
+        assert cache_info.hits == 2
+        assert cache_info.misses == 9
+        assert classifier.get_hit_rate() == 2 / 11